@@ -0,0 +1,285 @@
+"""
+Benchmark suite for pk-common. Runs entirely against the in-process emulator
+and canned responses, so no reader or key is needed.
+
+    python benchmarks/run.py                       # run everything, print a table
+    python benchmarks/run.py --json results.json   # also save machine-readable results
+    python benchmarks/run.py --compare base.json   # exit 1 on regressions vs. a saved run
+    python benchmarks/run.py --filter oath         # only benchmarks whose name contains 'oath'
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pkcommon
+from pkcommon.apdu import APDUTransport, CommandAPDU, ResponseAPDU, register_reader, unregister_reader
+from pkcommon.core import PicoKeyDevice, PicoKeyDiscovery
+from pkcommon.emulator import VirtualConnection, VirtualPicoKey, VirtualReader
+from pkcommon.modules import ManagementModule, OATHModule
+from pkcommon.tlv import encode_tlv, iter_tlv
+
+SECRET = b"12345678901234567890"
+
+# (name, params, factory) where factory() returns fn or (fn, setup, teardown)
+BENCHMARKS: List[Tuple[str, dict, Callable]] = []
+
+def benchmark(name: str, params: Optional[dict] = None):
+    def register(factory):
+        BENCHMARKS.append((name, params or {}, factory))
+        return factory
+    return register
+
+# -- helpers -----------------------------------------------------------------
+
+class CannedTransport:
+    """Mock transport answering every send() with one prebuilt response."""
+
+    def __init__(self, response: bytes):
+        self.response = ResponseAPDU(response, 0x90, 0x00)
+        self.reader_name = "canned"
+
+    def send(self, cla, ins, p1, p2, data=b"", le=None) -> ResponseAPDU:
+        return self.response
+
+    def transmit(self, apdu, collect=True) -> ResponseAPDU:
+        return self.response
+
+    def select(self, aid, get_response_ins=None) -> ResponseAPDU:
+        return ResponseAPDU(b"", 0x90, 0x00)
+
+def calculate_all_response(accounts: int) -> bytes:
+    out = []
+    for i in range(accounts):
+        out.append(encode_tlv(0x71, f"issuer{i}:user{i}@example.com".encode()))
+        out.append(encode_tlv(0x76, b"\x06" + (i * 7919).to_bytes(4, "big")))
+    return b"".join(out)
+
+class SharedConnection(VirtualConnection):
+    """Emulator connection that behaves like a shared-mode PC/SC handle (select() always sends)."""
+    in_process = False
+
+class SharedReader(VirtualReader):
+    def createConnection(self) -> SharedConnection:
+        return SharedConnection(self.card)
+
+def emulated_transport(accounts: int = 0, latency: float = 0.0, shared: bool = True):
+    """
+    shared: talk to the card like a real shared reader, so repeated SELECTs
+    are sent; False uses the in-process connection, which skips them like
+    an exclusive session does.
+    """
+    card = VirtualPicoKey(latency=latency)
+    for i in range(accounts):
+        card.add_account(f"issuer{i}:user{i}@example.com", SECRET)
+    if shared:
+        reader = SharedReader(card, f"PicoKey Shared CCID ({card.serial}) 00 00")
+        register_reader(reader)
+    else:
+        reader = card.plug()
+    transport = APDUTransport(reader.name)
+    transport.connect()
+    return card, transport, reader
+
+# -- APDU construction -------------------------------------------------------
+
+@benchmark("apdu.encode.short")
+def _():
+    cmd = CommandAPDU(0x00, 0xA2, 0x00, 0x01, encode_tlv(0x71, b"label") + encode_tlv(0x74, bytes(8)))
+    return lambda: cmd.encode()
+
+@benchmark("apdu.encode.extended", {"lc": 2048})
+def _():
+    cmd = CommandAPDU(0x00, 0xDB, 0x3F, 0xFF, bytes(2048), le=0)
+    return lambda: cmd.encode(extended=True)
+
+@benchmark("tlv.encode.put", {"fields": 4})
+def _():
+    return lambda: OATHModule._put_data("issuer:user@example.com", SECRET, 0x20, 0x01, 6)
+
+# -- OATH response parsing ---------------------------------------------------
+
+for _n in (10, 100, 1000):
+    @benchmark(f"oath.parse.calculate_all.{_n}", {"accounts": _n})
+    def _(n=_n):
+        module = OATHModule(CannedTransport(calculate_all_response(n)))
+        return lambda: module.calculate_all(1)
+
+    @benchmark(f"tlv.iter.{_n}", {"objects": 2 * _n})
+    def _(n=_n):
+        data = calculate_all_response(n)
+        return lambda: sum(1 for _ in iter_tlv(data))
+
+# -- discovery merge ---------------------------------------------------------
+
+for _n in (10, 100, 500):
+    @benchmark(f"discovery.merge.{_n}", {"devices": _n})
+    def _(n=_n):
+        discovery = PicoKeyDiscovery()
+        usb = [PicoKeyDevice(0x20A0, 0x42B1, f"{i:08d}", "Pico Key", "7.0", "Pol Henarejos")
+               for i in range(n)]
+        sc = [PicoKeyDevice(0, 0, f"{i:08d}", f"Pico Key CCID ({i:08d}) {i:02d} 00",
+                            path=f"Pico Key CCID ({i:08d}) {i:02d} 00", atr=[0x3B])
+              for i in range(n)]
+
+        ctap = [PicoKeyDevice(0x20A0, 0x42B1, f"{i:08d}", "PicoKey FIDO", hid_path=f"/dev/hidraw{i}")
+                for i in range(n)]
+        return lambda: discovery._merge(usb, sc, ctap)
+
+# -- module round trips against the emulator ---------------------------------
+
+def _round_trip(name: str, accounts: int, latency: float, operation: Callable[[APDUTransport], None],
+                shared: bool = True):
+    state = {}
+
+    def setup():
+        state["card"], state["transport"], state["reader"] = emulated_transport(accounts, latency, shared)
+
+    def teardown():
+        state["transport"].disconnect()
+        unregister_reader(state["reader"])
+
+    def run():
+        operation(state["transport"])
+
+    BENCHMARKS.append((name, {"accounts": accounts, "latency_ms": latency * 1000, "shared": shared},
+                       lambda: (run, setup, teardown)))
+
+def _oath_flow(transport: APDUTransport):
+    oath = OATHModule(transport)
+    oath.select()
+    oath.list_accounts()
+    oath.calculate_all(1)
+
+def _mgmt_flow(transport: APDUTransport):
+    mgmt = ManagementModule(transport)
+    mgmt.select()
+    mgmt.read_device_info()
+
+# Shared reader (every SELECT is sent), plus the exclusive/in-process case where repeated SELECTs are skipped.
+for _n in (10, 100):
+    _round_trip(f"flow.oath.{_n}", _n, 0.0, _oath_flow)
+    _round_trip(f"flow.oath.{_n}.latency", _n, 0.002, _oath_flow)
+    _round_trip(f"flow.oath.{_n}.latency.exclusive", _n, 0.002, _oath_flow, shared=False)
+_round_trip("flow.management", 0, 0.0, _mgmt_flow)
+_round_trip("flow.management.latency", 0, 0.002, _mgmt_flow)
+_round_trip("flow.management.latency.exclusive", 0, 0.002, _mgmt_flow, shared=False)
+
+# -- runner ------------------------------------------------------------------
+
+def measure(fn: Callable[[], None], min_time: float, repeat: int) -> Dict[str, float]:
+    """Calibrate a loop count so one sample takes >= min_time, then take `repeat` samples."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - start) / loops)
+    samples.sort()
+    return {
+        "loops": loops,
+        "min": samples[0],
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "max": samples[-1],
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+def run(filter_text: Optional[str], min_time: float, repeat: int) -> dict:
+    results = []
+    for name, params, factory in BENCHMARKS:
+        if filter_text and filter_text not in name:
+            continue
+        made = factory()
+        fn, setup, teardown = made if isinstance(made, tuple) else (made, None, None)
+        if setup:
+            setup()
+        try:
+            stats = measure(fn, min_time, repeat)
+        finally:
+            if teardown:
+                teardown()
+        results.append({"name": name, "params": params, **stats})
+        print(f"{name:<36} {stats['median'] * 1e6:>12.2f} us  (min {stats['min'] * 1e6:.2f}, "
+              f"stdev {stats['stdev'] * 1e6:.2f}, {stats['loops']} loops)")
+    return {
+        "meta": {
+            "pk_common": pkcommon.__version__,
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "min_time": min_time,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """Names of benchmarks whose median got slower than baseline by more than `threshold`."""
+    base = {r["name"]: r for r in baseline.get("results", [])}
+    regressions = []
+    print(f"\n{'benchmark':<36} {'baseline':>12} {'current':>12} {'change':>8}")
+    for r in current["results"]:
+        old = base.get(r["name"])
+        if not old or not old["median"]:
+            continue
+        change = r["median"] / old["median"] - 1
+        flag = " !" if change > threshold else ""
+        print(f"{r['name']:<36} {old['median'] * 1e6:>10.2f}us {r['median'] * 1e6:>10.2f}us "
+              f"{change:>+7.1%}{flag}")
+        if change > threshold:
+            regressions.append(r["name"])
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="pk-common benchmark suite")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--json", metavar="FILE", help="Write results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="Compare against a previous --json run")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slowdown counted as a regression (default 0.10)")
+    parser.add_argument("--min-time", type=float, default=0.05, help="Minimum seconds per sample")
+    parser.add_argument("--repeat", type=int, default=7, help="Samples per benchmark")
+    parser.add_argument("--list", action="store_true", help="List benchmark names and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, params, _ in BENCHMARKS:
+            print(name, json.dumps(params) if params else "")
+        return
+
+    current = run(args.filter, args.min_time, args.repeat)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,6 @@
 __version__ = "0.1.0"
+
+# core has no third-party imports; device stacks load only when a backend is used.
+from .core import PicoKeyDevice, PicoKeyDiscovery
+
+__all__ = ["PicoKeyDevice", "PicoKeyDiscovery"]
@@ -0,0 +1,223 @@
+import asyncio
+import functools
+import inspect
+import weakref
+from concurrent.futures import Executor
+from typing import Dict, List, Optional
+from .apdu import APDUTransport, BytesLike, CommandAPDU, ConnectionPool, ResponseAPDU
+from .core import PicoKeyDevice, PicoKeyDiscovery
+from .metrics import Metrics
+from .modules import (
+    FIDOModule, HSMModule, ManagementModule, OATHModule, OpenPGPModule, YubicoModule
+)
+
+# One lock per reader and event loop, so every transport talking to the same
+# card is serialized without tying up executor threads while waiting.
+_reader_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Lock]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+def _reader_lock(reader_name: str) -> asyncio.Lock:
+    locks = _reader_locks.setdefault(asyncio.get_running_loop(), {})
+    lock = locks.get(reader_name)
+    if lock is None:
+        lock = locks[reader_name] = asyncio.Lock()
+    return lock
+
+class AsyncAPDUTransport:
+    """
+    asyncio counterpart of APDUTransport. Blocking PC/SC calls run in an
+    executor; calls for the same reader are serialized with a per-reader lock.
+    """
+
+    def __init__(self, reader_name: str, verbose: bool = False, pool: Optional[ConnectionPool] = None,
+                 extended: Optional[bool] = None, executor: Optional[Executor] = None,
+                 metrics: Optional[Metrics] = None):
+        self.transport = APDUTransport(reader_name, verbose=verbose, pool=pool, extended=extended, metrics=metrics)
+        self.executor = executor
+
+    @property
+    def reader_name(self) -> str:
+        return self.transport.reader_name
+
+    async def run(self, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` in the executor while holding this reader's lock."""
+        loop = asyncio.get_running_loop()
+        async with _reader_lock(self.reader_name):
+            return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    async def iterate(self, fn, *args, **kwargs):
+        """
+        Async iterator over the sync generator `fn(*args, **kwargs)`. Every
+        step runs in the executor and this reader's lock is held until the
+        generator is exhausted or closed, so continuation APDUs (e.g. OATH
+        SEND REMAINING) are not interleaved with other callers.
+        """
+        loop = asyncio.get_running_loop()
+        done = object()
+        async with _reader_lock(self.reader_name):
+            iterator = fn(*args, **kwargs)
+            try:
+                while True:
+                    item = await loop.run_in_executor(self.executor, next, iterator, done)
+                    if item is done:
+                        return
+                    yield item
+            finally:
+                await loop.run_in_executor(self.executor, iterator.close)
+
+    async def connect(self):
+        await self.run(self.transport.connect)
+
+    async def disconnect(self):
+        await self.run(self.transport.disconnect)
+
+    async def transmit(self, apdu, collect: bool = True) -> ResponseAPDU:
+        return await self.run(self.transport.transmit, apdu, collect)
+
+    async def send(self, cla: int, ins: int, p1: int, p2: int, data: BytesLike = b"",
+                   le: Optional[int] = None) -> ResponseAPDU:
+        return await self.run(self.transport.send, cla, ins, p1, p2, data, le)
+
+    async def send_apdu(self, command: CommandAPDU) -> ResponseAPDU:
+        return await self.run(self.transport.send_apdu, command)
+
+    async def select(self, aid: BytesLike, get_response_ins: int = None) -> ResponseAPDU:
+        return await self.run(self.transport.select, aid, get_response_ins)
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.disconnect()
+
+class _AsyncModule:
+    """
+    Exposes every method of the wrapped sync module as a coroutine. Each call
+    runs as one executor job under the reader lock, so multi-APDU operations
+    (e.g. calculate_all) are not interleaved with other callers. Generator
+    methods (e.g. OATH iter_codes) become async iterators instead; see
+    AsyncAPDUTransport.iterate().
+    """
+
+    _module_cls = None
+
+    def __init__(self, transport: AsyncAPDUTransport, *args, **kwargs):
+        """Extra arguments go to the sync module (e.g. OATHModule's cache)."""
+        self.transport = transport
+        self.module = self._module_cls(transport.transport, *args, **kwargs)
+
+    def __getattr__(self, name):
+        attr = getattr(self.module, name)
+        if not callable(attr):
+            return attr
+
+        if inspect.isgeneratorfunction(attr):
+            def iterate(*args, **kwargs):
+                return self.transport.iterate(attr, *args, **kwargs)
+
+            iterate.__name__ = name
+            iterate.__doc__ = attr.__doc__
+            return iterate
+
+        async def call(*args, **kwargs):
+            return await self.transport.run(attr, *args, **kwargs)
+
+        call.__name__ = name
+        call.__doc__ = attr.__doc__
+        return call
+
+class AsyncHSMModule(_AsyncModule):
+    _module_cls = HSMModule
+
+class AsyncOpenPGPModule(_AsyncModule):
+    _module_cls = OpenPGPModule
+
+class AsyncYubicoModule(_AsyncModule):
+    _module_cls = YubicoModule
+
+class AsyncManagementModule(_AsyncModule):
+    _module_cls = ManagementModule
+
+class AsyncOATHModule(_AsyncModule):
+    _module_cls = OATHModule
+
+class AsyncFIDOModule(_AsyncModule):
+    _module_cls = FIDOModule
+
+class AsyncVendorTransport:
+    """asyncio wrapper for VendorTransport (one USB endpoint pair, serialized)."""
+
+    def __init__(self, vendor_id: int, product_id: int, backend=None, executor: Optional[Executor] = None,
+                 metrics: Optional[Metrics] = None):
+        from .vendor import VendorTransport
+        self.transport = VendorTransport(vendor_id, product_id, backend=backend, metrics=metrics)
+        self.executor = executor
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def run(self, fn, *args, **kwargs):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    async def connect(self):
+        await self.run(self.transport.connect)
+
+    async def send(self, data: List[int]):
+        await self.run(self.transport.send, data)
+
+    async def receive(self, length: int = 64, timeout: int = 1000) -> List[int]:
+        return await self.run(self.transport.receive, length, timeout)
+
+    async def exchange(self, data: List[int], response_len: int = 64) -> List[int]:
+        return await self.run(self.transport.exchange, data, response_len)
+
+    async def write_stream(self, data, timeout: Optional[int] = None) -> int:
+        return await self.run(self.transport.write_stream, data, timeout)
+
+    async def read_stream(self, length: int, timeout: Optional[int] = None):
+        return await self.run(self.transport.read_stream, length, timeout)
+
+    async def transfer(self, data, response_len: int, timeout: Optional[int] = None):
+        return await self.run(self.transport.transfer, data, response_len, timeout)
+
+class AsyncCTAPModule:
+    """asyncio wrapper for CTAPModule; CTAPHID round trips run in the executor."""
+
+    def __init__(self, device, executor: Optional[Executor] = None, metrics: Optional[Metrics] = None, pool=None):
+        """pool: optional ctap.CTAPDevicePool (device may then be a HID path)."""
+        from .ctap import CTAPModule
+        self.module = CTAPModule(device, metrics=metrics, pool=pool)
+        self.executor = executor
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def _run(self, fn):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            return await loop.run_in_executor(self.executor, fn)
+
+    async def get_info(self, refresh: bool = False):
+        return await self._run(lambda: self.module.get_info(refresh=refresh))
+
+    async def get_capabilities(self, refresh: bool = False):
+        return await self._run(lambda: self.module.get_capabilities(refresh=refresh))
+
+class AsyncPicoKeyDiscovery:
+    """asyncio front end for PicoKeyDiscovery (backends still scan concurrently in threads)."""
+
+    def __init__(self, discovery: Optional[PicoKeyDiscovery] = None, executor: Optional[Executor] = None):
+        self.discovery = discovery or PicoKeyDiscovery()
+        self.executor = executor
+
+    async def list_devices(self) -> List[PicoKeyDevice]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.discovery.list_devices)
+
+    async def refresh(self) -> List[PicoKeyDevice]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.discovery.refresh)
@@ -1,18 +1,59 @@
-from smartcard.System import readers
-from smartcard.util import toHexString, toBytes
-from smartcard.Exceptions import NoCardException
-from typing import List, Optional
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 from .core import PicoKeyDevice
+from .metrics import Metrics, applet_name
+
+# Readers registered in-process (e.g. emulator.VirtualReader), seen alongside PC/SC ones.
+_virtual_readers: list = []
+
+def register_reader(reader):
+    """Make a reader-like object (name, createConnection()) visible to transports and discovery."""
+    if reader not in _virtual_readers:
+        _virtual_readers.append(reader)
+
+def unregister_reader(reader):
+    if reader in _virtual_readers:
+        _virtual_readers.remove(reader)
+
+def list_readers() -> list:
+    """PC/SC readers plus registered virtual readers."""
+    virtual = list(_virtual_readers)
+    try:
+        # pyscard is imported on first use so importing this module stays cheap.
+        from smartcard.System import readers
+        return list(readers()) + virtual
+    except Exception:
+        # No PC/SC service: virtual readers alone are still usable.
+        if not virtual:
+            raise
+        return virtual
+
+# pcsc-lite reader names: "<product> [<interface>] (<serial>) <slot> <index>"
+_READER_SERIAL = re.compile(r"\(([^()]+)\)\s+\d+\s+\d+$")
+
+def reader_serial(reader_name: str) -> Optional[str]:
+    """USB serial number embedded in a PC/SC reader name, if any."""
+    match = _READER_SERIAL.search(reader_name)
+    return match.group(1) if match else None
 
 class SmartcardDiscovery:
     """Discovery and communication using PC/SC Smartcard interface."""
+
+    @staticmethod
+    def topology() -> tuple:
+        """Cheap fingerprint of the PC/SC reader list (no card connections)."""
+        return tuple(sorted(str(r) for r in list_readers()))
     
     @staticmethod
     def find_all_picokeys() -> List[PicoKeyDevice]:
         devices = []
         try:
             from .discovery import USBDiscovery
-            for reader in readers():
+            for reader in list_readers():
                 # We filter by reader name which often contains the product name
                 if any(s in reader.name for s in USBDiscovery.SUBSTRINGS):
                     atr = ""
@@ -28,6 +69,7 @@ class SmartcardDiscovery:
                     devices.append(PicoKeyDevice(
                         vendor_id=0,
                         product_id=0,
+                        serial_number=reader_serial(reader.name),
                         product_name=reader.name,
                         path=str(reader),
                         atr=atr
@@ -36,38 +78,582 @@ class SmartcardDiscovery:
             pass
         return devices
 
+# PC/SC status returned when the card was reset by another process or the reader.
+SCARD_W_RESET_CARD = 0x80100068
+SCARD_SHARE_EXCLUSIVE = 0x0001
+
+INS_GET_RESPONSE = 0xC0
+CLA_CHAINING = 0x10
+SHORT_MAX_LC = 255
+SHORT_MAX_LE = 256
+EXTENDED_MAX_LC = 65535
+EXTENDED_MAX_LE = 65536
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+class CommandAPDU(NamedTuple):
+    """A command APDU; `data` is kept as bytes and only encoded on demand."""
+    cla: int
+    ins: int
+    p1: int
+    p2: int
+    data: bytes = b""
+    le: Optional[int] = None
+
+    def encode(self, extended: bool = False) -> bytes:
+        """Encode as ISO 7816-4 case 1-4, short or extended length."""
+        data, le = self.data, self.le
+        header = bytes((self.cla, self.ins, self.p1, self.p2))
+        if not extended:
+            if len(data) > SHORT_MAX_LC or (le is not None and le > SHORT_MAX_LE):
+                raise ValueError("Command does not fit a short APDU")
+            lc = bytes((len(data),)) if data else b""
+            return b"".join((header, lc, data, b"" if le is None else bytes((le & 0xFF,))))
+        if len(data) > EXTENDED_MAX_LC or (le is not None and le > EXTENDED_MAX_LE):
+            raise ValueError("Command does not fit an extended APDU")
+        lc = b"\x00" + len(data).to_bytes(2, "big") if data else b""
+        if le is None:
+            tail = b""
+        else:
+            tail = (b"" if data else b"\x00") + (le & 0xFFFF).to_bytes(2, "big")
+        return b"".join((header, lc, data, tail))
+
+    def __bytes__(self) -> bytes:
+        return self.encode()
+
+class ResponseAPDU(NamedTuple):
+    """
+    A response APDU. Unpacks like the historical (data, sw1, sw2) tuple;
+    `view` gives zero-copy slices of the data.
+    """
+    data: bytes
+    sw1: int
+    sw2: int
+
+    @property
+    def sw(self) -> int:
+        return (self.sw1 << 8) | self.sw2
+
+    @property
+    def ok(self) -> bool:
+        return self.sw1 == 0x90 and self.sw2 == 0x00
+
+    @property
+    def view(self) -> memoryview:
+        return memoryview(self.data)
+
+def _with_short_le(apdu: bytes, le: int) -> bytes:
+    """Replace (or add) the Le byte of a short APDU, as requested by a 6Cxx status."""
+    if len(apdu) > 4 and (len(apdu) == 5 or len(apdu) == 5 + apdu[4] + 1):
+        return apdu[:-1] + bytes((le,))
+    return apdu + bytes((le,))
+
+def atr_supports_extended_length(atr: Union[BytesLike, List[int]]) -> bool:
+    """True when the ATR card capabilities (compact-TLV tag 7) advertise extended Lc/Le."""
+    if len(atr) < 2:
+        return False
+    # Skip the interface bytes (TA/TB/TC/TD chains) to reach the historical bytes.
+    i, y = 2, atr[1] >> 4
+    while True:
+        i += bin(y & 0x7).count("1")
+        if not y & 0x8 or i >= len(atr):
+            break
+        y = atr[i] >> 4
+        i += 1
+    hist = list(atr[i:i + (atr[1] & 0x0F)])
+    if not hist or hist[0] not in (0x00, 0x80):
+        return False
+    # Category 0x00 ends with a 3-byte status indicator outside the TLV area.
+    end = len(hist) - 3 if hist[0] == 0x00 else len(hist)
+    j = 1
+    while j < end:
+        tag, length = hist[j] >> 4, hist[j] & 0x0F
+        if tag == 0x7 and length >= 3 and j + 3 < len(hist):
+            return bool(hist[j + 3] & 0x40)
+        j += 1 + length
+    return False
+
+# transmit_many() error policies
+STOP = "stop"
+CONTINUE = "continue"
+
+@dataclass
+class APDUStep:
+    """One command in a transmit_many() script."""
+    apdu: Union[CommandAPDU, BytesLike, List[int]]
+    # Accepted status words. Values <= 0xFF match any SW with that SW1 (e.g. 0x61).
+    expect: Tuple[int, ...] = (0x9000,)
+    # STOP or CONTINUE when the status is not expected; None uses the script default.
+    on_error: Optional[str] = None
+    # False leaves 61xx uncollected (no GET RESPONSE); add 0x61 to `expect` to accept it.
+    collect: bool = True
+    name: Optional[str] = None
+
+    def accepts(self, response: ResponseAPDU) -> bool:
+        return response.sw in self.expect or response.sw1 in self.expect
+
+@dataclass
+class StepResult:
+    step: APDUStep
+    response: Optional[ResponseAPDU]
+    elapsed: float
+    ok: bool
+    error: Optional[str] = None
+
+@dataclass
+class BatchResult:
+    results: List[StepResult] = field(default_factory=list)
+    elapsed: float = 0.0
+    # False when a failing step with the STOP policy ended the script early.
+    completed: bool = True
+
+    @property
+    def ok(self) -> bool:
+        return self.completed and all(r.ok for r in self.results)
+
+def _hcard(connection):
+    """Find the PC/SC card handle behind pyscard's connection decorators."""
+    while connection is not None:
+        hcard = getattr(connection, "hcard", None)
+        if hcard is not None:
+            return hcard
+        connection = getattr(connection, "component", None)
+    return None
+
+def _is_reset_error(e: Exception) -> bool:
+    hresult = getattr(e, "hresult", None)
+    return hresult is not None and (hresult & 0xFFFFFFFF) == SCARD_W_RESET_CARD
+
+class CardSession:
+    """A PC/SC connection to one reader that can outlive a single transport."""
+
+    def __init__(self, reader, exclusive: bool = False):
+        """
+        exclusive: connect with SCARD_SHARE_EXCLUSIVE, so no other process can
+            talk to the card while this session is open.
+        """
+        self.reader = reader
+        self.exclusive = exclusive
+        self.connection = None
+        self.refs = 0
+        self.last_used = time.monotonic()
+        self.lock = threading.RLock()
+        # (aid, select response) of the applet currently active on the card.
+        self.selected: Optional[tuple] = None
+        self.get_response_ins = INS_GET_RESPONSE
+        self.extended: Optional[bool] = None
+        self.transaction_depth = 0
+        self.transaction_held = False
+
+    @property
+    def reader_name(self) -> str:
+        return self.reader.name
+
+    def open(self):
+        self.selected = None
+        self.get_response_ins = INS_GET_RESPONSE
+        self.extended = None
+        self.connection = self.reader.createConnection()
+        if self.exclusive:
+            self.connection.connect(mode=SCARD_SHARE_EXCLUSIVE)
+        else:
+            self.connection.connect()
+        self.last_used = time.monotonic()
+
+    @property
+    def owns_card(self) -> bool:
+        """
+        Whether no other PC/SC client (ykman, gpg-agent, ...) can change the
+        card state, e.g. select another applet, behind this session's back.
+        """
+        return (self.exclusive or self.transaction_held
+                or getattr(self.connection, "in_process", False))
+
+    def reconnect(self):
+        """Recover from a card reset on the same reader handle (no readers() scan)."""
+        self.selected = None
+        self.get_response_ins = INS_GET_RESPONSE
+        mode = {"mode": SCARD_SHARE_EXCLUSIVE} if self.exclusive else {}
+        reconnect = getattr(self.connection, "reconnect", None)
+        if reconnect is not None:
+            try:
+                reconnect(**mode)
+                return
+            except Exception:
+                pass
+        try:
+            self.connection.disconnect()
+        except Exception:
+            pass
+        self.connection.connect(**mode)
+
+    def is_healthy(self) -> bool:
+        """Cheap liveness check (SCardStatus), no APDU is sent."""
+        if self.connection is None:
+            return False
+        try:
+            self.connection.getATR()
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        self.selected = None
+        if self.connection:
+            try:
+                self.connection.disconnect()
+            except Exception:
+                pass
+            self.connection = None
+
+class ConnectionPool:
+    """
+    Keeps warm PC/SC connections per reader so short operations do not pay
+    for readers() scans and SCardConnect on every transport.
+    """
+
+    def __init__(self, max_idle: float = 60.0, health_check: bool = True, metrics: Optional[Metrics] = None,
+                 exclusive: bool = False):
+        """
+        max_idle: seconds an unused connection stays open before eviction.
+        health_check: verify (and if needed reconnect) idle connections on acquire.
+        metrics: optional metrics.Metrics counting health-check reconnects.
+        exclusive: open readers with SCARD_SHARE_EXCLUSIVE.
+        """
+        self.max_idle = max_idle
+        self.exclusive = exclusive
+        self.health_check = health_check
+        self.metrics = metrics
+        self._sessions: Dict[str, CardSession] = {}
+        self._readers: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _find_reader(self, reader_name: str):
+        reader = self._readers.get(reader_name)
+        if reader is None:
+            for r in list_readers():
+                self._readers[r.name] = r
+            reader = self._readers.get(reader_name)
+        if reader is None:
+            raise Exception(f"Reader {reader_name} not found")
+        return reader
+
+    def acquire(self, reader_name: str) -> CardSession:
+        with self._lock:
+            self._evict_idle_locked()
+            session = self._sessions.get(reader_name)
+            if session is not None and self.health_check and session.refs == 0 and not session.is_healthy():
+                try:
+                    session.reconnect()
+                    if self.metrics is not None:
+                        self.metrics.record_connect("pcsc", reader_name, reconnect=True)
+                except Exception:
+                    # Reader went away or was replugged: drop both handles and re-open.
+                    session.close()
+                    del self._sessions[reader_name]
+                    self._readers.pop(reader_name, None)
+                    session = None
+            if session is None:
+                session = CardSession(self._find_reader(reader_name), exclusive=self.exclusive)
+                session.open()
+                self._sessions[reader_name] = session
+            session.refs += 1
+            session.last_used = time.monotonic()
+            return session
+
+    def release(self, session: CardSession):
+        with self._lock:
+            session.refs = max(0, session.refs - 1)
+            session.last_used = time.monotonic()
+
+    def _evict_idle_locked(self) -> int:
+        now = time.monotonic()
+        idle = [name for name, s in self._sessions.items()
+                if s.refs == 0 and now - s.last_used > self.max_idle]
+        for name in idle:
+            self._sessions.pop(name).close()
+        return len(idle)
+
+    def evict_idle(self) -> int:
+        """Close connections unused for longer than max_idle. Returns the count."""
+        with self._lock:
+            return self._evict_idle_locked()
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
 class APDUTransport:
     """Handles sending and receiving APDUs."""
     
-    def __init__(self, reader_name: str, verbose: bool = False):
+    def __init__(self, reader_name: str, verbose: bool = False, pool: Optional[ConnectionPool] = None,
+                 extended: Optional[bool] = None, metrics: Optional[Metrics] = None, exclusive: bool = False):
+        """
+        extended: force extended-length APDUs on or off; None follows the ATR.
+        metrics: optional metrics.Metrics recording every exchange on this transport.
+        exclusive: open the reader with SCARD_SHARE_EXCLUSIVE (ignored with a pool,
+            see ConnectionPool's own `exclusive`).
+        """
         self.reader_name = reader_name
-        self.connection = None
+        self.exclusive = exclusive
+        self.session: Optional[CardSession] = None
         self.verbose = verbose
+        self.pool = pool
+        self.extended = extended
+        self.metrics = metrics
+
+    @property
+    def connection(self):
+        return self.session.connection if self.session else None
 
     def connect(self):
-        for reader in readers():
-            if reader.name == self.reader_name:
-                self.connection = reader.createConnection()
-                self.connection.connect()
-                return
-        raise Exception(f"Reader {self.reader_name} not found")
+        if self.session:
+            return
+        if self.pool:
+            self.session = self.pool.acquire(self.reader_name)
+        else:
+            for reader in list_readers():
+                if reader.name == self.reader_name:
+                    session = CardSession(reader, exclusive=self.exclusive)
+                    session.open()
+                    self.session = session
+                    break
+            else:
+                raise Exception(f"Reader {self.reader_name} not found")
+        if self.metrics is not None:
+            self.metrics.record_connect("pcsc", self.reader_name)
 
     def disconnect(self):
-        if self.connection:
-            self.connection.disconnect()
+        if self.session:
+            if self.pool:
+                self.pool.release(self.session)
+            else:
+                self.session.close()
+            self.session = None
 
-    def transmit(self, apdu: List[int]) -> (List[int], int, int):
-        """Send APDU and return (data, sw1, sw2)."""
-        if not self.connection:
+    def _exchange(self, apdu: bytes) -> ResponseAPDU:
+        """Single raw command/response exchange with the card."""
+        if not self.session:
             self.connect()
         
-        from smartcard.util import toHexString
         if self.verbose:
-            print(f"  [APDU] > {toHexString(apdu)}")
-            
-        data, sw1, sw2 = self.connection.transmit(apdu)
+            print(f"  [APDU] > {apdu.hex(' ').upper()}")
+
+        session = self.session
+        metrics = self.metrics
+        with session.lock:
+            is_select = len(apdu) > 2 and apdu[1] == 0xA4 and apdu[2] == 0x04
+            if metrics is not None:
+                applet = applet_name(apdu[5:5 + apdu[4]] if is_select and len(apdu) > 5
+                                     else session.selected[0] if session.selected else None)
+                start = time.perf_counter()
+            if is_select:
+                # Any SELECT by AID not issued through select() invalidates the tracked
+                # applet. P1 is checked because OATH CALCULATE ALL reuses INS 0xA4.
+                session.selected = None
+                session.get_response_ins = INS_GET_RESPONSE
+            try:
+                # pyscard only takes lists of ints; convert at this boundary only.
+                try:
+                    data, sw1, sw2 = session.connection.transmit(list(apdu))
+                except Exception as e:
+                    if not _is_reset_error(e):
+                        raise
+                    session.reconnect()
+                    if metrics is not None:
+                        metrics.record_connect("pcsc", self.reader_name, reconnect=True)
+                    data, sw1, sw2 = session.connection.transmit(list(apdu))
+            except Exception as e:
+                session.selected = None
+                if metrics is not None:
+                    metrics.record_error("pcsc", self.reader_name, f"{apdu[1]:02X}", e, applet)
+                raise
+            if sw1 not in (0x90, 0x61):
+                session.selected = None
+            session.last_used = time.monotonic()
+        response = ResponseAPDU(bytes(data), sw1, sw2)
+        if metrics is not None:
+            metrics.record("pcsc", self.reader_name, f"{apdu[1]:02X}", time.perf_counter() - start,
+                           len(apdu), len(response.data) + 2, response.sw, applet)
         
         if self.verbose:
-            print(f"  [APDU] < {toHexString(data)} SW={sw1:02x}{sw2:02x}")
+            print(f"  [APDU] < {response.data.hex(' ').upper()} SW={sw1:02x}{sw2:02x}")
             
-        return data, sw1, sw2
+        return response
+
+    def transmit(self, apdu: Union[CommandAPDU, BytesLike, List[int]], collect: bool = True) -> ResponseAPDU:
+        """
+        Send APDU and return a ResponseAPDU, which unpacks as (data, sw1, sw2).
+        A CommandAPDU is encoded as in send_apdu(); raw bytes are sent as-is.
+        With `collect`, 61xx responses are followed by GET RESPONSE (or the
+        applet's equivalent, e.g. OATH SEND REMAINING) until the card is done,
+        and 6Cxx is retried with the exact Le the card asked for.
+        """
+        if isinstance(apdu, CommandAPDU):
+            return self.send_apdu(apdu)
+        apdu = bytes(apdu)
+        if not self.session:
+            self.connect()
+        with self.session.lock:
+            response = self._exchange(apdu)
+            if not collect:
+                return response
+            if response.sw1 == 0x6C:
+                response = self._exchange(_with_short_le(apdu, response.sw2))
+            if response.sw1 != 0x61:
+                return response
+            collected = bytearray(response.data)
+            while response.sw1 == 0x61:
+                response = self.get_response(response.sw2)
+                collected += response.data
+            return ResponseAPDU(bytes(collected), response.sw1, response.sw2)
+
+    def get_response(self, le: int = 0) -> ResponseAPDU:
+        """Fetch the next chunk of a 61xx response, without further collection."""
+        if not self.session:
+            self.connect()
+        return self._exchange(bytes((0x00, self.session.get_response_ins, 0x00, 0x00, le & 0xFF)))
+
+    @property
+    def supports_extended(self) -> bool:
+        """Whether extended-length APDUs are used (forced, or advertised in the ATR)."""
+        if self.extended is not None:
+            return self.extended
+        if not self.session:
+            self.connect()
+        if self.session.extended is None:
+            try:
+                self.session.extended = atr_supports_extended_length(self.session.connection.getATR())
+            except Exception:
+                self.session.extended = False
+        return self.session.extended
+
+    def send(self, cla: int, ins: int, p1: int, p2: int, data: BytesLike = b"",
+             le: Optional[int] = None) -> ResponseAPDU:
+        """Build a CommandAPDU from its parts and send it with send_apdu()."""
+        return self.send_apdu(CommandAPDU(cla, ins, p1, p2, bytes(data), le))
+
+    def send_apdu(self, command: CommandAPDU) -> ResponseAPDU:
+        """
+        Send a command, choosing the encoding from the payload size: short
+        APDU, extended-length APDU when the card supports it, otherwise
+        ISO 7816-4 command chaining. Responses are collected as in transmit().
+        """
+        data, le = command.data, command.le
+        if len(data) <= SHORT_MAX_LC and (le is None or le <= SHORT_MAX_LE):
+            return self.transmit(command.encode())
+        if self.supports_extended:
+            return self.transmit(command.encode(extended=True))
+
+        # Longer Le is handled by 61xx collection; Le=0 asks for as much as possible.
+        if le is not None and le > SHORT_MAX_LE:
+            le = SHORT_MAX_LE
+        if not self.session:
+            self.connect()
+        view = memoryview(data)
+        with self.session.lock:
+            last = (len(data) - 1) // SHORT_MAX_LC * SHORT_MAX_LC
+            for off in range(0, last, SHORT_MAX_LC):
+                chunk = command._replace(cla=command.cla | CLA_CHAINING, data=bytes(view[off:off + SHORT_MAX_LC]), le=None)
+                response = self.transmit(chunk.encode())
+                if not response.ok:
+                    return response
+            return self.transmit(command._replace(data=bytes(view[last:]), le=le).encode())
+
+    def select(self, aid: BytesLike, get_response_ins: int = None) -> ResponseAPDU:
+        """
+        SELECT an applet by AID. The SELECT is skipped (and the original
+        response returned) when that applet is already active on this card
+        session and nothing else can have changed it: the session is
+        exclusive or inside a held transaction(). On a shared connection
+        the SELECT is always sent.
+        get_response_ins: instruction the applet uses to continue 61xx responses
+        (defaults to GET RESPONSE, OATH uses SEND REMAINING).
+        """
+        if not self.session:
+            self.connect()
+        aid = bytes(aid)
+        session = self.session
+        with session.lock:
+            if session.selected is not None and session.selected[0] == aid and session.owns_card:
+                return session.selected[1]
+            response = self.send(0x00, 0xA4, 0x04, 0x00, aid)
+            if response.sw1 == 0x90:
+                session.selected = (aid, response)
+                session.get_response_ins = get_response_ins or INS_GET_RESPONSE
+            return response
+
+    @contextmanager
+    def transaction(self):
+        """
+        Hold the card exclusively (SCardBeginTransaction) for several APDUs.
+        Nested use is a no-op; connections without a PC/SC handle are only
+        serialized by the session lock.
+        """
+        if not self.session:
+            self.connect()
+        session = self.session
+        with session.lock:
+            hcard = _hcard(session.connection) if session.transaction_depth == 0 else None
+            began = False
+            if hcard is not None:
+                from smartcard import scard
+                began = scard.SCardBeginTransaction(hcard) == scard.SCARD_S_SUCCESS
+            outermost = session.transaction_depth == 0
+            if outermost:
+                if not session.owns_card:
+                    # Another client may have selected a different applet since our last command.
+                    session.selected = None
+                session.transaction_held = began
+            session.transaction_depth += 1
+            try:
+                yield self
+            finally:
+                session.transaction_depth -= 1
+                if outermost:
+                    session.transaction_held = False
+                if began:
+                    scard.SCardEndTransaction(hcard, scard.SCARD_LEAVE_CARD)
+
+    def transmit_many(self, steps: Sequence[Union[APDUStep, CommandAPDU, BytesLike, List[int]]],
+                      on_error: str = STOP,
+                      progress: Optional[Callable[[StepResult], None]] = None) -> BatchResult:
+        """
+        Run a script of APDUs inside one card transaction and return a
+        StepResult (response, timing, verdict) per executed step. Plain APDUs
+        are wrapped in an APDUStep expecting 9000. With STOP, the first
+        unexpected status or transport error ends the script. `progress` is
+        called with each StepResult as it completes.
+        """
+        batch = BatchResult()
+        started = time.perf_counter()
+        with self.transaction():
+            for step in steps:
+                if not isinstance(step, APDUStep):
+                    step = APDUStep(step)
+                t0 = time.perf_counter()
+                try:
+                    if isinstance(step.apdu, CommandAPDU) and step.collect:
+                        response = self.send_apdu(step.apdu)
+                    else:
+                        apdu = step.apdu.encode(self.supports_extended) if isinstance(step.apdu, CommandAPDU) else step.apdu
+                        response = self.transmit(apdu, collect=step.collect)
+                    result = StepResult(step, response, time.perf_counter() - t0, step.accepts(response))
+                except Exception as e:
+                    result = StepResult(step, None, time.perf_counter() - t0, False, str(e) or type(e).__name__)
+                batch.results.append(result)
+                if progress:
+                    progress(result)
+                if not result.ok and (step.on_error or on_error) == STOP:
+                    batch.completed = False
+                    break
+        batch.elapsed = time.perf_counter() - started
+        return batch
@@ -4,6 +4,36 @@ import sys
 from dataclasses import asdict
 from pkcommon.core import PicoKeyDiscovery
 
+APPLET_LABELS = {"management": "Management", "otp": "OTP", "oath": "OATH", "fido": "FIDO2 (SC)", "openpgp": "OpenPGP"}
+
+def print_inspection(result):
+    """Text rendering of an inspection.DeviceInspection."""
+    if result.error:
+        print(f"   [!] Inspection failed: {result.error}")
+    for name, applet in result.applets.items():
+        label = APPLET_LABELS.get(name, name)
+        t = applet.elapsed * 1000
+        if applet.blocked:
+            print(f"   [!] {label}: Active but blocked by OS")
+        elif not applet.present:
+            continue
+        elif name == "management":
+            print(f"   [+] {label}: Version {applet.version} ({t:.1f}ms)")
+        elif name == "oath":
+            codes = result.oath_codes or {}
+            acc_str = f" ({len(codes)} accounts)" if codes else ""
+            print(f"   [+] {label}: Present ({t:.1f}ms){acc_str}")
+            for acc, code in codes.items():
+                print(f"       - {acc}: {code}")
+        else:
+            print(f"   [+] {label}: Present ({t:.1f}ms)")
+    if result.device.has_vendor_interface:
+        print(f"   [*] Vendor Interface: Detected (Class 255)")
+    if result.fido:
+        opts = result.fido.options
+        print(f"   [+] FIDO2 (HID): Protocol {', '.join(result.fido.versions)}")
+        print(f"       Options: rk={opts.get('rk')}, up={opts.get('up')}, uv={opts.get('uv')}, plat={opts.get('plat')}")
+
 def main():
     parser = argparse.ArgumentParser(description="PicoKey SDK CLI Tool")
     parser.add_argument("--list", action="store_true", help="List all connected PicoKey devices")
@@ -14,17 +44,29 @@ def main():
     parser.add_argument("--oath-delete", metavar="LABEL", help="Delete OATH account")
     parser.add_argument("--oath-list", action="store_true", help="List OATH account labels")
     parser.add_argument("--oath-reset", action="store_true", help="Factory reset OATH applet (destroys all data)")
+    parser.add_argument("--oath-import", metavar="FILE", help="Bulk import OATH accounts from otpauth:// URIs or CSV ('-' for stdin)")
     parser.add_argument("--fido-info", action="store_true", help="Show FIDO2/CTAP2 device information")
     parser.add_argument("--verbose", action="store_true", help="Show raw APDU communication")
+    parser.add_argument("--all", action="store_true", help="Apply OATH operations to every connected device in parallel")
+    parser.add_argument("--backend", action="append", metavar="NAME",
+                        help="Discovery backend(s) to use: usb, pcsc, ctap (repeatable or comma-separated; default: all)")
+    parser.add_argument("--record", metavar="FILE", help="Record the shell session's APDU exchanges to an NDJSON trace")
 
 
 
     parser.add_argument("--json", action="store_true", help="Output in JSON format")
     
     args = parser.parse_args()
+
+    backends = None
+    if args.backend:
+        backends = [b.strip() for value in args.backend for b in value.split(",") if b.strip()]
+        unknown = [b for b in backends if b not in PicoKeyDiscovery.BACKENDS]
+        if unknown:
+            parser.error(f"unknown backend(s): {', '.join(unknown)} (choose from {', '.join(PicoKeyDiscovery.BACKENDS)})")
     
     if args.shell:
-        discovery = PicoKeyDiscovery()
+        discovery = PicoKeyDiscovery(backends=backends)
         devices = [d for d in discovery.list_devices() if d.path or d.atr]
         if not devices:
             print("No smartcard-capable devices found.")
@@ -33,7 +75,14 @@ def main():
         dev = devices[0]
         print(f"Entering shell for: {dev.product_name}")
         from pkcommon.apdu import APDUTransport
-        transport = APDUTransport(dev.path if dev.path else dev.product_name, verbose=True)
+        trace_file = None
+        if args.record:
+            from pkcommon.trace import APDURecorder, RecordingTransport
+            trace_file = open(args.record, "w", encoding="utf-8")
+            transport = RecordingTransport(dev.path if dev.path else dev.product_name,
+                                           APDURecorder(stream=trace_file), verbose=True)
+        else:
+            transport = APDUTransport(dev.path if dev.path else dev.product_name, verbose=True)
         try:
             transport.connect()
             print("Type hex APDU (e.g., '00A4040008A000000527471117') or 'exit'.")
@@ -44,8 +93,7 @@ def main():
                 if not line:
                     continue
                 try:
-                    apdu = [int(line[i:i+2], 16) for i in range(0, len(line), 2)]
-                    transport.transmit(apdu)
+                    transport.transmit(bytes.fromhex(line))
                 except ValueError:
                     print("Error: Invalid hex string.")
                 except Exception as e:
@@ -53,226 +101,194 @@ def main():
             transport.disconnect()
         except Exception as e:
             print(f"Connection failed: {e}")
+        finally:
+            if trace_file:
+                trace_file.close()
+                print(f"Trace written to {args.record}")
         return
 
     if args.monitor:
-        import time
-        discovery = PicoKeyDiscovery()
-        last_devs = {}
+        from pkcommon.monitor import DeviceMonitor, EventType
+        monitor = DeviceMonitor(PicoKeyDiscovery(backends=backends), initial=True)
         print("Monitoring for PicoKey devices... (Press Ctrl+C to stop)")
         try:
-            while True:
-                devs = discovery.list_devices()
-                current_keys = { (d.vendor_id, d.product_id, d.serial_number): d.product_name for d in devs }
-                
-                new_keys = set(current_keys.keys()) - set(last_devs.keys())
-                removed_keys = set(last_devs.keys()) - set(current_keys.keys())
-                
-                for k in new_keys:
-                    print(f"[+] Connected: {current_keys[k]} (VID:PID={k[0]:04x}:{k[1]:04x} SN={k[2] or 'N/A'})")
-                for k in removed_keys:
-                    print(f"[-] Disconnected: {last_devs[k]} (VID:PID={k[0]:04x}:{k[1]:04x} SN={k[2] or 'N/A'})")
-                
-                last_devs = current_keys
-                time.sleep(1)
+            for event in monitor.events():
+                d = event.device
+                if event.type in (EventType.CONNECTED, EventType.DISCONNECTED):
+                    sign, verb = ("+", "Connected") if event.type == EventType.CONNECTED else ("-", "Disconnected")
+                    print(f"[{sign}] {verb}: {d.product_name} (VID:PID={d.vendor_id:04x}:{d.product_id:04x} SN={d.serial_number or 'N/A'})")
+                elif event.type == EventType.CARD_INSERTED:
+                    print(f"[*] Card inserted: {event.reader} (ATR={event.atr or 'N/A'})")
+                else:
+                    print(f"[*] Card removed: {event.reader}")
         except KeyboardInterrupt:
+            monitor.stop()
             print("\nMonitoring stopped.")
         return
 
-    if args.oath_add or args.oath_delete or args.oath_list or args.oath_reset:
-        discovery = PicoKeyDiscovery()
+    if args.oath_add or args.oath_delete or args.oath_list or args.oath_reset or args.oath_import:
+        credentials = []
+        if args.oath_import:
+            from pkcommon.oath_import import iter_import_rows
+            stream = sys.stdin if args.oath_import == "-" else open(args.oath_import, encoding="utf-8")
+            try:
+                for row in iter_import_rows(stream):
+                    if row.error:
+                        print(f"Skipping line {row.line}: {row.error}")
+                    else:
+                        credentials.append(row.credential)
+            finally:
+                if stream is not sys.stdin:
+                    stream.close()
+            if not credentials:
+                print("No valid accounts to import.")
+                return
+
+        discovery = PicoKeyDiscovery(backends=backends)
         devices = [d for d in discovery.list_devices() if d.path or d.atr]
         if not devices:
             print("No smartcard-capable devices found.")
             return
-        
-        dev = devices[0]
-        from pkcommon.apdu import APDUTransport
+        if not args.all:
+            devices = devices[:1]
+
+        reset_confirmed = False
+        if args.oath_reset:
+            target = f"{len(devices)} device(s)" if args.all else "the OATH applet"
+            confirm = input(f"Are you sure you want to reset {target}? All accounts will be lost! [y/N]: ")
+            reset_confirmed = confirm.lower() == 'y'
+
+        from pkcommon.fleet import FleetExecutor
         from pkcommon.modules import OATHModule
-        transport = APDUTransport(dev.path if dev.path else dev.product_name, verbose=args.verbose)
-        try:
-            transport.connect()
+
+        def oath_operation(dev, transport):
+            # Collect output per device so parallel runs do not interleave.
+            lines = []
             oath = OATHModule(transport)
             if not oath.select():
-                print("Failed to select OATH applet.")
-                return
+                lines.append("Failed to select OATH applet.")
+                return lines
             
             if args.oath_list:
                 accounts = oath.list_accounts()
-                print(f"OATH Accounts ({len(accounts)}):")
+                lines.append(f"OATH Accounts ({len(accounts)}):")
                 for acc in accounts:
-                    print(f" - {acc}")
+                    lines.append(f" - {acc}")
 
             if args.oath_add:
                 label, secret = args.oath_add
                 if oath.put_account(label, secret):
-                    print(f"Successfully added account: {label}")
+                    lines.append(f"Successfully added account: {label}")
                 else:
-                    print(f"Failed to add account: {label}")
+                    lines.append(f"Failed to add account: {label}")
             
             if args.oath_delete:
                 label = args.oath_delete
                 if oath.delete_account(label):
-                    print(f"Successfully deleted account: {label}")
+                    lines.append(f"Successfully deleted account: {label}")
+                else:
+                    lines.append(f"Failed to delete account: {label}")
+
+            if reset_confirmed:
+                if oath.reset():
+                    lines.append("Successfully reset OATH applet.")
                 else:
-                    print(f"Failed to delete account: {label}")
+                    lines.append("Failed to reset OATH applet.")
+
+            if credentials:
+                done = []
 
-            if args.oath_reset:
-                confirm = input("Are you sure you want to reset the OATH applet? All accounts will be lost! [y/N]: ")
-                if confirm.lower() == 'y':
-                    if oath.reset():
-                        print("Successfully reset OATH applet.")
+                def report_progress(result):
+                    done.append(result)
+                    status = "ok" if result.ok else f"FAILED ({result.error})"
+                    line = f"[{len(done)}/{len(credentials)}] {result.label}: {status}"
+                    if args.all:
+                        lines.append(line)
                     else:
-                        print("Failed to reset OATH applet.")
-                    
-            transport.disconnect()
-        except Exception as e:
-            print(f"OATH Operation failed: {e}")
+                        print(line)
+
+                results = oath.put_accounts(credentials, progress=report_progress)
+                imported = sum(1 for r in results if r.ok)
+                lines.append(f"Imported {imported}/{len(results)} account(s).")
+            return lines
+
+        report = FleetExecutor(verbose=args.verbose).run(devices, oath_operation)
+        for r in report.results:
+            if args.all:
+                print(f"== {r.device.product_name} (SN={r.device.serial_number or 'N/A'}) [{r.elapsed * 1000:.0f}ms]")
+            if r.ok:
+                for line in r.result:
+                    print(line)
+            else:
+                print(f"OATH Operation failed: {r.error}")
+        if args.all:
+            print(f"{len(report.succeeded)}/{len(report.results)} device(s) succeeded in {report.elapsed * 1000:.0f}ms")
         return
 
     if args.fido_info:
-        from pkcommon.ctap import CTAPDiscovery, CTAPModule
-        devices = CTAPDiscovery.find_all_picokeys()
-        if not devices:
-            print("No PicoKey FIDO devices found.")
-            return
-        
-        # We need the actual CtapHidDevice for CTAPModule
-        from fido2.hid import CtapHidDevice
-        hid_devs = list(CtapHidDevice.list_devices())
-        if not hid_devs:
-            print("No HID devices accessible.")
-            return
-            
-        print(f"FIDO2/CTAP2 Information for {len(hid_devs)} device(s):")
-        for dev in hid_devs:
-            try:
-                mod = CTAPModule(dev)
-                caps = mod.get_capabilities()
-                print(f" - Device: {dev.descriptor.product_name} ({dev.descriptor.path})")
+        from pkcommon.ctap import CTAPDevicePool, info_capabilities
+        with CTAPDevicePool() as pool:
+            # One handle per device, all queried in parallel.
+            results = pool.get_info_many()
+            if not results:
+                print("No PicoKey FIDO devices found.")
+                return
+
+            print(f"FIDO2/CTAP2 Information for {len(results)} device(s):")
+            for r in results:
+                desc = pool.descriptor(r.path) if r.ok else None
+                print(f" - Device: {desc.product_name if desc else 'Unknown'} ({r.path})")
+                if not r.ok:
+                    print(f"   [!] Failed to get info: {r.error}")
+                    continue
+                caps = info_capabilities(r.info)
                 print(f"   Versions: {', '.join(caps['versions'])}")
                 print(f"   Extensions: {', '.join(caps['extensions'])}")
                 print(f"   Options: rk={caps['rk']}, up={caps['up']}, uv={caps['uv']}, plat={caps['plat']}")
-            except Exception as e:
-                print(f"   [!] Failed to get info: {e}")
         return
 
 
 
     if args.list or args.inspect:
 
-        discovery = PicoKeyDiscovery()
+        discovery = PicoKeyDiscovery(backends=backends)
         devices = discovery.list_devices()
-        
+
+        if args.verbose and not args.json:
+            for name, result in discovery.last_results.items():
+                status = "ok" if result.ok else result.error
+                print(f"[discovery] {name}: {len(result.devices)} device(s) in {result.elapsed * 1000:.1f}ms ({status})")
+
+        report = None
+        if args.inspect:
+            from pkcommon.inspection import Inspector
+            report = Inspector(verbose=args.verbose).inspect(devices)
+
         if args.json:
-            json_output = []
-            from pkcommon.apdu import APDUTransport # Moved here for scope
-            from pkcommon.modules import ManagementModule, YubicoModule, OATHModule, OpenPGPModule # Moved here for scope
-            for d in devices:
-                output = asdict(d)
-                if args.inspect and (d.atr or (d.path and "CCID" in d.path)):
-                    transport = APDUTransport(d.path if d.path else d.product_name, verbose=args.verbose)
-                    try:
-                        transport.connect()
-                        output["applets"] = {
-                            "management": ManagementModule(transport).select(),
-                            "otp": YubicoModule(transport).select(),
-                            "oath": OATHModule(transport).select(),
-                            "openpgp": OpenPGPModule(transport).select(),
-                        }
-                        transport.disconnect()
-                    except Exception: # Catch specific exceptions if possible, or log them
-                        output["applets"] = None # Indicate inspection failed for applets
-                json_output.append(output)
-            print(json.dumps(json_output, indent=2))
+            if report is not None:
+                print(json.dumps(report.to_dict(), indent=2))
+            else:
+                print(json.dumps([dict(asdict(d), interfaces=d.interfaces) for d in devices], indent=2))
         else:
             if not devices:
                 print("No PicoKey devices found.")
             else:
                 print(f"Found {len(devices)} device(s):")
-                for d in devices:
+                inspections = report.devices if report is not None else [None] * len(devices)
+                for d, result in zip(devices, inspections):
                     vid_pid = f"{d.vendor_id:04x}:{d.product_id:04x}"
                     sn = d.serial_number or "N/A"
                     print(f" - [{d.product_name}] VID:PID={vid_pid} SN={sn}")
+                    interfaces = ", ".join(d.interfaces) or "none"
+                    print(f"   Interfaces: {interfaces}" + (f" (USB port {d.port_path})" if d.port_path else ""))
                     if d.atr:
                         print(f"   ATR: {d.atr}")
-                    
-                    if args.inspect and (d.atr or (d.path and "CCID" in d.path)):
-                        from pkcommon.apdu import APDUTransport
-                        from pkcommon.modules import ManagementModule, YubicoModule, OATHModule, OpenPGPModule, FIDOModule
-                        
-                        import time
-                        transport = APDUTransport(d.path if d.path else d.product_name, verbose=args.verbose)
-                        try:
-                            transport.connect()
-                            
-                            def benchmark_select(mod):
-                                start = time.time()
-                                res = mod.select()
-                                end = time.time()
-                                return res, (end - start) * 1000
-
-                            # Check Management
-                            mgmt = ManagementModule(transport)
-                            ver, t = benchmark_select(mgmt)
-                            if ver:
-                                print(f"   [+] Management: Version {ver} ({t:.1f}ms)")
-                            
-                            # Check OTP
-                            otp = YubicoModule(transport)
-                            ok, t = benchmark_select(otp)
-                            if ok:
-                                print(f"   [+] OTP: Present ({t:.1f}ms)")
-                                
-                            # Check OATH
-                            oath = OATHModule(transport)
-                            ok, t = benchmark_select(oath)
-                            if ok:
-                                codes = oath.calculate_all()
-                                acc_str = f" ({len(codes)} accounts)" if codes else ""
-                                print(f"   [+] OATH: Present ({t:.1f}ms){acc_str}")
-                                for acc, code in codes.items():
-                                    print(f"       - {acc}: {code}")
-
-                                
-                            # Check FIDO2 (APDU)
-                            fido = FIDOModule(transport)
-                            try:
-                                ok, t = benchmark_select(fido)
-                                if ok:
-                                    print(f"   [+] FIDO2 (SC): Present ({t:.1f}ms)")
-                            except Exception as e:
-                                if "Acesso negado" in str(e):
-                                    print(f"   [!] FIDO2 (SC): Active but blocked by OS")
-                                
-                            # Check OpenPGP
-                            pgp = OpenPGPModule(transport)
-                            ok, t = benchmark_select(pgp)
-                            if ok:
-                                print(f"   [+] OpenPGP: Present ({t:.1f}ms)")
-
-                                
-                            transport.disconnect()
-                        except Exception as e:
-                            print(f"   [!] Inspection failed: {e}")
-                    
-                    if d.has_vendor_interface:
+                    if result is not None:
+                        print_inspection(result)
+                    elif d.has_vendor_interface:
                         print(f"   [*] Vendor Interface: Detected (Class 255)")
-
-                    # Check for FIDO HID info if it's a FIDO-capable device
-                    from fido2.hid import CtapHidDevice
-                    for hid_dev in CtapHidDevice.list_devices():
-                        if hid_dev.descriptor.vendor_id == d.vendor_id and hid_dev.descriptor.product_id == d.product_id:
-                            try:
-                                from pkcommon.ctap import CTAPModule
-                                mod = CTAPModule(hid_dev)
-                                caps = mod.get_capabilities()
-                                print(f"   [+] FIDO2 (HID): Protocol {', '.join(caps['versions'])}")
-                                print(f"       Options: rk={caps['rk']}, up={caps['up']}, uv={caps['uv']}, plat={caps['plat']}")
-                                break # Found the matching HID side
-                            except:
-                                pass
-
+                if report is not None and args.verbose:
+                    print(f"Inspected {len(report.devices)} device(s) in {report.elapsed * 1000:.1f}ms")
 
     else:
         parser.print_help()
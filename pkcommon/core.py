@@ -1,5 +1,8 @@
-from dataclasses import dataclass
-from typing import List, Optional
+import queue
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, Iterable, List, Optional
 
 @dataclass
 class PicoKeyDevice:
@@ -10,13 +13,44 @@ class PicoKeyDevice:
     product_name: Optional[str] = None
     firmware_version: Optional[str] = None
     manufacturer: Optional[str] = None
-    path: Optional[str] = None
+    path: Optional[str] = None  # PC/SC reader name
     atr: Optional[str] = None
     has_vendor_interface: bool = False
+    bus: Optional[int] = None
+    address: Optional[int] = None
+    port_path: Optional[str] = None  # USB topology, e.g. "1-2.3"
+    hid_path: Optional[str] = None  # FIDO/CTAP HID device path
+
+    @property
+    def interfaces(self) -> List[str]:
+        """Interfaces found for this key: "usb", "pcsc", "ctap", "vendor"."""
+        found = []
+        if self.bus is not None:
+            found.append("usb")
+        if self.path:
+            found.append("pcsc")
+        if self.hid_path:
+            found.append("ctap")
+        if self.has_vendor_interface:
+            found.append("vendor")
+        return found
 
     def __repr__(self) -> str:
         return f"PicoKeyDevice(name='{self.product_name}', sn='{self.serial_number}', fw='{self.firmware_version}')"
 
+@dataclass
+class BackendResult:
+    """Outcome of a single discovery backend run."""
+    name: str
+    devices: List[PicoKeyDevice] = field(default_factory=list)
+    elapsed: float = 0.0
+    error: Optional[str] = None
+    timed_out: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
 class PicoKeyDiscovery:
     """Handles discovery of PicoKey devices across different backends."""
     
@@ -24,46 +58,214 @@ class PicoKeyDiscovery:
     # We should define a list of known VIDs/PIDs or use a registry.
     PICOKEY_VIDS = [0x20a0, 0x1d50, 0x10c4] # placeholder VIDs for now
 
-    def __init__(self):
-        pass
+    BACKENDS = ("usb", "pcsc", "ctap")
+
+    def __init__(self, timeout: float = 5.0, backend_timeouts: Optional[Dict[str, float]] = None,
+                 cache_ttl: float = 0.0, backends: Optional[Iterable[str]] = None):
+        """
+        backends: subset of BACKENDS to use, e.g. ["pcsc"]. Only the selected
+            backends are imported (on first use); None uses all of them.
+        timeout: seconds each backend may run before its results are dropped.
+        backend_timeouts: per-backend overrides, e.g. {"pcsc": 10.0}.
+        cache_ttl: seconds a scan result is reused while the bus topology is
+            unchanged. 0 disables the cache.
+        """
+        if backends is None:
+            self.backends = self.BACKENDS
+        else:
+            self.backends = tuple(backends)
+            unknown = [b for b in self.backends if b not in self.BACKENDS]
+            if unknown or not self.backends:
+                raise ValueError(f"Unknown discovery backend(s): {', '.join(unknown) or '(none)'}; "
+                                 f"choose from {', '.join(self.BACKENDS)}")
+        self.timeout = timeout
+        self.backend_timeouts = dict(backend_timeouts or {})
+        self.cache_ttl = cache_ttl
+        self.last_results: Dict[str, BackendResult] = {}
+        self._cache: Optional[List[PicoKeyDevice]] = None
+        self._cache_time = 0.0
+        self._cache_topology = None
+        self._cache_lock = threading.Lock()
+
+    @staticmethod
+    def _load_backend(name: str):
+        """Import a backend on demand and return its discovery class."""
+        if name == "usb":
+            from .discovery import USBDiscovery
+            return USBDiscovery
+        if name == "pcsc":
+            from .apdu import SmartcardDiscovery
+            return SmartcardDiscovery
+        if name == "ctap":
+            from .ctap import CTAPDiscovery
+            return CTAPDiscovery
+        raise ValueError(f"Unknown discovery backend: {name}")
+
+    def _run_backend(self, name: str) -> BackendResult:
+        start = time.monotonic()
+        try:
+            devices = self._load_backend(name).find_all_picokeys()
+            return BackendResult(name, devices, time.monotonic() - start)
+        except Exception as e:
+            return BackendResult(name, elapsed=time.monotonic() - start, error=str(e) or type(e).__name__)
+
+    def scan(self) -> Dict[str, BackendResult]:
+        """
+        Run the selected backends concurrently and return their raw results by name.
+        A backend that fails or exceeds its timeout yields an empty result
+        with `error` set; the others are still returned.
+        """
+        # Daemon threads: a backend stuck in a driver call (e.g. SCardConnect)
+        # must not keep the interpreter from exiting once its results are dropped.
+        done: "queue.Queue[BackendResult]" = queue.Queue()
+        started = time.monotonic()
+        deadlines = {name: started + self.backend_timeouts.get(name, self.timeout) for name in self.backends}
+        for name in self.backends:
+            threading.Thread(target=lambda name=name: done.put(self._run_backend(name)),
+                             name=f"pk-discovery-{name}", daemon=True).start()
+        finished: Dict[str, BackendResult] = {}
+        while len(finished) < len(self.backends):
+            now = time.monotonic()
+            for name in self.backends:
+                if name not in finished and deadlines[name] <= now:
+                    finished[name] = BackendResult(name, elapsed=now - started, error="timed out", timed_out=True)
+            pending = [deadlines[name] for name in self.backends if name not in finished]
+            if not pending:
+                break
+            try:
+                result = done.get(timeout=max(0.0, min(pending) - now))
+            except queue.Empty:
+                continue
+            finished.setdefault(result.name, result)
+        results = {name: finished[name] for name in self.backends}
+        self.last_results = results
+        return results
+
+    @property
+    def timings(self) -> Dict[str, float]:
+        """Seconds taken by each backend during the last scan."""
+        return {name: r.elapsed for name, r in self.last_results.items()}
+
+    def topology(self):
+        """
+        Cheap fingerprint of what is plugged in: USB bus/address set, PC/SC
+        reader list and HID paths. Backends that cannot be probed contribute
+        their error type, so a missing stack does not defeat the cache.
+        """
+        parts = []
+        for name in self.backends:
+            try:
+                parts.append((name, self._load_backend(name).topology()))
+            except Exception as e:
+                parts.append((name, f"error:{type(e).__name__}"))
+        return tuple(parts)
 
     def list_devices(self) -> List[PicoKeyDevice]:
         """List and merge all connected PicoKey devices."""
-        from .discovery import USBDiscovery
-        from .apdu import SmartcardDiscovery
-        from .ctap import CTAPDiscovery
-        
-        raw_usb = USBDiscovery.find_all_picokeys()
-        raw_sc = SmartcardDiscovery.find_all_picokeys()
-        raw_ctap = CTAPDiscovery.find_all_picokeys()
-        
-        merged = {}
-        
-        # Start with USB devices as the base (reliable VID/PID)
-        for dev in raw_usb:
-            key = (dev.vendor_id, dev.product_id, dev.serial_number)
-            merged[key] = dev
-            
-        # Merge Smartcard info
-        for sc_dev in raw_sc:
-            # Try to find a matching USB device
-            match_found = False
-            for key, usb_dev in merged.items():
-                if usb_dev.product_name and "Pico" in sc_dev.product_name:
-                    # In a real tool, we might check reader indices vs USB ports
-                    # For now, if we have one USB Pico and one SC Pico, they are likely the same
-                    usb_dev.path = sc_dev.path # Store the reader path
-                    usb_dev.atr = sc_dev.atr
-                    # has_vendor_interface is already set from USB discovery
-                    match_found = True
-                    break
-            
-            if not match_found:
-                key = (0, 0, sc_dev.product_name)
-                merged[key] = sc_dev
-
-        return list(merged.values())
+        if self.cache_ttl <= 0:
+            return self._scan_and_merge()
+
+        with self._cache_lock:
+            if self._cache is not None and time.monotonic() - self._cache_time < self.cache_ttl:
+                if self.topology() == self._cache_topology:
+                    return [replace(d) for d in self._cache]
+            return self._refresh_locked()
+
+    def refresh(self) -> List[PicoKeyDevice]:
+        """Force a full rescan, replacing any cached result."""
+        if self.cache_ttl <= 0:
+            return self._scan_and_merge()
+        with self._cache_lock:
+            return self._refresh_locked()
+
+    def invalidate(self):
+        """Drop the cached result so the next lookup rescans."""
+        with self._cache_lock:
+            self._cache = None
+
+    def _refresh_locked(self) -> List[PicoKeyDevice]:
+        # Fingerprint before scanning so a change during the scan is caught next time.
+        topology = self.topology()
+        devices = self._scan_and_merge()
+        self._cache = devices
+        self._cache_time = time.monotonic()
+        self._cache_topology = topology
+        return [replace(d) for d in devices]
+
+    def _scan_and_merge(self) -> List[PicoKeyDevice]:
+        results = self.scan()
+        empty = BackendResult("")
+        return self._merge(
+            results.get("usb", empty).devices,
+            results.get("pcsc", empty).devices,
+            results.get("ctap", empty).devices,
+        )
+
+    def _merge(self, raw_usb: List[PicoKeyDevice], raw_sc: List[PicoKeyDevice],
+               raw_ctap: List[PicoKeyDevice]) -> List[PicoKeyDevice]:
+        """
+        Join the backend results into one PicoKeyDevice per physical key.
+        CTAP and PC/SC entries are matched to USB devices through indexes on
+        the USB port path and the serial number (taken from the HID descriptor
+        or the reader name); when exactly one entry and one candidate remain
+        unmatched they are paired. Anything left over is listed on its own.
+        Runs in linear time and does not modify the inputs.
+        """
+        merged = [replace(d) for d in raw_usb]
+        by_port: Dict[str, PicoKeyDevice] = {}
+        by_serial: Dict[str, PicoKeyDevice] = {}
+
+        def index(dev: PicoKeyDevice):
+            if dev.port_path:
+                by_port.setdefault(dev.port_path, dev)
+            if dev.serial_number:
+                by_serial.setdefault(dev.serial_number, dev)
+
+        for dev in merged:
+            index(dev)
+
+        def same_ids(a: PicoKeyDevice, b: PicoKeyDevice) -> bool:
+            # PC/SC entries carry no VID/PID (0, 0); only compare when both are known.
+            return not (a.vendor_id and b.vendor_id) or (a.vendor_id, a.product_id) == (b.vendor_id, b.product_id)
+
+        def join(raw: List[PicoKeyDevice], has_interface: Callable[[PicoKeyDevice], bool],
+                 attach: Callable[[PicoKeyDevice, PicoKeyDevice], None]):
+            leftovers = []
+            for dev in raw:
+                target = by_port.get(dev.port_path) if dev.port_path else None
+                if target is None and dev.serial_number:
+                    target = by_serial.get(dev.serial_number)
+                if target is not None and not has_interface(target) and same_ids(target, dev):
+                    attach(target, dev)
+                else:
+                    leftovers.append(dev)
+            if len(leftovers) == 1:
+                free = [d for d in merged if not has_interface(d) and same_ids(d, leftovers[0])]
+                if len(free) == 1 and not (free[0].serial_number and leftovers[0].serial_number):
+                    attach(free[0], leftovers.pop())
+            for dev in leftovers:
+                dev = replace(dev)
+                merged.append(dev)
+                index(dev)
+
+        def attach_ctap(target: PicoKeyDevice, dev: PicoKeyDevice):
+            target.hid_path = dev.hid_path
+            target.port_path = target.port_path or dev.port_path
+            target.serial_number = target.serial_number or dev.serial_number
+            if not target.vendor_id:
+                target.vendor_id, target.product_id = dev.vendor_id, dev.product_id
+            index(target)
+
+        def attach_sc(target: PicoKeyDevice, dev: PicoKeyDevice):
+            target.path = dev.path
+            target.atr = dev.atr
+            target.serial_number = target.serial_number or dev.serial_number
+            target.product_name = target.product_name or dev.product_name
+            index(target)
 
+        join(raw_ctap, lambda d: d.hid_path is not None, attach_ctap)
+        join(raw_sc, lambda d: d.path is not None, attach_sc)
+        return merged
 
     def _discover_hid(self) -> List[PicoKeyDevice]:
         """Discover devices using HID backend (FIDO/CTAP)."""
@@ -1,46 +1,415 @@
-from fido2.hid import CtapHidDevice
-from fido2.ctap2 import Ctap2
-from typing import List, Optional
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 from .core import PicoKeyDevice
+from .metrics import Metrics
+
+if TYPE_CHECKING:
+    from fido2.ctap2 import Ctap2
+    from fido2.hid import CtapHidDevice
+
+_PORT_PATH = re.compile(r"^\d+-\d+(\.\d+)*$")
+
+def hid_port_path(path) -> Optional[str]:
+    """USB port path ("1-2.3") of a Linux hidraw node, from sysfs; None elsewhere."""
+    path = str(path)
+    if not path.startswith("/dev/hidraw"):
+        return None
+    try:
+        node = os.path.realpath(f"/sys/class/hidraw/{os.path.basename(path)}/device")
+    except OSError:
+        return None
+    while node not in ("/", ""):
+        name = os.path.basename(node)
+        if _PORT_PATH.match(name):
+            return name
+        node = os.path.dirname(node)
+    return None
 
 class CTAPDiscovery:
     """Discovery for FIDO/CTAP devices."""
+
+    @staticmethod
+    def topology() -> frozenset:
+        """Cheap fingerprint of the HID device paths (no CTAPHID init)."""
+        from fido2.hid import list_descriptors
+        return frozenset(str(d.path) for d in list_descriptors())
     
     @staticmethod
     def find_all_picokeys() -> List[PicoKeyDevice]:
+        # Descriptors are enough here; opening each device would cost a CTAPHID INIT.
+        from fido2.hid import list_descriptors
         devices = []
-        for dev in CtapHidDevice.list_devices():
+        for desc in list_descriptors():
             # Filter by PicoKey descriptor if available
             # For now, we take all CTAP HID devices that might be PicoKeys
             # A more robust check would involve the descriptor info.
             devices.append(PicoKeyDevice(
-                vendor_id=dev.descriptor.vendor_id,
-                product_id=dev.descriptor.product_id,
-                serial_number=dev.descriptor.serial_number,
+                vendor_id=desc.vid,
+                product_id=desc.pid,
+                serial_number=desc.serial_number,
                 product_name="PicoKey FIDO",
-                path=dev.descriptor.path
+                port_path=hid_port_path(desc.path),
+                hid_path=str(desc.path)
             ))
         return devices
 
+class InstrumentedCtapDevice:
+    """Wraps a CtapHidDevice and records every CTAPHID call() in a Metrics instance."""
+
+    def __init__(self, device: "CtapHidDevice", metrics: Metrics):
+        self._device = device
+        self._metrics = metrics
+        self._name = str(device.descriptor.path)
+        metrics.record_connect("ctap", self._name)
+
+    def call(self, cmd: int, data: bytes = b"", event=None, on_keepalive=None) -> bytes:
+        from fido2.hid import CTAPHID
+        try:
+            op = CTAPHID(cmd).name
+        except ValueError:
+            op = f"{cmd:02X}"
+        start = time.perf_counter()
+        try:
+            response = self._device.call(cmd, data, event, on_keepalive)
+        except Exception as e:
+            self._metrics.record_error("ctap", self._name, op, e)
+            raise
+        self._metrics.record("ctap", self._name, op, time.perf_counter() - start,
+                             bytes_out=len(data), bytes_in=len(response))
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._device, name)
+
+# CTAP2 commands after which a cached authenticatorGetInfo may be out of date
+# (remaining discoverable credentials, clientPin/uv options, minPINLength, ...).
+_INFO_CHANGING = {
+    0x01,  # makeCredential
+    0x07,  # reset
+    0x09,  # bioEnrollment
+    0x0A,  # credentialManagement
+    0x0D,  # config
+    0x40,  # bioEnrollment (preview)
+    0x41,  # credentialManagement (preview)
+}
+_CLIENT_PIN = 0x06
+_PIN_CHANGING = {0x03, 0x04}  # clientPIN setPIN, changePIN
+
+def _changes_info(cmd: int, data: bytes) -> bool:
+    from fido2.hid import CTAPHID
+    if cmd != CTAPHID.CBOR or not data:
+        return False
+    if data[0] in _INFO_CHANGING:
+        return True
+    if data[0] == _CLIENT_PIN:
+        try:
+            from fido2 import cbor
+            return cbor.decode(bytes(data[1:])).get(0x02) in _PIN_CHANGING
+        except Exception:
+            return True
+    return False
+
+class _TrackedCtapDevice:
+    """Pooled handle: reports commands that may change getInfo, and transport failures, to the pool."""
+
+    def __init__(self, device, on_change: Callable[[], None], on_error: Callable[[], None]):
+        self._device = device
+        self._on_change = on_change
+        self._on_error = on_error
+
+    def call(self, cmd: int, data: bytes = b"", event=None, on_keepalive=None) -> bytes:
+        try:
+            return self._device.call(cmd, data, event, on_keepalive)
+        except OSError:
+            # The HID node is gone or unusable (unplugged, replugged, suspended).
+            self._on_error()
+            raise
+        finally:
+            if _changes_info(cmd, data):
+                self._on_change()
+
+    def __getattr__(self, name):
+        return getattr(self._device, name)
+
+def info_capabilities(info) -> dict:
+    """The capability summary of an authenticatorGetInfo response."""
+    return {
+        "rk": info.options.get("rk"),
+        "up": info.options.get("up"),
+        "uv": info.options.get("uv"),
+        "plat": info.options.get("plat"),
+        "versions": info.versions,
+        "extensions": info.extensions
+    }
+
+@dataclass
+class CTAPInfoResult:
+    """Outcome of one getInfo in CTAPDevicePool.get_info_many()."""
+    path: str
+    info: Any = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+    cached: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+class CTAPDevicePool:
+    """
+    Keeps one open CTAPHID handle per HID path and caches each
+    authenticator's parsed getInfo, keyed by (AAGUID, serial, path), so
+    repeated capability checks cost no USB round trips. Cached info is
+    dropped when the device leaves the HID enumeration (see refresh()),
+    when its handle fails, or when a command that can change it (PIN
+    set/change, reset, config, credential/bio management, makeCredential)
+    goes through a pooled handle.
+    """
+
+    def __init__(self, max_workers: int = 8, max_age: Optional[float] = None, metrics: Optional[Metrics] = None):
+        """
+        max_workers: devices queried concurrently by get_info_many().
+        max_age: seconds a cached getInfo stays valid (None = until invalidated).
+        metrics: optional metrics.Metrics recording each CTAPHID command.
+        """
+        self.max_workers = max_workers
+        self.max_age = max_age
+        self.metrics = metrics
+        self.hits = 0
+        self.misses = 0
+        self._descriptors: Dict[str, Any] = {}
+        self._handles: Dict[str, _TrackedCtapDevice] = {}
+        self._ctap2: Dict[str, "Ctap2"] = {}
+        self._keys: Dict[str, Tuple] = {}
+        self._info: Dict[Tuple, Tuple[Any, float]] = {}
+        self._device_locks: Dict[str, threading.RLock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _identity(desc) -> tuple:
+        return (desc.vid, desc.pid, desc.serial_number)
+
+    def refresh(self) -> List[str]:
+        """
+        Re-read the HID descriptors (no CTAPHID traffic) and drop handles and
+        cached info of devices that were unplugged or replaced at the same
+        path. Returns the paths present.
+        """
+        from fido2.hid import list_descriptors
+        present = {str(d.path): d for d in list_descriptors()}
+        with self._lock:
+            for path, old in list(self._descriptors.items()):
+                new = present.get(path)
+                if new is None or self._identity(new) != self._identity(old):
+                    self._discard_locked(path)
+            self._descriptors.update(present)
+        return list(present)
+
+    def descriptor(self, path: str):
+        with self._lock:
+            desc = self._descriptors.get(path)
+        if desc is None:
+            self.refresh()
+            with self._lock:
+                desc = self._descriptors.get(path)
+        if desc is None:
+            raise Exception(f"CTAP HID device {path} not found")
+        return desc
+
+    def descriptors(self) -> list:
+        """Descriptors of the devices present now."""
+        paths = self.refresh()
+        with self._lock:
+            return [self._descriptors[p] for p in paths if p in self._descriptors]
+
+    def _device_lock(self, path: str) -> threading.RLock:
+        with self._lock:
+            return self._device_locks.setdefault(path, threading.RLock())
+
+    def device(self, path: str):
+        """The pooled handle for `path`, opened (CTAPHID INIT) on first use."""
+        with self._device_lock(path):
+            with self._lock:
+                handle = self._handles.get(path)
+            if handle is not None:
+                return handle
+            from fido2.hid import CtapHidDevice, open_connection
+            desc = self.descriptor(path)
+            device = CtapHidDevice(desc, open_connection(desc))
+            if self.metrics is not None:
+                device = InstrumentedCtapDevice(device, self.metrics)
+            handle = _TrackedCtapDevice(device, on_change=lambda: self.invalidate(path),
+                                        on_error=lambda: self.discard(path))
+            with self._lock:
+                self._handles[path] = handle
+            return handle
+
+    def ctap2(self, path: str) -> "Ctap2":
+        """Shared Ctap2 session for `path`; creating it fetches (and caches) getInfo."""
+        with self._device_lock(path):
+            with self._lock:
+                ctap2 = self._ctap2.get(path)
+            if ctap2 is None:
+                from fido2.ctap2 import Ctap2
+                ctap2 = Ctap2(self.device(path))
+                with self._lock:
+                    self._ctap2[path] = ctap2
+                    self._store_locked(path, ctap2.info)
+            return ctap2
+
+    def _store_locked(self, path: str, info):
+        old = self._keys.pop(path, None)
+        if old is not None:
+            self._info.pop(old, None)
+        desc = self._descriptors.get(path)
+        key = (bytes(info.aaguid or b""), desc.serial_number if desc else None, path)
+        self._keys[path] = key
+        self._info[key] = (info, time.monotonic())
+
+    def _cached(self, path: str):
+        with self._lock:
+            key = self._keys.get(path)
+            entry = self._info.get(key) if key is not None else None
+        if entry is None:
+            return None
+        info, stored = entry
+        if self.max_age is not None and time.monotonic() - stored > self.max_age:
+            return None
+        return info
+
+    def _get_info(self, path: str, refresh: bool) -> Tuple[Any, bool]:
+        with self._device_lock(path):
+            info = None if refresh else self._cached(path)
+            if info is not None:
+                self.hits += 1
+                return info, True
+            self.misses += 1
+            with self._lock:
+                ctap2 = self._ctap2.get(path)
+            if ctap2 is None:
+                return self.ctap2(path).info, False
+            info = ctap2.get_info()
+            with self._lock:
+                self._store_locked(path, info)
+            return info, False
+
+    def get_info(self, path: str, refresh: bool = False):
+        """getInfo of the device at `path`, from the cache unless stale or `refresh`."""
+        return self._get_info(path, refresh)[0]
+
+    def get_info_many(self, paths: Optional[List[str]] = None, refresh: bool = False) -> List[CTAPInfoResult]:
+        """
+        getInfo for several devices (default: all present) concurrently.
+        Results keep the order of `paths`; failures are captured per device.
+        """
+        if paths is None:
+            paths = self.refresh()
+        if not paths:
+            return []
+
+        def query(path: str) -> CTAPInfoResult:
+            start = time.perf_counter()
+            try:
+                info, cached = self._get_info(path, refresh)
+                result = CTAPInfoResult(path, info, cached=cached)
+            except Exception as e:
+                result = CTAPInfoResult(path, error=str(e) or type(e).__name__)
+            result.elapsed = time.perf_counter() - start
+            return result
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(paths)),
+                                thread_name_prefix="pk-ctap") as executor:
+            return list(executor.map(query, paths))
+
+    def module(self, path: str) -> "CTAPModule":
+        return CTAPModule(path, pool=self)
+
+    def invalidate(self, path: Optional[str] = None):
+        """Forget the cached getInfo of `path` (or of every device); handles stay open."""
+        with self._lock:
+            paths = [path] if path is not None else list(self._keys)
+            for p in paths:
+                key = self._keys.pop(p, None)
+                if key is not None:
+                    self._info.pop(key, None)
+
+    def _discard_locked(self, path: str):
+        handle = self._handles.pop(path, None)
+        self._ctap2.pop(path, None)
+        self._descriptors.pop(path, None)
+        key = self._keys.pop(path, None)
+        if key is not None:
+            self._info.pop(key, None)
+        if handle is not None:
+            try:
+                handle.close()
+            except Exception:
+                pass
+
+    def discard(self, path: str):
+        """Close the handle of `path` and forget everything cached for it."""
+        with self._lock:
+            self._discard_locked(path)
+
+    def attach(self, monitor):
+        """Discard devices as a monitor.DeviceMonitor reports them disconnected."""
+        from .monitor import EventType
+
+        def on_event(event):
+            if event.type != EventType.DISCONNECTED:
+                return
+            if event.device is not None and event.device.hid_path:
+                self.discard(event.device.hid_path)
+            else:
+                self.refresh()
+
+        monitor.add_callback(on_event)
+
+    def close(self):
+        with self._lock:
+            for path in list(self._handles):
+                self._discard_locked(path)
+            self._descriptors.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
 class CTAPModule:
     """Abstraction for CTAP2 functionality."""
     
-    def __init__(self, device: CtapHidDevice):
+    def __init__(self, device, metrics: Optional[Metrics] = None, pool: Optional[CTAPDevicePool] = None):
+        """
+        device: a CtapHidDevice, or its HID path when `pool` is given.
+        metrics: optional metrics.Metrics recording each CTAPHID command.
+        pool: optional CTAPDevicePool; the module then shares the pool's open
+            handle and cached getInfo (the pool's metrics apply).
+        """
+        self.pool = pool
+        if pool is not None:
+            self.path = device if isinstance(device, str) else str(device.descriptor.path)
+            self.device = pool.device(self.path)
+            self.ctap2 = pool.ctap2(self.path)
+            return
+        if metrics is not None:
+            device = InstrumentedCtapDevice(device, metrics)
         self.device = device
+        from fido2.ctap2 import Ctap2
         self.ctap2 = Ctap2(device)
 
-    def get_info(self):
-        """Get CTAP2 Info."""
+    def get_info(self, refresh: bool = False):
+        """Get CTAP2 Info (from the pool's cache when pooled, unless `refresh`)."""
+        if self.pool is not None:
+            return self.pool.get_info(self.path, refresh=refresh)
         return self.ctap2.get_info()
 
-    def get_capabilities(self):
+    def get_capabilities(self, refresh: bool = False):
         """Get FIDO capabilities."""
-        info = self.get_info()
-        return {
-            "rk": info.options.get("rk"),
-            "up": info.options.get("up"),
-            "uv": info.options.get("uv"),
-            "plat": info.options.get("plat"),
-            "versions": info.versions,
-            "extensions": info.extensions
-        }
+        return info_capabilities(self.get_info(refresh=refresh))
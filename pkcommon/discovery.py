@@ -1,26 +1,97 @@
-import usb.core
-import usb.util
-import usb.backend.libusb1
-from typing import List
+import os
+import sys
+import threading
+from typing import Dict, Iterator, List, Optional
 from .core import PicoKeyDevice
 
-# Try to use bundled libusb DLL for the backend on Windows
 _backend = None
-try:
-    import libusb as _libusb_pkg
-    # Get the path to the bundled libusb DLL
-    _dll_path = str(_libusb_pkg.dll._name)
-    _backend = usb.backend.libusb1.get_backend(find_library=lambda x: _dll_path)
-except (ImportError, AttributeError):
-    # Fallback: try libusb_package
+_backend_loaded = False
+_backend_lock = threading.Lock()
+
+def _get_backend():
+    """
+    Resolve the libusb backend on first use (not at import time). Prefers the
+    bundled libusb DLL on Windows, then libusb_package; None lets pyusb choose.
+    """
+    global _backend, _backend_loaded
+    if _backend_loaded:
+        return _backend
+    with _backend_lock:
+        if _backend_loaded:
+            return _backend
+        import usb.backend.libusb1
+        try:
+            import libusb as _libusb_pkg
+            # Get the path to the bundled libusb DLL
+            _dll_path = str(_libusb_pkg.dll._name)
+            _backend = usb.backend.libusb1.get_backend(find_library=lambda x: _dll_path)
+        except (ImportError, AttributeError):
+            # Fallback: try libusb_package
+            try:
+                import libusb_package
+                _backend = usb.backend.libusb1.get_backend(find_library=libusb_package.find_library)
+            except ImportError:
+                pass
+        _backend_loaded = True
+        return _backend
+
+def _port_path(dev) -> Optional[str]:
+    """Kernel-style USB port path ("<bus>-<port>.<port>..."), as used in sysfs."""
+    try:
+        ports = dev.port_numbers
+    except Exception:
+        return None
+    if not ports:
+        return None
+    return f"{dev.bus}-{'.'.join(str(p) for p in ports)}"
+
+SYSFS_USB_DEVICES = "/sys/bus/usb/devices"
+
+def _read_sysfs(directory: str, name: str) -> Optional[str]:
     try:
-        import libusb_package
-        _backend = usb.backend.libusb1.get_backend(find_library=libusb_package.find_library)
-    except ImportError:
-        pass
+        with open(os.path.join(directory, name), encoding="utf-8", errors="replace") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def _iter_sysfs_devices(root: str = SYSFS_USB_DEVICES) -> Iterator[Dict]:
+    """
+    USB devices as cached by the kernel in sysfs. Nothing is opened and no
+    control transfers are issued, so busy or permission-restricted devices
+    are listed too. Interfaces ("1-2:1.0") and root hubs ("usb1") are skipped.
+    """
+    for name in os.listdir(root):
+        if ":" in name or name.startswith("usb"):
+            continue
+        directory = os.path.join(root, name)
+        vid, pid = _read_sysfs(directory, "idVendor"), _read_sysfs(directory, "idProduct")
+        if not vid or not pid:
+            continue
+        busnum, devnum = _read_sysfs(directory, "busnum"), _read_sysfs(directory, "devnum")
+        yield {
+            "port_path": name,
+            "directory": directory,
+            "vendor_id": int(vid, 16),
+            "product_id": int(pid, 16),
+            "bus": int(busnum) if busnum else None,
+            "address": int(devnum) if devnum else None,
+        }
+
+def _sysfs_interface_classes(directory: str) -> List[int]:
+    classes = []
+    prefix = os.path.basename(directory) + ":"
+    for entry in os.listdir(directory):
+        if entry.startswith(prefix):
+            value = _read_sysfs(os.path.join(directory, entry), "bInterfaceClass")
+            if value:
+                classes.append(int(value, 16))
+    return classes
+
+def sysfs_available(root: str = SYSFS_USB_DEVICES) -> bool:
+    return sys.platform.startswith("linux") and os.path.isdir(root)
 
 class USBDiscovery:
-    """Low-level USB discovery using pyusb."""
+    """Low-level USB discovery using sysfs on Linux, pyusb elsewhere."""
     
     # Known PicoKey VID/PID combinations
     # VID 0x2e8a = Raspberry Pi (used by Pico-based devices)
@@ -31,13 +102,69 @@ class USBDiscovery:
     }
     
     SUBSTRINGS = ["PicoKey", "Pico Key", "Pol Henarejos"]
-    
+
+    @staticmethod
+    def topology() -> frozenset:
+        """Cheap fingerprint of the USB bus (no control transfers)."""
+        if sysfs_available():
+            try:
+                return frozenset((d["bus"], d["address"], d["vendor_id"], d["product_id"])
+                                 for d in _iter_sysfs_devices())
+            except OSError:
+                pass
+        import usb.core
+        all_usb = usb.core.find(find_all=True, backend=_get_backend()) or []
+        return frozenset((dev.bus, dev.address, dev.idVendor, dev.idProduct) for dev in all_usb)
+
+    @staticmethod
+    def find_all_picokeys(use_sysfs: Optional[bool] = None) -> List[PicoKeyDevice]:
+        """
+        Find all PicoKey devices by VID/PID or manufacturer string.
+        use_sysfs: read descriptors from sysfs instead of opening devices;
+            None uses sysfs when available and falls back to libusb.
+        """
+        if use_sysfs or (use_sysfs is None and sysfs_available()):
+            try:
+                return USBDiscovery._find_sysfs()
+            except OSError:
+                if use_sysfs:
+                    raise
+        return USBDiscovery._find_libusb()
+
+    @staticmethod
+    def _find_sysfs(root: str = SYSFS_USB_DEVICES) -> List[PicoKeyDevice]:
+        devices = []
+        for info in _iter_sysfs_devices(root):
+            vid_pid = (info["vendor_id"], info["product_id"])
+            directory = info["directory"]
+            manufacturer = _read_sysfs(directory, "manufacturer")
+            known = vid_pid in USBDiscovery.KNOWN_PICOKEY_DEVICES
+            if not known and not (manufacturer and any(s in manufacturer for s in USBDiscovery.SUBSTRINGS)):
+                continue
+            product = _read_sysfs(directory, "product")
+            if known:
+                product = product or USBDiscovery.KNOWN_PICOKEY_DEVICES[vid_pid]
+                manufacturer = manufacturer or "PicoKey"
+            devices.append(PicoKeyDevice(
+                vendor_id=info["vendor_id"],
+                product_id=info["product_id"],
+                serial_number=_read_sysfs(directory, "serial"),
+                product_name=product or "Unknown",
+                manufacturer=manufacturer,
+                has_vendor_interface=255 in _sysfs_interface_classes(directory),
+                bus=info["bus"],
+                address=info["address"],
+                port_path=info["port_path"]
+            ))
+        return devices
+
     @staticmethod
-    def find_all_picokeys() -> List[PicoKeyDevice]:
-        """Find all PicoKey devices by VID/PID or manufacturer string."""
+    def _find_libusb() -> List[PicoKeyDevice]:
+        import usb.core
+        import usb.util
         devices = []
         
-        all_usb = usb.core.find(find_all=True, backend=_backend)
+        all_usb = usb.core.find(find_all=True, backend=_get_backend())
         if all_usb is None:
             return devices
         
@@ -78,7 +205,10 @@ class USBDiscovery:
                     serial_number=serial,
                     product_name=product_name,
                     manufacturer=manufacturer,
-                    has_vendor_interface=has_vendor
+                    has_vendor_interface=has_vendor,
+                    bus=dev.bus,
+                    address=dev.address,
+                    port_path=_port_path(dev)
                 ))
                 continue
             
@@ -95,7 +225,10 @@ class USBDiscovery:
                             product_id=dev.idProduct,
                             serial_number=serial,
                             product_name=product,
-                            manufacturer=mfr
+                            manufacturer=mfr,
+                            bus=dev.bus,
+                            address=dev.address,
+                            port_path=_port_path(dev)
                         ))
             except Exception:
                 continue
@@ -0,0 +1,339 @@
+import hashlib
+import hmac
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from .tlv import encode_tlv, encode_tlvs, parse_tlv_dict
+
+# AIDs understood by the emulator (same values as in modules.py)
+AID_OATH = bytes.fromhex("A0000005272101")
+AID_MGMT = bytes.fromhex("A000000527471117")
+AID_OTP = bytes.fromhex("A000000527200101")
+AID_PGP = bytes.fromhex("D27600012401")
+AID_FIDO = bytes.fromhex("A0000006472F0001")
+
+# ATRs with and without the extended-length bit in the card capabilities
+ATR_EXTENDED = bytes.fromhex("3BFD1300008131FE158073C021C057597562694B657940")
+ATR_SHORT = bytes.fromhex("3BFD1300008131FE158073C0218057597562694B657900")
+
+SW_OK = 0x9000
+SW_WRONG_LENGTH = 0x6700
+SW_WRONG_DATA = 0x6A80
+SW_NOT_FOUND = 0x6A82
+SW_WRONG_P1P2 = 0x6B00
+SW_INS_NOT_SUPPORTED = 0x6D00
+SW_CLA_NOT_SUPPORTED = 0x6E00
+SW_CONDITIONS = 0x6985
+
+HASHES = {0x01: hashlib.sha1, 0x02: hashlib.sha256, 0x03: hashlib.sha512}
+
+@dataclass
+class VirtualAccount:
+    name: str
+    secret: bytes
+    oath_type: int = 0x20  # 0x10 HOTP, 0x20 TOTP
+    algorithm: int = 0x01
+    digits: int = 6
+    counter: int = 0
+    touch: bool = False
+
+    def hotp(self, challenge: bytes) -> bytes:
+        """HMAC over the challenge with RFC 4226 dynamic truncation (4 bytes, high bit cleared)."""
+        digest = hmac.new(self.secret, challenge, HASHES[self.algorithm]).digest()
+        offset = digest[-1] & 0x0F
+        return bytes((digest[offset] & 0x7F,)) + digest[offset + 1:offset + 4]
+
+class VirtualPicoKey:
+    """
+    In-process card implementing the APDU semantics used by pkcommon's modules:
+    SELECT for the known AIDs, OATH LIST/CALCULATE/CALCULATE ALL/PUT/DELETE/RESET,
+    management version and device info, OpenPGP GET DATA, command chaining,
+    extended-length APDUs and 61xx response chaining (GET RESPONSE / SEND REMAINING).
+    """
+
+    def __init__(self, serial: int = 12345678, version: Tuple[int, int, int] = (5, 7, 0),
+                 latency: float = 0.0, max_response: int = 256, extended_length: bool = True,
+                 clock: Callable[[], float] = time.time):
+        """
+        latency: seconds added to every APDU exchange.
+        max_response: largest response data per exchange; longer ones are
+            returned with 61xx and fetched with GET RESPONSE / SEND REMAINING.
+        """
+        self.serial = serial
+        self.version = version
+        self.latency = latency
+        self.max_response = max_response
+        self.extended_length = extended_length
+        self.clock = clock
+        self.accounts: Dict[str, VirtualAccount] = {}
+        self.apdu_count = 0
+        self.selected: Optional[bytes] = None
+        self._pending = b""
+        self._chain = b""
+        self._lock = threading.Lock()
+        self._readers: List["VirtualReader"] = []
+
+    @property
+    def atr(self) -> bytes:
+        return ATR_EXTENDED if self.extended_length else ATR_SHORT
+
+    def add_account(self, name: str, secret: bytes, oath_type: int = 0x20, algorithm: int = 0x01,
+                    digits: int = 6, touch: bool = False):
+        self.accounts[name] = VirtualAccount(name, secret, oath_type, algorithm, digits, touch=touch)
+
+    def reset(self):
+        """Card reset: drops the selected applet and any pending response."""
+        with self._lock:
+            self.selected = None
+            self._pending = b""
+            self._chain = b""
+
+    # -- reader plumbing ---------------------------------------------------
+
+    def plug(self, name: Optional[str] = None) -> "VirtualReader":
+        """Register a reader holding this card so transports and discovery can find it."""
+        from .apdu import register_reader
+        reader = VirtualReader(self, name or f"PicoKey Virtual CCID ({self.serial}) 00 00")
+        register_reader(reader)
+        self._readers.append(reader)
+        return reader
+
+    def unplug(self):
+        from .apdu import unregister_reader
+        for reader in self._readers:
+            unregister_reader(reader)
+        self._readers.clear()
+
+    # -- APDU processing ---------------------------------------------------
+
+    def process(self, apdu: bytes) -> Tuple[bytes, int, int]:
+        """Handle one command APDU and return (data, sw1, sw2)."""
+        with self._lock:
+            self.apdu_count += 1
+            data, sw = self._dispatch(bytes(apdu))
+            return data, sw >> 8, sw & 0xFF
+
+    def _parse(self, apdu: bytes) -> Optional[Tuple[int, int, int, int, bytes]]:
+        if len(apdu) < 4:
+            return None
+        cla, ins, p1, p2 = apdu[:4]
+        body = apdu[4:]
+        if len(body) <= 1:
+            return cla, ins, p1, p2, b""
+        if body[0] == 0 and len(body) >= 3 and self.extended_length:
+            if len(body) == 3:
+                return cla, ins, p1, p2, b""
+            lc = int.from_bytes(body[1:3], "big")
+            data = body[3:3 + lc]
+            if len(data) != lc or len(body) not in (3 + lc, 3 + lc + 2):
+                return None
+            return cla, ins, p1, p2, data
+        lc = body[0]
+        data = body[1:1 + lc]
+        if len(data) != lc or len(body) not in (1 + lc, 2 + lc):
+            return None
+        return cla, ins, p1, p2, data
+
+    def _respond(self, data: bytes, sw: int = SW_OK) -> Tuple[bytes, int]:
+        if len(data) <= self.max_response:
+            self._pending = b""
+            return data, sw
+        self._pending = data[self.max_response:]
+        # 61 00 means 256 bytes or more remain
+        return data[:self.max_response], 0x6100 | (len(self._pending) if len(self._pending) < 0x100 else 0)
+
+    def _dispatch(self, apdu: bytes) -> Tuple[bytes, int]:
+        parsed = self._parse(apdu)
+        if parsed is None:
+            return b"", SW_WRONG_LENGTH
+        cla, ins, p1, p2, data = parsed
+
+        if ins == 0xC0 or (ins == 0xA5 and self.selected == AID_OATH):
+            if not self._pending:
+                return b"", SW_CONDITIONS
+            return self._respond(self._pending)
+        self._pending = b""
+
+        if cla & 0x10:
+            self._chain += data
+            return b"", SW_OK
+        if self._chain:
+            data, self._chain = self._chain + data, b""
+        if cla & ~0x10 not in (0x00, 0x80):
+            return b"", SW_CLA_NOT_SUPPORTED
+
+        if ins == 0xA4 and p1 == 0x04:
+            return self._select(data)
+        if self.selected == AID_OATH:
+            return self._oath(ins, p1, p2, data)
+        if self.selected == AID_MGMT and ins == 0x1D:
+            return self._respond(self._device_info())
+        if self.selected == AID_PGP and ins == 0xCA:
+            return self._pgp_get_data((p1 << 8) | p2)
+        return b"", SW_INS_NOT_SUPPORTED
+
+    def _select(self, aid: bytes) -> Tuple[bytes, int]:
+        if aid not in (AID_OATH, AID_MGMT, AID_OTP, AID_PGP, AID_FIDO):
+            self.selected = None
+            return b"", SW_NOT_FOUND
+        self.selected = aid
+        if aid == AID_MGMT:
+            return self._respond(".".join(str(v) for v in self.version).encode())
+        if aid == AID_OATH:
+            return self._respond(encode_tlvs((
+                (0x79, bytes(self.version)),
+                (0x71, self.serial.to_bytes(8, "big")),
+            )))
+        return b"", SW_OK
+
+    def _device_info(self) -> bytes:
+        tlvs = encode_tlvs((
+            (0x01, b"\x02\x3b"),
+            (0x02, self.serial.to_bytes(4, "big")),
+            (0x03, b"\x02\x3b"),
+            (0x04, b"\x01"),
+            (0x05, bytes(self.version)),
+        ))
+        return bytes((len(tlvs),)) + tlvs
+
+    def _pgp_get_data(self, tag: int) -> Tuple[bytes, int]:
+        if tag != 0x6E:
+            return b"", SW_NOT_FOUND
+        aid = AID_PGP + b"\x03\x04" + b"\x00\x0f" + self.serial.to_bytes(4, "big") + b"\x00\x00"
+        return self._respond(encode_tlv(0x6E, encode_tlvs((
+            (0x4F, aid),
+            (0x5F52, b"\x00\x73\x00\x00\xe0\x05\x90\x00"),
+            (0x73, encode_tlvs(((0xC0, b"\x7d\x00\x0b\xfe\x08\x00\x00\xff\x00\x00"),))),
+        ))))
+
+    def _oath(self, ins: int, p1: int, p2: int, data: bytes) -> Tuple[bytes, int]:
+        try:
+            fields = parse_tlv_dict(data) if data else {}
+        except ValueError:
+            return b"", SW_WRONG_DATA
+
+        if ins == 0xA1:  # LIST
+            return self._respond(b"".join(
+                encode_tlv(0x72, bytes((a.oath_type | a.algorithm,)) + a.name.encode())
+                for a in self.accounts.values()
+            ))
+
+        if ins == 0x01:  # PUT
+            if 0x71 not in fields or 0x73 not in fields:
+                return b"", SW_WRONG_DATA
+            name = str(fields[0x71], "utf-8")
+            key = bytes(fields[0x73])
+            if 0x74 in fields:
+                # Layout used by OATHModule: 0x74 type|digits, 0x75 algorithm, 0x73 raw key
+                kind = fields[0x74][0]
+                oath_type, digits = kind & 0xF0, kind & 0x0F
+                algorithm = fields[0x75][0] if 0x75 in fields else 0x01
+                secret = key
+            else:
+                # Yubico layout: 0x73 = type|algorithm, digits, key
+                if len(key) < 2:
+                    return b"", SW_WRONG_DATA
+                oath_type, algorithm, digits, secret = key[0] & 0xF0, key[0] & 0x0F, key[1], key[2:]
+            if algorithm not in HASHES or oath_type not in (0x10, 0x20):
+                return b"", SW_WRONG_DATA
+            touch = 0x78 in fields and bool(fields[0x78][0] & 0x02)
+            self.add_account(name, secret, oath_type, algorithm, digits, touch)
+            if 0x7A in fields:
+                self.accounts[name].counter = int.from_bytes(fields[0x7A], "big")
+            return b"", SW_OK
+
+        if ins == 0x02:  # DELETE
+            name = str(fields.get(0x71, b""), "utf-8")
+            if self.accounts.pop(name, None) is None:
+                return b"", SW_NOT_FOUND
+            return b"", SW_OK
+
+        if ins == 0x05:  # RESET
+            if (p1, p2) != (0xDE, 0xAD):
+                return b"", SW_WRONG_P1P2
+            self.accounts.clear()
+            return b"", SW_OK
+
+        if ins == 0xA2:  # CALCULATE
+            account = self.accounts.get(str(fields.get(0x71, b""), "utf-8"))
+            if account is None:
+                return b"", SW_NOT_FOUND
+            if account.oath_type == 0x10:
+                # The stored counter is the next moving factor to use (IMF on PUT).
+                challenge = account.counter.to_bytes(8, "big")
+                account.counter += 1
+            else:
+                challenge = bytes(fields.get(0x74, b""))
+            return self._respond(self._code_tlv(account, challenge, truncate=p2 == 0x01))
+
+        if ins == 0xA4:  # CALCULATE ALL
+            challenge = bytes(fields.get(0x74, b""))
+            out = []
+            for account in self.accounts.values():
+                out.append(encode_tlv(0x71, account.name.encode()))
+                if account.oath_type == 0x10:
+                    out.append(encode_tlv(0x77, bytes((account.digits,))))
+                elif account.touch:
+                    out.append(encode_tlv(0x7C, bytes((account.digits,))))
+                else:
+                    out.append(self._code_tlv(account, challenge, truncate=p2 == 0x01))
+            return self._respond(b"".join(out))
+
+        return b"", SW_INS_NOT_SUPPORTED
+
+    @staticmethod
+    def _code_tlv(account: VirtualAccount, challenge: bytes, truncate: bool) -> bytes:
+        if truncate:
+            return encode_tlv(0x76, bytes((account.digits,)) + account.hotp(challenge))
+        digest = hmac.new(account.secret, challenge, HASHES[account.algorithm]).digest()
+        return encode_tlv(0x75, bytes((account.digits,)) + digest)
+
+class VirtualConnection:
+    """pyscard-compatible connection to a VirtualPicoKey."""
+
+    # Only this process can reach the card, so cached state (e.g. the selected applet) stays valid.
+    in_process = True
+
+    def __init__(self, card: VirtualPicoKey):
+        self.card = card
+        self.connected = False
+
+    def connect(self, *args, **kwargs):
+        self.connected = True
+
+    def reconnect(self, *args, **kwargs):
+        self.card.reset()
+        self.connected = True
+
+    def disconnect(self):
+        self.connected = False
+
+    def getATR(self) -> List[int]:
+        if not self.connected:
+            raise Exception("Not connected")
+        return list(self.card.atr)
+
+    def transmit(self, apdu: List[int], *args) -> Tuple[List[int], int, int]:
+        if not self.connected:
+            raise Exception("Not connected")
+        if self.card.latency:
+            time.sleep(self.card.latency)
+        data, sw1, sw2 = self.card.process(bytes(apdu))
+        return list(data), sw1, sw2
+
+class VirtualReader:
+    """pyscard-compatible reader exposing a VirtualPicoKey."""
+
+    def __init__(self, card: VirtualPicoKey, name: str):
+        self.card = card
+        self.name = name
+
+    def createConnection(self) -> VirtualConnection:
+        return VirtualConnection(self.card)
+
+    def __str__(self) -> str:
+        return self.name
+
+    def __repr__(self) -> str:
+        return f"VirtualReader({self.name!r})"
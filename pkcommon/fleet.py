@@ -0,0 +1,99 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+from .core import PicoKeyDevice
+
+@dataclass
+class DeviceResult:
+    """Outcome of one operation on one device."""
+    device: PicoKeyDevice
+    result: Any = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+@dataclass
+class FleetReport:
+    results: List[DeviceResult] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def succeeded(self) -> List[DeviceResult]:
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self) -> List[DeviceResult]:
+        return [r for r in self.results if not r.ok]
+
+class FleetExecutor:
+    """
+    Runs one operation across many devices on a bounded worker pool, so a
+    batch of keys takes about as long as the slowest key rather than the sum.
+    """
+
+    def __init__(self, max_workers: int = 8, pool=None, verbose: bool = False, metrics=None):
+        """
+        pool: optional apdu.ConnectionPool shared by the per-device transports.
+        metrics: optional metrics.Metrics shared by the per-device transports.
+        """
+        self.max_workers = max_workers
+        self.pool = pool
+        self.verbose = verbose
+        self.metrics = metrics
+
+    @staticmethod
+    def smartcard_devices(devices: List[PicoKeyDevice]) -> List[PicoKeyDevice]:
+        """Devices from list_devices() that can be reached over PC/SC."""
+        return [d for d in devices if d.path or d.atr]
+
+    def map(self, devices: List[PicoKeyDevice], operation: Callable[[PicoKeyDevice], Any],
+            progress: Optional[Callable[[DeviceResult], None]] = None) -> FleetReport:
+        """
+        Call `operation(device)` for every device concurrently. Results keep
+        the order of `devices`; exceptions are captured per device.
+        `progress` is called (from worker threads) as each device finishes.
+        """
+        report = FleetReport()
+        if not devices:
+            return report
+
+        def run_one(device: PicoKeyDevice) -> DeviceResult:
+            start = time.perf_counter()
+            try:
+                result = DeviceResult(device, operation(device))
+            except Exception as e:
+                result = DeviceResult(device, error=str(e) or type(e).__name__)
+            result.elapsed = time.perf_counter() - start
+            if progress:
+                progress(result)
+            return result
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(devices)),
+                                thread_name_prefix="pk-fleet") as executor:
+            report.results = list(executor.map(run_one, devices))
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def run(self, devices: List[PicoKeyDevice], operation: Callable[[PicoKeyDevice, Any], Any],
+            progress: Optional[Callable[[DeviceResult], None]] = None) -> FleetReport:
+        """
+        Open one APDUTransport per smartcard-capable device and call
+        `operation(device, transport)`; the transport is closed afterwards.
+        """
+        from .apdu import APDUTransport
+
+        def with_transport(device: PicoKeyDevice):
+            transport = APDUTransport(device.path or device.product_name, verbose=self.verbose, pool=self.pool,
+                                      metrics=self.metrics)
+            try:
+                transport.connect()
+                return operation(device, transport)
+            finally:
+                transport.disconnect()
+
+        return self.map(self.smartcard_devices(devices), with_transport, progress)
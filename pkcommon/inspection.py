@@ -0,0 +1,186 @@
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+from .apdu import APDUStep, APDUTransport, CommandAPDU, CONTINUE
+from .core import PicoKeyDevice
+from .fleet import FleetExecutor
+from .modules import FIDOModule, ManagementModule, OATHModule, OpenPGPModule, YubicoModule
+
+# Applets probed on every smartcard interface, in this order.
+APPLETS = (
+    ("management", ManagementModule.AID_MGMT),
+    ("otp", YubicoModule.AID_OTP),
+    ("oath", OATHModule.AID_OATH),
+    ("fido", FIDOModule.AID_FIDO),
+    ("openpgp", OpenPGPModule.AID_PGP),
+)
+
+@dataclass
+class ProbeStep:
+    """Timing of one inspection step (an applet SELECT, OATH codes, CTAP info...)."""
+    name: str
+    ok: bool
+    elapsed: float
+    error: Optional[str] = None
+
+@dataclass
+class AppletInfo:
+    name: str
+    present: bool
+    sw: Optional[int] = None
+    version: Optional[str] = None
+    blocked: bool = False  # the OS refused access (e.g. FIDO over CCID on Windows)
+    elapsed: float = 0.0
+
+@dataclass
+class FIDOInfo:
+    versions: List[str] = field(default_factory=list)
+    extensions: List[str] = field(default_factory=list)
+    options: Dict[str, Optional[bool]] = field(default_factory=dict)
+
+@dataclass
+class DeviceInspection:
+    device: PicoKeyDevice
+    applets: Dict[str, AppletInfo] = field(default_factory=dict)
+    oath_codes: Optional[Dict[str, str]] = None
+    fido: Optional[FIDOInfo] = None
+    steps: List[ProbeStep] = field(default_factory=list)
+    elapsed: float = 0.0
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        out = asdict(self.device)
+        out["interfaces"] = self.device.interfaces
+        out["applets"] = {name: asdict(a) for name, a in self.applets.items()} if self.applets else None
+        out["oath_codes"] = self.oath_codes
+        out["fido"] = asdict(self.fido) if self.fido else None
+        out["steps"] = [asdict(s) for s in self.steps]
+        out["elapsed"] = self.elapsed
+        out["error"] = self.error
+        return out
+
+@dataclass
+class InspectionReport:
+    devices: List[DeviceInspection] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def to_dict(self) -> List[dict]:
+        return [d.to_dict() for d in self.devices]
+
+def _is_smartcard(device: PicoKeyDevice) -> bool:
+    return bool(device.atr or (device.path and "CCID" in device.path))
+
+def _is_access_denied(error: Optional[str]) -> bool:
+    return bool(error) and ("Acesso negado" in error or "denied" in error.lower())
+
+class Inspector:
+    """
+    Probes devices in parallel: all applet SELECTs of a device run as one
+    batch in a single card transaction, and HID is enumerated once for the
+    whole run rather than per device.
+    """
+
+    def __init__(self, max_workers: int = 8, verbose: bool = False, oath_codes: bool = True,
+                 fido: bool = True, pool=None, metrics=None, ctap_pool=None):
+        """
+        oath_codes: also calculate OATH codes when the applet is present.
+        fido: query CTAP2 info over HID for devices that expose it.
+        ctap_pool: ctap.CTAPDevicePool to reuse HID handles and cached getInfo
+            across runs (one is created on first use otherwise).
+        """
+        self.fleet = FleetExecutor(max_workers=max_workers, pool=pool, verbose=verbose, metrics=metrics)
+        self.oath_codes = oath_codes
+        self.fido = fido
+        self.metrics = metrics
+        self.ctap_pool = ctap_pool
+
+    def _hid_devices(self) -> list:
+        """HID descriptors of the CTAP devices present (no CTAPHID traffic)."""
+        if not self.fido:
+            return []
+        try:
+            if self.ctap_pool is None:
+                from .ctap import CTAPDevicePool
+                self.ctap_pool = CTAPDevicePool(max_workers=self.fleet.max_workers, metrics=self.metrics)
+            return self.ctap_pool.descriptors()
+        except Exception:
+            return []
+
+    @staticmethod
+    def _match_hid(device: PicoKeyDevice, hid_devices: list):
+        if device.hid_path:
+            for desc in hid_devices:
+                if str(desc.path) == device.hid_path:
+                    return desc
+            return None
+        candidates = [d for d in hid_devices if (d.vid, d.pid) == (device.vendor_id, device.product_id)]
+        return candidates[0] if len(candidates) == 1 else None
+
+    def inspect(self, devices: List[PicoKeyDevice]) -> InspectionReport:
+        started = time.perf_counter()
+        hid_devices = self._hid_devices()
+        fleet_report = self.fleet.map(devices, lambda d: self.inspect_device(d, hid_devices))
+        report = InspectionReport(elapsed=time.perf_counter() - started)
+        for r in fleet_report.results:
+            report.devices.append(r.result if r.ok else DeviceInspection(r.device, error=r.error, elapsed=r.elapsed))
+        return report
+
+    def inspect_device(self, device: PicoKeyDevice, hid_devices: Optional[list] = None) -> DeviceInspection:
+        started = time.perf_counter()
+        result = DeviceInspection(device)
+        if _is_smartcard(device):
+            try:
+                self._probe_smartcard(device, result)
+            except Exception as e:
+                result.error = str(e) or type(e).__name__
+        hid = self._match_hid(device, hid_devices if hid_devices is not None else self._hid_devices())
+        if hid is not None:
+            self._probe_fido(hid, result)
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    def _probe_smartcard(self, device: PicoKeyDevice, result: DeviceInspection):
+        transport = APDUTransport(device.path or device.product_name, verbose=self.fleet.verbose,
+                                  pool=self.fleet.pool, metrics=self.metrics)
+        transport.connect()
+        try:
+            steps = [APDUStep(CommandAPDU(0x00, 0xA4, 0x04, 0x00, aid), expect=(0x9000, 0x61), name=name)
+                     for name, aid in APPLETS]
+            batch = transport.transmit_many(steps, on_error=CONTINUE)
+            for step in batch.results:
+                name = step.step.name
+                info = AppletInfo(name, step.ok, elapsed=step.elapsed,
+                                  sw=step.response.sw if step.response else None,
+                                  blocked=_is_access_denied(step.error))
+                if name == "management" and step.ok:
+                    info.version = step.response.data.decode("utf-8", "replace")
+                result.applets[name] = info
+                result.steps.append(ProbeStep(f"select:{name}", step.ok, step.elapsed, step.error))
+
+            oath = result.applets.get("oath")
+            if self.oath_codes and oath and oath.present:
+                t0 = time.perf_counter()
+                try:
+                    module = OATHModule(transport)
+                    module.select()
+                    result.oath_codes = module.calculate_all()
+                    result.steps.append(ProbeStep("oath:calculate_all", True, time.perf_counter() - t0))
+                except Exception as e:
+                    result.steps.append(ProbeStep("oath:calculate_all", False, time.perf_counter() - t0,
+                                                  str(e) or type(e).__name__))
+        finally:
+            transport.disconnect()
+
+    def _probe_fido(self, hid, result: DeviceInspection):
+        from .ctap import info_capabilities
+        t0 = time.perf_counter()
+        try:
+            caps = info_capabilities(self.ctap_pool.get_info(str(hid.path)))
+            result.fido = FIDOInfo(
+                versions=list(caps["versions"] or []),
+                extensions=list(caps["extensions"] or []),
+                options={k: caps[k] for k in ("rk", "up", "uv", "plat")},
+            )
+            result.steps.append(ProbeStep("ctap:get_info", True, time.perf_counter() - t0))
+        except Exception as e:
+            result.steps.append(ProbeStep("ctap:get_info", False, time.perf_counter() - t0, str(e) or type(e).__name__))
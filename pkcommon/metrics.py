@@ -0,0 +1,228 @@
+import bisect
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Names used for the `applet` label; unknown AIDs are reported in hex.
+APPLET_NAMES: Dict[bytes, str] = {
+    bytes.fromhex("D27600012401"): "openpgp",
+    bytes.fromhex("A000000527200101"): "otp",
+    bytes.fromhex("A000000527471117"): "management",
+    bytes.fromhex("A0000005272101"): "oath",
+    bytes.fromhex("A0000006472F0001"): "fido",
+}
+
+def applet_name(aid: Optional[bytes]) -> str:
+    if not aid:
+        return "none"
+    return APPLET_NAMES.get(bytes(aid)) or bytes(aid).hex().upper()
+
+@dataclass
+class MetricEvent:
+    """
+    One observation passed to callbacks.
+    kind: "op" (APDU / USB transfer / CTAPHID command), "connect", "reconnect" or "error".
+    op: INS in hex for APDUs, otherwise the operation name (e.g. "send", "CBOR").
+    """
+    kind: str
+    transport: str
+    device: str
+    op: str = ""
+    applet: str = ""
+    elapsed: float = 0.0
+    bytes_out: int = 0
+    bytes_in: int = 0
+    sw: Optional[int] = None
+    error: Optional[str] = None
+    timestamp: float = 0.0
+
+class Histogram:
+    """Fixed-bucket latency histogram (Prometheus-compatible)."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {str(b): c for b, c in zip(self.buckets + ("+Inf",), self.counts)},
+        }
+
+class Metrics:
+    """
+    Collects latency histograms, status-word counters, byte counts and
+    connection counts from transports created with `metrics=`. Transports
+    without a Metrics instance skip all of this (a single None check).
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[MetricEvent], None]] = []
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # (transport, device, applet, op) -> Histogram
+            self.latency: Dict[Tuple[str, str, str, str], Histogram] = {}
+            # (transport, device, applet, sw) -> count
+            self.status_words: Dict[Tuple[str, str, str, str], int] = {}
+            # (transport, device) -> count
+            self.bytes_out: Dict[Tuple[str, str], int] = {}
+            self.bytes_in: Dict[Tuple[str, str], int] = {}
+            self.connects: Dict[Tuple[str, str], int] = {}
+            self.reconnects: Dict[Tuple[str, str], int] = {}
+            # (transport, device, op, exception type) -> count
+            self.errors: Dict[Tuple[str, str, str, str], int] = {}
+
+    def add_callback(self, callback: Callable[[MetricEvent], None]):
+        """Call `callback(event)` for every observation (from the caller's thread)."""
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback: Callable[[MetricEvent], None]):
+        self._callbacks.remove(callback)
+
+    def _emit(self, event: MetricEvent):
+        for callback in list(self._callbacks):
+            callback(event)
+
+    # -- recording ---------------------------------------------------------
+
+    def record(self, transport: str, device: str, op: str, elapsed: float, bytes_out: int = 0,
+               bytes_in: int = 0, sw: Optional[int] = None, applet: str = ""):
+        """Record one completed operation (an APDU exchange, USB transfer or CTAPHID command)."""
+        hist_key = (transport, device, applet, op)
+        dev_key = (transport, device)
+        with self._lock:
+            hist = self.latency.get(hist_key)
+            if hist is None:
+                hist = self.latency[hist_key] = Histogram(self.buckets)
+            hist.observe(elapsed)
+            if bytes_out:
+                self.bytes_out[dev_key] = self.bytes_out.get(dev_key, 0) + bytes_out
+            if bytes_in:
+                self.bytes_in[dev_key] = self.bytes_in.get(dev_key, 0) + bytes_in
+            if sw is not None:
+                sw_key = (transport, device, applet, f"{sw:04X}")
+                self.status_words[sw_key] = self.status_words.get(sw_key, 0) + 1
+        if self._callbacks:
+            self._emit(MetricEvent("op", transport, device, op, applet, elapsed, bytes_out, bytes_in, sw,
+                                   timestamp=time.time()))
+
+    def record_connect(self, transport: str, device: str, reconnect: bool = False):
+        key = (transport, device)
+        with self._lock:
+            counter = self.reconnects if reconnect else self.connects
+            counter[key] = counter.get(key, 0) + 1
+        if self._callbacks:
+            self._emit(MetricEvent("reconnect" if reconnect else "connect", transport, device,
+                                   timestamp=time.time()))
+
+    def record_error(self, transport: str, device: str, op: str, error: BaseException, applet: str = ""):
+        key = (transport, device, op, type(error).__name__)
+        with self._lock:
+            self.errors[key] = self.errors.get(key, 0) + 1
+        if self._callbacks:
+            self._emit(MetricEvent("error", transport, device, op, applet, error=str(error) or type(error).__name__,
+                                   timestamp=time.time()))
+
+    # -- export ------------------------------------------------------------
+
+    def snapshot(self) -> dict:
+        """Point-in-time copy of all metrics as plain dicts/lists (JSON-serializable)."""
+        with self._lock:
+            return {
+                "latency": [
+                    {"transport": t, "device": d, "applet": a, "op": o, **h.to_dict()}
+                    for (t, d, a, o), h in self.latency.items()
+                ],
+                "status_words": [
+                    {"transport": t, "device": d, "applet": a, "sw": sw, "count": n}
+                    for (t, d, a, sw), n in self.status_words.items()
+                ],
+                "bytes_out": [{"transport": t, "device": d, "count": n} for (t, d), n in self.bytes_out.items()],
+                "bytes_in": [{"transport": t, "device": d, "count": n} for (t, d), n in self.bytes_in.items()],
+                "connects": [{"transport": t, "device": d, "count": n} for (t, d), n in self.connects.items()],
+                "reconnects": [{"transport": t, "device": d, "count": n} for (t, d), n in self.reconnects.items()],
+                "errors": [
+                    {"transport": t, "device": d, "op": o, "error": e, "count": n}
+                    for (t, d, o, e), n in self.errors.items()
+                ],
+            }
+
+    def to_json(self, indent: Optional[int] = None) -> str:
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, prefix: str = "pkcommon") -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        lines = []
+
+        def labels(**kv) -> str:
+            return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in kv.items()) + "}"
+
+        name = f"{prefix}_operation_duration_seconds"
+        lines += [f"# HELP {name} Latency of APDU exchanges, USB transfers and CTAPHID commands.",
+                  f"# TYPE {name} histogram"]
+        for h in snap["latency"]:
+            base = dict(transport=h["transport"], device=h["device"], applet=h["applet"], op=h["op"])
+            cumulative = 0
+            for bound, count in h["buckets"].items():
+                cumulative += count
+                lines.append(f"{name}_bucket{labels(**base, le=bound)} {cumulative}")
+            lines.append(f"{name}_sum{labels(**base)} {h['sum']}")
+            lines.append(f"{name}_count{labels(**base)} {h['count']}")
+
+        def counter(metric: str, help_text: str, rows: List[dict], keys: Tuple[str, ...]):
+            metric = f"{prefix}_{metric}_total"
+            lines.extend((f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"))
+            for row in rows:
+                lines.append(f"{metric}{labels(**{k: row[k] for k in keys})} {row['count']}")
+
+        counter("status_words", "Status words returned by the card.", snap["status_words"],
+                ("transport", "device", "applet", "sw"))
+        counter("bytes_sent", "Bytes sent to the device.", snap["bytes_out"], ("transport", "device"))
+        counter("bytes_received", "Bytes received from the device.", snap["bytes_in"], ("transport", "device"))
+        counter("connects", "Connections opened.", snap["connects"], ("transport", "device"))
+        counter("reconnects", "Reconnections after a reset or failed health check.", snap["reconnects"],
+                ("transport", "device"))
+        counter("errors", "Operations that raised.", snap["errors"], ("transport", "device", "op", "error"))
+        return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
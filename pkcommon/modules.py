@@ -1,5 +1,10 @@
-from .apdu import APDUTransport
-from typing import List
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from .apdu import APDUStep, APDUTransport, CommandAPDU, CONTINUE, StepResult
+from .oath_import import ALGORITHMS, TYPES, ImportResult, OATHCredential, decode_base32_secret
+from .tlv import Tlv, encode_tlv, encode_tlvs, iter_tlv, iter_tlv_stream
 
 class HSMModule:
     """Abstraction for Pico HSM functionality."""
@@ -7,200 +12,507 @@ class HSMModule:
     def __init__(self, transport: APDUTransport):
         self.transport = transport
 
-    def get_info(self) -> List[int]:
+    def get_info(self) -> bytes:
         """Example: Get HSM info APDU (placeholder)."""
         # Command: CLA=0x80, INS=0x01, P1=0x00, P2=0x00
-        apdu = [0x80, 0x01, 0x00, 0x00]
-        data, sw1, sw2 = self.transport.transmit(apdu)
+        data, sw1, sw2 = self.transport.send(0x80, 0x01, 0x00, 0x00)
         return data
 
 class OpenPGPModule:
     """Abstraction for Pico OpenPGP functionality."""
     
-    AID_PGP = [0xD2, 0x76, 0x00, 0x01, 0x24, 0x01]
+    AID_PGP = bytes.fromhex("D27600012401")
     
     def __init__(self, transport: APDUTransport):
         self.transport = transport
 
     def select(self):
         """Select OpenPGP applet."""
-        apdu = [0x00, 0xA4, 0x04, 0x00, len(self.AID_PGP)] + self.AID_PGP
-        data, sw1, sw2 = self.transport.transmit(apdu)
+        data, sw1, sw2 = self.transport.select(self.AID_PGP)
         return sw1 == 0x90 and sw2 == 0x00
 
+    def get_data(self, tag: int) -> Optional[bytes]:
+        """Read a data object with GET DATA (INS 0xCA); P1/P2 carry the tag."""
+        resp = self.transport.send(0x00, 0xCA, (tag >> 8) & 0xFF, tag & 0xFF, le=0)
+        return resp.data if resp.ok else None
+
+    def get_application_related_data(self) -> Dict[int, bytes]:
+        """Read DO 0x6E and return every primitive data object in it by tag."""
+        data = self.get_data(0x6E)
+        result = {}
+        if data is None:
+            return result
+
+        def walk(buf):
+            for t in iter_tlv(buf):
+                # 0x6E/0x73 wrap the rest; everything else is read as primitive.
+                if t.tag in (0x6E, 0x73):
+                    walk(t.value)
+                else:
+                    result[t.tag] = bytes(t.value)
+
+        walk(data)
+        return result
+
 class YubicoModule:
     """Abstraction for Yubico-compatible functionality (OTP)."""
     
-    AID_OTP = [0xA0, 0x00, 0x00, 0x05, 0x27, 0x20, 0x01, 0x01]
+    AID_OTP = bytes.fromhex("A000000527200101")
     
     def __init__(self, transport: APDUTransport):
         self.transport = transport
 
     def select(self):
         """Select Yubico OTP applet."""
-        apdu = [0x00, 0xA4, 0x04, 0x00, len(self.AID_OTP)] + self.AID_OTP
-        data, sw1, sw2 = self.transport.transmit(apdu)
+        data, sw1, sw2 = self.transport.select(self.AID_OTP)
         return sw1 == 0x90 and sw2 == 0x00
 
 class ManagementModule:
     """Abstraction for Yubico Management functionality."""
     
-    AID_MGMT = [0xA0, 0x00, 0x00, 0x05, 0x27, 0x47, 0x11, 0x17]
+    AID_MGMT = bytes.fromhex("A000000527471117")
+
+    # Device info (READ CONFIG) tags
+    TAG_USB_SUPPORTED = 0x01
+    TAG_SERIAL = 0x02
+    TAG_USB_ENABLED = 0x03
+    TAG_FORM_FACTOR = 0x04
+    TAG_VERSION = 0x05
     
     def __init__(self, transport: APDUTransport):
         self.transport = transport
 
     def select(self):
         """Select Management applet."""
-        apdu = [0x00, 0xA4, 0x04, 0x00, len(self.AID_MGMT)] + self.AID_MGMT
-        data, sw1, sw2 = self.transport.transmit(apdu)
+        data, sw1, sw2 = self.transport.select(self.AID_MGMT)
         if sw1 == 0x90:
-            return "".join(chr(c) for c in data)
+            return data.decode("utf-8", "replace")
         return None
 
+    def read_device_info(self) -> Optional[dict]:
+        """Read and decode the device info TLVs (INS 0x1D). The applet must be selected."""
+        resp = self.transport.send(0x00, 0x1D, 0x00, 0x00)
+        if not resp.ok or not resp.data:
+            return None
+        # First byte is the length of the TLV area that follows.
+        view = resp.view[1:1 + resp.data[0]]
+        raw = {t.tag: bytes(t.value) for t in iter_tlv(view)}
+        info = {"raw": raw}
+        if self.TAG_SERIAL in raw:
+            info["serial"] = int.from_bytes(raw[self.TAG_SERIAL], "big")
+        if self.TAG_VERSION in raw:
+            info["version"] = ".".join(str(b) for b in raw[self.TAG_VERSION])
+        if self.TAG_FORM_FACTOR in raw:
+            info["form_factor"] = raw[self.TAG_FORM_FACTOR][0] if raw[self.TAG_FORM_FACTOR] else None
+        if self.TAG_USB_SUPPORTED in raw:
+            info["usb_supported"] = int.from_bytes(raw[self.TAG_USB_SUPPORTED], "big")
+        if self.TAG_USB_ENABLED in raw:
+            info["usb_enabled"] = int.from_bytes(raw[self.TAG_USB_ENABLED], "big")
+        return info
+
+class TOTPCodeCache:
+    """
+    TOTP codes keyed by (device serial, label, time step). A code is only
+    returned while the clock is inside its step, so entries expire exactly at
+    the step boundary. Share one instance between OATHModule objects.
+    """
+
+    def __init__(self, period: int = 30, clock: Callable[[], float] = time.time):
+        self.period = period
+        self.clock = clock
+        self._codes: Dict[Tuple[str, int], Dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def current_step(self) -> int:
+        return int(self.clock() // self.period)
+
+    def seconds_left(self) -> float:
+        """Seconds until the current step rolls over."""
+        return self.period - self.clock() % self.period
+
+    def get(self, serial: str, label: str, step: Optional[int] = None) -> Optional[str]:
+        codes = self.get_all(serial, step)
+        return codes.get(label) if codes else None
+
+    def get_all(self, serial: str, step: Optional[int] = None) -> Optional[Dict[str, str]]:
+        """Codes of a full CALCULATE ALL for `step`, or None if not cached (or expired)."""
+        current = self.current_step()
+        step = current if step is None else step
+        if step < current:
+            return None
+        with self._lock:
+            codes = self._codes.get((serial, step))
+            return dict(codes) if codes is not None else None
+
+    def put(self, serial: str, step: int, label: str, code: str):
+        with self._lock:
+            self._codes.setdefault((serial, step), {})[label] = code
+
+    def put_all(self, serial: str, step: int, codes: Dict[str, str]):
+        with self._lock:
+            self._purge_locked()
+            self._codes[(serial, step)] = dict(codes)
+
+    def invalidate(self, serial: Optional[str] = None):
+        """Forget cached codes for one device (accounts changed) or for all devices."""
+        with self._lock:
+            if serial is None:
+                self._codes.clear()
+            else:
+                for key in [k for k in self._codes if k[0] == serial]:
+                    del self._codes[key]
+
+    def _purge_locked(self):
+        current = self.current_step()
+        for key in [k for k in self._codes if k[1] < current]:
+            del self._codes[key]
+
+_TYPE_NAMES = {v: k for k, v in TYPES.items()}
+_ALGORITHM_NAMES = {v: k for k, v in ALGORITHMS.items()}
+
+@dataclass
+class OATHAccount:
+    """One LIST entry. Type and algorithm are None when the applet only returns the label."""
+    label: str
+    oath_type: Optional[str] = None
+    algorithm: Optional[str] = None
+
+@dataclass
+class OATHCode:
+    """
+    One CALCULATE ALL entry. `code` is None for HOTP and touch-required
+    accounts, and for periods that do not fit 30 s steps (see calculate_totp()).
+    """
+    label: str
+    code: Optional[str]
+    digits: int
+    oath_type: str = "totp"
+    touch: bool = False
+    period: int = 30
+
+def _label_period(label: str) -> int:
+    """TOTP period of a stored label ('60/label'); 30 when it has no prefix."""
+    prefix, sep, _ = label.partition("/")
+    if sep and prefix.isdigit() and int(prefix) > 0:
+        return int(prefix)
+    return 30
+
+def _format_code(value: memoryview) -> Tuple[str, int]:
+    # Truncated response: digits byte, then the 31-bit dynamic truncation value.
+    digits = value[0] or 6
+    val = int.from_bytes(value[1:], "big") & 0x7FFFFFFF
+    return f"{val % (10**digits):0{digits}d}", digits
+
 class OATHModule:
     """Abstraction for OATH (TOTP/HOTP) functionality."""
     
-    AID_OATH = [0xA0, 0x00, 0x00, 0x05, 0x27, 0x21, 0x01]
+    AID_OATH = bytes.fromhex("A0000005272101")
+    INS_SEND_REMAINING = 0xA5
     
-    def __init__(self, transport: APDUTransport):
+    def __init__(self, transport: APDUTransport, cache: Optional[TOTPCodeCache] = None,
+                 serial: Optional[str] = None, precompute: float = 0.0):
+        """
+        cache: optional TOTPCodeCache; lookups for the current step are then
+            served from one CALCULATE ALL per step instead of a card round trip each.
+        serial: device identity used as cache key (defaults to the reader name).
+        precompute: when > 0, a cache hit within this many seconds of the step
+            boundary also fetches the next step's codes ahead of time.
+        """
         self.transport = transport
+        self.cache = cache
+        self.serial = serial or getattr(transport, "reader_name", None)
+        self.precompute = precompute
 
     def select(self):
         """Select OATH applet."""
-        apdu = [0x00, 0xA4, 0x04, 0x00, len(self.AID_OATH)] + self.AID_OATH
-        data, sw1, sw2 = self.transport.transmit(apdu)
+        data, sw1, sw2 = self.transport.select(self.AID_OATH, get_response_ins=self.INS_SEND_REMAINING)
         return sw1 == 0x90 and sw2 == 0x00
         
+    def _iter_response(self, ins: int, p1: int = 0x00, p2: int = 0x00, data: bytes = b"") -> Iterator[memoryview]:
+        """
+        Send an OATH command and yield its response data chunk by chunk. Each
+        SEND REMAINING is only issued when the consumer asks for more, so do
+        not use the transport for anything else until the iterator is done.
+        An error status on the command itself yields nothing.
+        """
+        response = self.transport.transmit(CommandAPDU(0x00, ins, p1, p2, data).encode(), collect=False)
+        if response.sw1 not in (0x90, 0x61):
+            return
+        yield response.view
+        while response.sw1 == 0x61:
+            response = self.transport.transmit(bytes((0x00, self.INS_SEND_REMAINING, 0x00, 0x00, response.sw2)),
+                                               collect=False)
+            if response.sw1 not in (0x90, 0x61):
+                raise Exception(f"OATH SEND REMAINING failed: SW={response.sw:04x}")
+            yield response.view
+
+    def iter_accounts(self) -> Iterator[OATHAccount]:
+        """Yield the accounts of a LIST as the card returns them (constant memory)."""
+        # INS 0xA1: List
+        for tlv in iter_tlv_stream(self._iter_response(0xA1)):
+            if tlv.tag == 0x71: # Name/Label
+                yield OATHAccount(str(tlv.value, "utf-8", "replace"))
+            elif tlv.tag == 0x72 and len(tlv.value): # Name list entry: type|algorithm byte, then label
+                kind = tlv.value[0]
+                yield OATHAccount(str(tlv.value[1:], "utf-8", "replace"),
+                                  _TYPE_NAMES.get(kind & 0xF0), _ALGORITHM_NAMES.get(kind & 0x0F))
+
     def list_accounts(self):
         """List OATH accounts and return labels."""
-        # INS 0xA1: List
-        apdu = [0x00, 0xA1, 0x00, 0x00]
-        data, sw1, sw2 = self.transport.transmit(apdu)
-        
-        accounts = []
-        if sw1 == 0x90:
-            i = 0
-            while i < len(data):
-                tag = data[i]
-                length = data[i+1]
-                value = data[i+2 : i+2+length]
-                
-                if tag == 0x71: # Name/Label
-                    label = "".join(chr(c) for c in value)
-                    accounts.append(label)
-                    
-                i += 2 + length
-        return accounts
+        return [account.label for account in self.iter_accounts()]
 
     def calculate_totp(self, label: str, timestamp: int = None):
-        """Calculate TOTP code for a given account label."""
-        import time
+        """
+        Calculate TOTP code for a given account label. `timestamp` is a 30 s
+        time step; accounts stored with another period ('60/label') use the
+        code valid at the start of that step.
+        """
+        period = _label_period(label)
+        if self.cache is None or period % 30:
+            # Codes of e.g. 15 s accounts change within a 30 s step: never cached.
+            return self._calculate_totp(label, self._period_step(period, timestamp))
+
+        step = self.cache.current_step() if timestamp is None else timestamp
+        code = self.cache.get(self.serial, label, step)
+        if code is None:
+            codes = self.cache.get_all(self.serial, step)
+            if codes is None:
+                # One CALCULATE ALL fills the whole step for every account.
+                codes = self.calculate_all(step)
+                code = codes.get(label)
+            if code is None:
+                # Not in CALCULATE ALL (touch required or HOTP): ask the card every time.
+                # Never cache these, or later callers would skip the touch / get a stale counter.
+                code = self._calculate_totp(label, self._period_step(period, step))
+            return code
+        self._maybe_precompute(step)
+        return code
+
+    def _period_step(self, period: int, timestamp: Optional[int]) -> int:
+        """Challenge for an account with `period`, from a 30 s step (None = now)."""
         if timestamp is None:
-            timestamp = int(time.time() // 30)
-            
+            now = self.cache.clock() if self.cache is not None else time.time()
+            return int(now // period)
+        return timestamp * 30 // period
+
+    def _calculate_totp(self, label: str, timestamp: int):
         challenge = timestamp.to_bytes(8, "big")
         label_bytes = label.encode()
         
         # Tag 0x71: Label, Tag 0x74: Challenge
-        data = [0x71, len(label_bytes)] + list(label_bytes) + [0x74, 8] + list(challenge)
+        data = encode_tlvs(((0x71, label_bytes), (0x74, challenge)))
         # INS 0xA2: Calculate
-        apdu = [0x00, 0xA2, 0x00, 0x01, len(data)] + data
-        resp, sw1, sw2 = self.transport.transmit(apdu)
+        resp, sw1, sw2 = self.transport.send(0x00, 0xA2, 0x00, 0x01, data)
         
         if sw1 == 0x90 and len(resp) >= 2:
             # Response Tag 0x76: Code
-            if resp[0] == 0x76:
-                digits = resp[1] - 1 # First byte of value is digits
-                code_data = resp[2 : 2+digits]
-                # Actually YubiKey returns truncated int
-                val = int.from_bytes(resp[2:], "big") & 0x7FFFFFFF
-                return f"{val % (10**6):06d}"
+            for tlv in iter_tlv(resp):
+                if tlv.tag == 0x76:
+                    return _format_code(tlv.value)[0]
         return None
 
     def calculate_all(self, timestamp: int = None):
         """Calculate codes for all accounts."""
-        import time
-        if timestamp is None:
-            timestamp = int(time.time() // 30)
-        challenge = timestamp.to_bytes(8, "big")
-        data = [0x74, 8] + list(challenge)
-        # INS 0xA4: Calculate All
-        apdu = [0x00, 0xA4, 0x00, 0x01, len(data)] + data
-        resp, sw1, sw2 = self.transport.transmit(apdu)
-        
+        if self.cache is None:
+            if timestamp is None:
+                timestamp = int(time.time() // 30)
+            return self._calculate_all(timestamp)
+
+        step = self.cache.current_step() if timestamp is None else timestamp
+        codes = self.cache.get_all(self.serial, step)
+        if codes is not None:
+            self._maybe_precompute(step)
+            return codes
+        codes = self._calculate_all(step)
+        if codes and step >= self.cache.current_step():
+            self.cache.put_all(self.serial, step, codes)
+        return codes
+
+    def _maybe_precompute(self, step: int):
+        if self.precompute <= 0 or step != self.cache.current_step():
+            return
+        if self.cache.seconds_left() <= self.precompute and self.cache.get_all(self.serial, step + 1) is None:
+            codes = self._calculate_all(step + 1)
+            if codes:
+                self.cache.put_all(self.serial, step + 1, codes)
+
+    def _calculate_all(self, timestamp: int):
+        # HOTP and touch-required accounts have no code here; calculate_totp() asks for them individually.
+        # So do periods that do not fit 30 s steps, which would not be valid for the whole step.
         results = {}
-        if sw1 == 0x90:
-            # Returns sequence of (0x71 label, 0x76 code)
-            i = 0
-            current_label = None
-            while i < len(resp):
-                tag = resp[i]
-                length = resp[i+1]
-                value = resp[i+2 : i+2+length]
-                if tag == 0x71:
-                    current_label = "".join(chr(c) for c in value)
-                elif tag == 0x76:
-                    val = int.from_bytes(value[1:], "big") & 0x7FFFFFFF
-                    code = f"{val % (10**6):06d}"
-                    if current_label:
-                        results[current_label] = code
-                i += 2 + length
+        periodic = []
+        label = None
+        for tlv in self._iter_calculate_all(timestamp):
+            if tlv.tag == 0x71:
+                label = str(tlv.value, "utf-8", "replace")
+            elif tlv.tag == 0x76 and label is not None:
+                period = _label_period(label)
+                if period == 30:
+                    results[label] = _format_code(tlv.value)[0]
+                elif period % 30 == 0:
+                    periodic.append(label)
+        # The card used a 30 s challenge for every account; recompute the others once the response is read.
+        for label in periodic:
+            code = self._calculate_totp(label, self._period_step(_label_period(label), timestamp))
+            if code is not None:
+                results[label] = code
         return results
 
+    def _iter_calculate_all(self, timestamp: int) -> Iterator[Tlv]:
+        data = encode_tlv(0x74, timestamp.to_bytes(8, "big"))
+        # INS 0xA4: Calculate All, P2=0x01 for truncated codes.
+        # Returns a sequence of (0x71 label, 0x76 code | 0x77 HOTP | 0x7C touch required)
+        return iter_tlv_stream(self._iter_response(0xA4, 0x00, 0x01, data))
+
+    def iter_codes(self, timestamp: int = None) -> Iterator[OATHCode]:
+        """
+        Yield every account of a CALCULATE ALL as the card returns it,
+        fetching 61xx continuations on demand. Bypasses the code cache.
+        Accounts with a period that is a multiple of 30 s are recalculated
+        and yielded last; other periods are yielded without a code.
+        """
+        if timestamp is None:
+            timestamp = int(time.time() // 30)
+        periodic = []
+        label = None
+        for tlv in self._iter_calculate_all(timestamp):
+            if tlv.tag == 0x71:
+                label = str(tlv.value, "utf-8", "replace")
+            elif label is not None:
+                code = self._parse_code(label, tlv)
+                label = None
+                if code is None:
+                    continue
+                if code.code is not None and code.period != 30:
+                    if code.period % 30:
+                        code.code = None
+                    else:
+                        # No other command may run before the whole response is read.
+                        periodic.append(code)
+                        continue
+                yield code
+        for code in periodic:
+            code.code = self._calculate_totp(code.label, self._period_step(code.period, timestamp))
+            yield code
+
+    @staticmethod
+    def _parse_code(label: str, tlv: Tlv) -> Optional[OATHCode]:
+        digits = tlv.value[0] if len(tlv.value) else 6
+        if tlv.tag == 0x76:
+            code, digits = _format_code(tlv.value)
+            return OATHCode(label, code, digits, period=_label_period(label))
+        if tlv.tag == 0x77:
+            return OATHCode(label, None, digits, oath_type="hotp")
+        if tlv.tag == 0x7C:
+            return OATHCode(label, None, digits, touch=True, period=_label_period(label))
+        return None
+
     def put_account(self, label: str, secret_b32: str, alg: int = 0x01, digits: int = 6):
         """Add an OATH account. secret_b32 is the Base32 encoded secret."""
-        import base64
-        # Clean secret and add padding if missing
-        secret_b32 = secret_b32.strip().upper().replace(" ", "")
-        secret_b32 += "=" * ((8 - len(secret_b32) % 8) % 8)
-        try:
-            secret = base64.b32decode(secret_b32)
-        except Exception as e:
-            raise ValueError(f"Invalid Base32 secret: {e}")
-            
-        label_bytes = label.encode()
-        # Tags: 0x71 (Label), 0x73 (Secret), 0x74 (Type), 0x75 (Algorithm)
-        data = [0x71, len(label_bytes)] + list(label_bytes)
-        data += [0x74, 1, 0x20 | digits]
-        data += [0x75, 1, alg]
-        data += [0x73, len(secret)] + list(secret)
-        
+        secret = decode_base32_secret(secret_b32)
         # INS 0x01: Put
-        apdu = [0x00, 0x01, 0x00, 0x00, len(data)] + data
-        resp, sw1, sw2 = self.transport.transmit(apdu)
+        resp, sw1, sw2 = self.transport.send(0x00, 0x01, 0x00, 0x00, self._put_data(label, secret, 0x20, alg, digits))
+        self._invalidate_cache()
         return sw1 == 0x90
 
+    @staticmethod
+    def _put_data(name: str, secret: bytes, oath_type: int, alg: int, digits: int, counter: int = 0) -> bytes:
+        # Tags: 0x71 (Label), 0x73 (Secret), 0x74 (Type), 0x75 (Algorithm), 0x7A (HOTP initial counter)
+        items = [
+            (0x71, name.encode()),
+            (0x74, bytes((oath_type | digits,))),
+            (0x75, bytes((alg,))),
+            (0x73, secret),
+        ]
+        if oath_type == TYPES["hotp"] and counter:
+            items.append((0x7A, counter.to_bytes(4, "big")))
+        return encode_tlvs(items)
+
+    @classmethod
+    def put_command(cls, credential: OATHCredential) -> CommandAPDU:
+        """Validate a credential and encode its PUT command."""
+        credential.validate()
+        data = cls._put_data(credential.name, credential.secret, TYPES[credential.oath_type],
+                             ALGORITHMS[credential.algorithm], credential.digits, credential.counter)
+        return CommandAPDU(0x00, 0x01, 0x00, 0x00, data)
+
+    def put_accounts(self, credentials: Iterable[OATHCredential],
+                     progress: Optional[Callable[[ImportResult], None]] = None) -> List[ImportResult]:
+        """
+        Write many accounts in one session: every PUT is validated and encoded
+        first, then the applet is selected once and all PUTs run as a single
+        transmit_many() batch, inside one card transaction. Returns one
+        ImportResult per credential, in order; `progress` is called as each
+        one completes.
+        """
+        results: List[ImportResult] = []
+        steps = []
+        for cred in credentials:
+            try:
+                steps.append((len(results), APDUStep(self.put_command(cred), name=cred.name)))
+                results.append(ImportResult(cred.name, False))
+            except ValueError as e:
+                result = ImportResult(cred.name, False, str(e))
+                results.append(result)
+                if progress:
+                    progress(result)
+        if not steps:
+            return results
+
+        indices = iter(index for index, _ in steps)
+
+        def on_step(step_result: StepResult):
+            result = results[next(indices)]
+            result.ok = step_result.ok
+            result.elapsed = step_result.elapsed
+            if not step_result.ok:
+                result.error = step_result.error or f"SW={step_result.response.sw:04x}"
+            if progress:
+                progress(result)
+
+        # SELECT inside the same card transaction, so no other client can switch applets before the PUTs.
+        with self.transport.transaction():
+            if not self.select():
+                for index, _ in steps:
+                    results[index].error = "Failed to select OATH applet"
+                return results
+            self.transport.transmit_many([step for _, step in steps], on_error=CONTINUE, progress=on_step)
+        self._invalidate_cache()
+        return results
+
     def delete_account(self, label: str):
         """Delete an OATH account."""
         label_bytes = label.encode()
-        data = [0x71, len(label_bytes)] + list(label_bytes)
+        data = encode_tlv(0x71, label_bytes)
         # INS 0x02: Delete
-        apdu = [0x00, 0x02, 0x00, 0x00, len(data)] + data
-        resp, sw1, sw2 = self.transport.transmit(apdu)
+        resp, sw1, sw2 = self.transport.send(0x00, 0x02, 0x00, 0x00, data)
+        self._invalidate_cache()
         return sw1 == 0x90
 
     def reset(self):
         """Factory reset OATH applet (destroys all accounts)."""
         # INS 0x05: Reset
-        apdu = [0x00, 0x05, 0xDE, 0xAD] # Standard Yubico OATH reset parameters
-        resp, sw1, sw2 = self.transport.transmit(apdu)
+        resp, sw1, sw2 = self.transport.send(0x00, 0x05, 0xDE, 0xAD) # Standard Yubico OATH reset parameters
+        self._invalidate_cache()
         return sw1 == 0x90
 
+    def _invalidate_cache(self):
+        if self.cache is not None:
+            self.cache.invalidate(self.serial)
+
 
 
 class FIDOModule:
     """Abstraction for FIDO (U2F/FIDO2) functionality via APDU."""
     
-    AID_FIDO = [0xA0, 0x00, 0x00, 0x06, 0x47, 0x2F, 0x00, 0x01]
+    AID_FIDO = bytes.fromhex("A0000006472F0001")
     
     def __init__(self, transport: APDUTransport):
         self.transport = transport
 
     def select(self):
         """Select FIDO applet."""
-        apdu = [0x00, 0xA4, 0x04, 0x00, len(self.AID_FIDO)] + self.AID_FIDO
-        data, sw1, sw2 = self.transport.transmit(apdu)
+        data, sw1, sw2 = self.transport.select(self.AID_FIDO)
         return sw1 == 0x90 and sw2 == 0x00
 
 class RescueModule:
@@ -224,3 +536,4 @@ class RescueModule:
 
 
 
+
@@ -0,0 +1,301 @@
+import enum
+import queue
+import select
+import socket
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from .core import PicoKeyDevice, PicoKeyDiscovery
+
+class EventType(enum.Enum):
+    CONNECTED = "connected"
+    DISCONNECTED = "disconnected"
+    CARD_INSERTED = "card_inserted"
+    CARD_REMOVED = "card_removed"
+
+@dataclass
+class DeviceEvent:
+    """A debounced change reported by DeviceMonitor."""
+    type: EventType
+    device: Optional[PicoKeyDevice] = None
+    reader: Optional[str] = None
+    atr: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+def _device_key(dev: PicoKeyDevice) -> tuple:
+    return (dev.vendor_id, dev.product_id,
+            dev.serial_number or dev.port_path or dev.path or dev.hid_path or dev.product_name)
+
+class _PCSCWatcher(threading.Thread):
+    """Blocks on SCardGetStatusChange and reports reader and card changes."""
+
+    PNP_READER = "\\\\?PnP?\\Notification"
+
+    def __init__(self, notify: Callable[[tuple], None], stop: threading.Event, timeout_ms: int = 500):
+        super().__init__(name="pk-monitor-pcsc", daemon=True)
+        self.notify = notify
+        self.stop_event = stop
+        self.timeout_ms = timeout_ms
+
+    @staticmethod
+    def is_picokey(reader: str) -> bool:
+        from .discovery import USBDiscovery
+        return any(s in reader for s in USBDiscovery.SUBSTRINGS)
+
+    def run(self):
+        from smartcard import scard
+        from smartcard.util import toHexString
+
+        hresult, hcontext = scard.SCardEstablishContext(scard.SCARD_SCOPE_USER)
+        if hresult != scard.SCARD_S_SUCCESS:
+            return
+        try:
+            use_pnp = True
+            states: Dict[str, int] = {}
+            pnp_state = scard.SCARD_STATE_UNAWARE
+            initial = True
+            refresh_readers = True
+            while not self.stop_event.is_set():
+                if refresh_readers:
+                    hresult, names = scard.SCardListReaders(hcontext, [])
+                    names = [r for r in (names or []) if self.is_picokey(r)]
+                    for gone in set(states) - set(names):
+                        del states[gone]
+                        self.notify(("card", gone, False, None, False))
+                    for new in names:
+                        states.setdefault(new, scard.SCARD_STATE_UNAWARE)
+                    refresh_readers = False
+
+                request = list(states.items())
+                if use_pnp:
+                    request.append((self.PNP_READER, pnp_state))
+                if not request:
+                    # No readers and no PnP support: nothing to block on.
+                    self.stop_event.wait(1.0)
+                    refresh_readers = True
+                    continue
+
+                hresult, changes = scard.SCardGetStatusChange(hcontext, self.timeout_ms, request)
+                if hresult == scard.SCARD_E_TIMEOUT:
+                    initial = False
+                    continue
+                if hresult != scard.SCARD_S_SUCCESS:
+                    if use_pnp:
+                        # Platform without PnP notification; fall back to per-reader waits.
+                        use_pnp = False
+                    else:
+                        self.stop_event.wait(1.0)
+                    refresh_readers = True
+                    continue
+
+                for reader, event, atr in changes:
+                    if reader == self.PNP_READER:
+                        if event & scard.SCARD_STATE_CHANGED:
+                            refresh_readers = True
+                            self.notify(("readers",))
+                        pnp_state = event & ~scard.SCARD_STATE_CHANGED
+                        continue
+                    if reader not in states:
+                        continue
+                    if event & scard.SCARD_STATE_CHANGED:
+                        present = bool(event & scard.SCARD_STATE_PRESENT)
+                        atr_hex = toHexString(list(atr)) if present and atr else None
+                        self.notify(("card", reader, present, atr_hex, initial))
+                    if event & (scard.SCARD_STATE_UNKNOWN | scard.SCARD_STATE_IGNORE):
+                        refresh_readers = True
+                    states[reader] = event & ~scard.SCARD_STATE_CHANGED
+                initial = False
+        finally:
+            scard.SCardReleaseContext(hcontext)
+
+class _UeventWatcher(threading.Thread):
+    """Listens to Linux kernel uevents (netlink) for USB and hidraw hotplug."""
+
+    NETLINK_KOBJECT_UEVENT = 15
+
+    def __init__(self, notify: Callable[[tuple], None], stop: threading.Event):
+        super().__init__(name="pk-monitor-uevent", daemon=True)
+        self.notify = notify
+        self.stop_event = stop
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, self.NETLINK_KOBJECT_UEVENT)
+        self.sock.bind((0, 1))  # multicast group 1: kernel events
+
+    @classmethod
+    def available(cls) -> bool:
+        return sys.platform.startswith("linux") and hasattr(socket, "AF_NETLINK")
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                ready, _, _ = select.select([self.sock], [], [], 0.5)
+                if not ready:
+                    continue
+                msg = self.sock.recv(16384)
+                fields = dict(
+                    f.split(b"=", 1) for f in msg.split(b"\0") if b"=" in f
+                )
+                subsystem = fields.get(b"SUBSYSTEM")
+                if (subsystem == b"usb" and fields.get(b"DEVTYPE") == b"usb_device") or subsystem == b"hidraw":
+                    self.notify(("usb", fields.get(b"ACTION", b"").decode()))
+        finally:
+            self.sock.close()
+
+class _TopologyPoller(threading.Thread):
+    """Fallback for platforms without hotplug notifications: polls the cheap topology fingerprint."""
+
+    def __init__(self, discovery: PicoKeyDiscovery, notify: Callable[[tuple], None],
+                 stop: threading.Event, interval: float):
+        super().__init__(name="pk-monitor-poll", daemon=True)
+        self.discovery = discovery
+        self.notify = notify
+        self.stop_event = stop
+        self.interval = interval
+
+    def run(self):
+        last = self.discovery.topology()
+        while not self.stop_event.wait(self.interval):
+            current = self.discovery.topology()
+            if current != last:
+                last = current
+                self.notify(("usb", "change"))
+
+class DeviceMonitor:
+    """
+    Reports PicoKey connect/disconnect and card insert/remove events.
+
+    Waits on PC/SC reader-state changes and Linux uevents instead of polling,
+    coalesces bursts of notifications within `debounce` seconds, and only then
+    rescans. Use either the `events()` generator or `add_callback()` + `start()`.
+    """
+
+    def __init__(self, discovery: Optional[PicoKeyDiscovery] = None, debounce: float = 0.25,
+                 poll_interval: float = 1.0, initial: bool = False):
+        """
+        initial: also emit CONNECTED for devices present when monitoring starts.
+        """
+        self.discovery = discovery or PicoKeyDiscovery()
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.initial = initial
+        self._callbacks: List[Callable[[DeviceEvent], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_callback(self, callback: Callable[[DeviceEvent], None]):
+        self._callbacks.append(callback)
+
+    def start(self):
+        """Deliver events to registered callbacks from a background thread."""
+        if self._thread and self._thread.is_alive():
+            return
+
+        def run():
+            for event in self.events():
+                for callback in list(self._callbacks):
+                    callback(event)
+
+        self._thread = threading.Thread(target=run, name="pk-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _start_watchers(self, notify: Callable[[tuple], None]) -> List[threading.Thread]:
+        watchers: List[threading.Thread] = []
+        backends = getattr(self.discovery, "backends", PicoKeyDiscovery.BACKENDS)
+        if "pcsc" in backends:
+            try:
+                import smartcard.scard  # noqa: F401
+                watchers.append(_PCSCWatcher(notify, self._stop))
+            except ImportError:
+                pass
+        if ("usb" in backends or "ctap" in backends) and _UeventWatcher.available():
+            try:
+                watchers.append(_UeventWatcher(notify, self._stop))
+            except OSError:
+                pass
+        if not any(isinstance(w, _UeventWatcher) for w in watchers):
+            watchers.append(_TopologyPoller(self.discovery, notify, self._stop, self.poll_interval))
+        for w in watchers:
+            w.start()
+        return watchers
+
+    def _snapshot(self) -> Dict[tuple, PicoKeyDevice]:
+        return {_device_key(d): d for d in self.discovery.refresh()}
+
+    def events(self) -> Iterator[DeviceEvent]:
+        """Yield debounced events until stop() is called."""
+        self._stop.clear()
+        notifications: "queue.Queue[tuple]" = queue.Queue()
+        watchers = self._start_watchers(notifications.put)
+        try:
+            known = self._snapshot()
+            if self.initial:
+                for dev in known.values():
+                    yield DeviceEvent(EventType.CONNECTED, device=dev, reader=dev.path, atr=dev.atr)
+            cards: Dict[str, bool] = {}
+
+            while not self._stop.is_set():
+                try:
+                    pending = [notifications.get(timeout=0.5)]
+                except queue.Empty:
+                    continue
+
+                # Debounce: wait until the notifications go quiet (bounded so a
+                # chattering device cannot starve the consumer).
+                cutoff = time.monotonic() + max(1.0, self.debounce * 4)
+                while True:
+                    wait = min(self.debounce, cutoff - time.monotonic())
+                    if wait <= 0:
+                        break
+                    try:
+                        pending.append(notifications.get(timeout=wait))
+                    except queue.Empty:
+                        break
+
+                card_updates: Dict[str, Tuple[bool, Optional[str], bool]] = {}
+                rescan = False
+                for note in pending:
+                    if note[0] == "card":
+                        _, reader, present, atr, initial = note
+                        card_updates[reader] = (present, atr, initial)
+                        rescan = rescan or not initial
+                    else:
+                        rescan = True
+
+                if rescan:
+                    current = self._snapshot()
+                    for key in current.keys() - known.keys():
+                        dev = current[key]
+                        yield DeviceEvent(EventType.CONNECTED, device=dev, reader=dev.path, atr=dev.atr)
+                    for key in known.keys() - current.keys():
+                        dev = known[key]
+                        yield DeviceEvent(EventType.DISCONNECTED, device=dev, reader=dev.path, atr=dev.atr)
+                    known = current
+
+                for reader, (present, atr, initial) in card_updates.items():
+                    if cards.get(reader, False) == present:
+                        continue
+                    cards[reader] = present
+                    if initial and not self.initial:
+                        continue
+                    device = next((d for d in known.values() if d.path == reader), None)
+                    yield DeviceEvent(
+                        EventType.CARD_INSERTED if present else EventType.CARD_REMOVED,
+                        device=device, reader=reader, atr=atr,
+                    )
+        finally:
+            self._stop.set()
+            for w in watchers:
+                w.join(timeout=1.0)
@@ -0,0 +1,143 @@
+import base64
+import csv
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional
+from urllib.parse import parse_qsl, unquote, urlparse
+
+ALGORITHMS = {"SHA1": 0x01, "SHA256": 0x02, "SHA512": 0x03}
+TYPES = {"hotp": 0x10, "totp": 0x20}
+MAX_LABEL_BYTES = 64
+
+@dataclass
+class OATHCredential:
+    """An account ready to be written with OATHModule.put_accounts()."""
+    label: str
+    secret: bytes
+    oath_type: str = "totp"
+    algorithm: str = "SHA1"
+    digits: int = 6
+    period: int = 30
+    issuer: Optional[str] = None
+    counter: int = 0  # initial HOTP counter (IMF)
+
+    @property
+    def name(self) -> str:
+        """Label as stored on the device (non-default periods are prefixed, e.g. '60/label')."""
+        if self.oath_type == "totp" and self.period != 30:
+            return f"{self.period}/{self.label}"
+        return self.label
+
+    def validate(self):
+        if not self.label:
+            raise ValueError("Empty label")
+        if len(self.name.encode()) > MAX_LABEL_BYTES:
+            raise ValueError(f"Label longer than {MAX_LABEL_BYTES} bytes")
+        if not self.secret:
+            raise ValueError("Empty secret")
+        if self.oath_type not in TYPES:
+            raise ValueError(f"Unsupported type: {self.oath_type}")
+        if self.algorithm not in ALGORITHMS:
+            raise ValueError(f"Unsupported algorithm: {self.algorithm}")
+        if not 6 <= self.digits <= 8:
+            raise ValueError(f"Unsupported digits: {self.digits}")
+        if self.period <= 0:
+            raise ValueError(f"Invalid period: {self.period}")
+        if not 0 <= self.counter <= 0xFFFFFFFF:
+            raise ValueError(f"Invalid counter: {self.counter}")
+
+@dataclass
+class ImportRow:
+    """One parsed input line: a credential, or the reason it was rejected."""
+    line: int
+    credential: Optional[OATHCredential] = None
+    error: Optional[str] = None
+
+@dataclass
+class ImportResult:
+    """Outcome of writing one account."""
+    label: str
+    ok: bool
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+def decode_base32_secret(secret_b32: str) -> bytes:
+    """Decode a Base32 secret, tolerating spaces, lowercase and missing padding."""
+    # Clean secret and add padding if missing
+    secret_b32 = secret_b32.strip().upper().replace(" ", "")
+    secret_b32 += "=" * ((8 - len(secret_b32) % 8) % 8)
+    try:
+        return base64.b32decode(secret_b32)
+    except Exception as e:
+        raise ValueError(f"Invalid Base32 secret: {e}")
+
+def parse_otpauth_uri(uri: str) -> OATHCredential:
+    """Parse an otpauth://totp/... or otpauth://hotp/... URI."""
+    parsed = urlparse(uri.strip())
+    if parsed.scheme != "otpauth":
+        raise ValueError("Not an otpauth:// URI")
+    params = dict(parse_qsl(parsed.query))
+    if "secret" not in params:
+        raise ValueError("Missing secret")
+    label = unquote(parsed.path.lstrip("/"))
+    issuer = params.get("issuer")
+    if issuer and ":" not in label:
+        label = f"{issuer}:{label}"
+    cred = OATHCredential(
+        label=label,
+        secret=decode_base32_secret(params["secret"]),
+        oath_type=parsed.netloc.lower(),
+        algorithm=params.get("algorithm", "SHA1").upper(),
+        digits=int(params.get("digits", 6)),
+        period=int(params.get("period", 30)),
+        issuer=issuer,
+        counter=int(params.get("counter", 0)),
+    )
+    cred.validate()
+    return cred
+
+# CSV column order when the file has no header row
+CSV_COLUMNS = ["label", "secret", "issuer", "digits", "algorithm", "period", "type"]
+
+def _parse_csv_row(row: dict) -> OATHCredential:
+    label = (row.get("label") or row.get("name") or "").strip()
+    issuer = (row.get("issuer") or "").strip() or None
+    if issuer and ":" not in label:
+        label = f"{issuer}:{label}"
+    cred = OATHCredential(
+        label=label,
+        secret=decode_base32_secret(row.get("secret") or ""),
+        oath_type=(row.get("type") or "totp").strip().lower(),
+        algorithm=(row.get("algorithm") or "SHA1").strip().upper(),
+        digits=int(row.get("digits") or 6),
+        period=int(row.get("period") or 30),
+        issuer=issuer,
+        counter=int(row.get("counter") or 0),
+    )
+    cred.validate()
+    return cred
+
+def iter_import_rows(lines: Iterable[str]) -> Iterator[ImportRow]:
+    """
+    Stream credentials from lines holding otpauth:// URIs and/or CSV rows.
+    A first CSV row mentioning 'secret' is taken as a header; otherwise the
+    columns are CSV_COLUMNS. Blank lines and lines starting with '#' are skipped.
+    """
+    header: Optional[List[str]] = None
+    first_csv = True
+    for number, line in enumerate(lines, 1):
+        text = line.strip()
+        if not text or text.startswith("#"):
+            continue
+        try:
+            if text.lower().startswith("otpauth://"):
+                yield ImportRow(number, parse_otpauth_uri(text))
+                continue
+            fields = next(csv.reader([text]))
+            if first_csv:
+                first_csv = False
+                if any(f.strip().lower() == "secret" for f in fields):
+                    header = [f.strip().lower() for f in fields]
+                    continue
+            yield ImportRow(number, _parse_csv_row(dict(zip(header or CSV_COLUMNS, fields))))
+        except (ValueError, KeyError) as e:
+            yield ImportRow(number, error=str(e))
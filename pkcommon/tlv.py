@@ -0,0 +1,142 @@
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+class Tlv(NamedTuple):
+    """A BER-TLV data object. `value` is a zero-copy view into the parsed buffer."""
+    tag: int
+    value: memoryview
+
+    @property
+    def constructed(self) -> bool:
+        first = self.tag
+        while first > 0xFF:
+            first >>= 8
+        return bool(first & 0x20)
+
+    def children(self) -> Iterator["Tlv"]:
+        """Iterate the data objects nested in a constructed value."""
+        return iter_tlv(self.value)
+
+    def __bytes__(self) -> bytes:
+        return encode_tlv(self.tag, self.value)
+
+def iter_tlv(data: BytesLike) -> Iterator[Tlv]:
+    """
+    Iterate BER-TLV objects at one nesting level. Supports multi-byte tags
+    and long-form lengths (0x81-0x84); values are memoryview slices, not copies.
+    """
+    view = memoryview(data)
+    i, end = 0, len(view)
+    while i < end:
+        tag = view[i]
+        i += 1
+        if tag & 0x1F == 0x1F:
+            while True:
+                if i >= end:
+                    raise ValueError("Truncated TLV tag")
+                b = view[i]
+                i += 1
+                tag = (tag << 8) | b
+                if not b & 0x80:
+                    break
+        if i >= end:
+            raise ValueError("Truncated TLV length")
+        length = view[i]
+        i += 1
+        if length & 0x80:
+            n = length & 0x7F
+            if not 0 < n <= 4 or i + n > end:
+                raise ValueError(f"Invalid TLV length encoding 0x{length:02x}")
+            length = int.from_bytes(view[i:i + n], "big")
+            i += n
+        if i + length > end:
+            raise ValueError(f"Truncated TLV value for tag 0x{tag:x}")
+        yield Tlv(tag, view[i:i + length])
+        i += length
+
+def _read_header(view: memoryview, i: int, end: int) -> Optional[Tuple[int, int, int]]:
+    """(tag, length, value offset) of the object at `i`, or None if its header is incomplete."""
+    if i >= end:
+        return None
+    tag = view[i]
+    i += 1
+    if tag & 0x1F == 0x1F:
+        while True:
+            if i >= end:
+                return None
+            b = view[i]
+            i += 1
+            tag = (tag << 8) | b
+            if not b & 0x80:
+                break
+    if i >= end:
+        return None
+    length = view[i]
+    i += 1
+    if length & 0x80:
+        n = length & 0x7F
+        if not 0 < n <= 4:
+            raise ValueError(f"Invalid TLV length encoding 0x{length:02x}")
+        if i + n > end:
+            return None
+        length = int.from_bytes(view[i:i + n], "big")
+        i += n
+    return tag, length, i
+
+def iter_tlv_stream(chunks: Iterable[BytesLike]) -> Iterator[Tlv]:
+    """
+    iter_tlv() over the concatenation of `chunks` (e.g. the 61xx pieces of a
+    response), pulling the next chunk only when the current one is used up.
+    Objects inside one chunk are views into it; only objects that straddle a
+    boundary are copied.
+    """
+    pending = b""
+    for chunk in chunks:
+        view = memoryview(pending + bytes(chunk)) if pending else memoryview(chunk)
+        i, end = 0, len(view)
+        while True:
+            header = _read_header(view, i, end)
+            if header is None or header[2] + header[1] > end:
+                break
+            tag, length, start = header
+            yield Tlv(tag, view[start:start + length])
+            i = start + length
+        pending = bytes(view[i:])
+    if pending:
+        raise ValueError(f"Truncated TLV at end of stream ({len(pending)} bytes left)")
+
+def parse_tlv_dict(data: BytesLike) -> Dict[int, memoryview]:
+    """Map tag -> value for one nesting level (later duplicates win)."""
+    return {t.tag: t.value for t in iter_tlv(data)}
+
+def find_tlv(data: BytesLike, tag: int, recursive: bool = True) -> Optional[memoryview]:
+    """Return the value of the first object with `tag`, descending into constructed objects."""
+    for t in iter_tlv(data):
+        if t.tag == tag:
+            return t.value
+        if recursive and t.constructed:
+            try:
+                found = find_tlv(t.value, tag, recursive)
+            except ValueError:
+                # Simple-TLV applets (e.g. OATH 0x71) set the constructed bit on plain values.
+                continue
+            if found is not None:
+                return found
+    return None
+
+def encode_tag(tag: int) -> bytes:
+    return tag.to_bytes((tag.bit_length() + 7) // 8 or 1, "big")
+
+def encode_length(length: int) -> bytes:
+    if length < 0x80:
+        return bytes((length,))
+    n = (length.bit_length() + 7) // 8
+    return bytes((0x80 | n,)) + length.to_bytes(n, "big")
+
+def encode_tlv(tag: int, value: BytesLike = b"") -> bytes:
+    return b"".join((encode_tag(tag), encode_length(len(value)), value))
+
+def encode_tlvs(items: Iterable[Tuple[int, BytesLike]]) -> bytes:
+    """Encode a sequence of (tag, value) pairs back to back."""
+    return b"".join(encode_tlv(tag, value) for tag, value in items)
@@ -0,0 +1,261 @@
+import json
+import threading
+import time
+from collections import deque
+from typing import IO, Iterable, List, NamedTuple, Optional, Tuple, Union
+from .apdu import APDUTransport, BytesLike, CardSession, CommandAPDU, ResponseAPDU
+from .emulator import VirtualConnection, VirtualReader
+
+TRACE_VERSION = 1
+
+class TraceEntry(NamedTuple):
+    """One raw command/response exchange as seen by APDUTransport._exchange()."""
+    t: float            # seconds since the recording started
+    elapsed: float      # exchange duration in seconds
+    command: bytes
+    response: bytes
+    sw: int
+    error: Optional[str] = None
+
+    def to_json(self) -> str:
+        record = {"t": round(self.t, 6), "dt": round(self.elapsed, 6), "c": self.command.hex(),
+                  "r": self.response.hex(), "sw": f"{self.sw:04x}"}
+        if self.error is not None:
+            record["err"] = self.error
+        return json.dumps(record, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, line: str) -> "TraceEntry":
+        record = json.loads(line)
+        return cls(record["t"], record["dt"], bytes.fromhex(record["c"]), bytes.fromhex(record["r"]),
+                   int(record["sw"], 16), record.get("err"))
+
+class APDURecorder:
+    """
+    Keeps exchanges in memory (optionally a bounded ring buffer) and/or streams
+    them to an NDJSON file. The first NDJSON line is a header with the reader
+    name and ATR; every other line is one TraceEntry.
+    """
+
+    def __init__(self, maxlen: Optional[int] = None, stream: Optional[IO[str]] = None):
+        """
+        maxlen: keep only the last `maxlen` exchanges in memory (None = unbounded).
+        stream: text file that receives every exchange as it happens.
+        """
+        self.entries: deque = deque(maxlen=maxlen)
+        self.stream = stream
+        self.reader: Optional[str] = None
+        self.atr: Optional[bytes] = None
+        self.started = time.perf_counter()
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._header_written = False
+
+    def header(self) -> str:
+        return json.dumps({"trace": TRACE_VERSION, "reader": self.reader,
+                           "atr": self.atr.hex() if self.atr else None}, separators=(",", ":"))
+
+    def set_source(self, reader: str, atr: Optional[BytesLike]):
+        with self._lock:
+            if self.reader is None:
+                self.reader = reader
+                self.atr = bytes(atr) if atr else None
+
+    def add(self, command: bytes, response: Optional[ResponseAPDU], elapsed: float, error: Optional[str] = None):
+        now = time.perf_counter()
+        entry = TraceEntry(now - elapsed - self.started, elapsed, bytes(command),
+                           response.data if response else b"", response.sw if response else 0, error)
+        with self._lock:
+            if self.entries.maxlen is not None and len(self.entries) == self.entries.maxlen:
+                self.dropped += 1
+            self.entries.append(entry)
+            if self.stream is not None:
+                if not self._header_written:
+                    self.stream.write(self.header() + "\n")
+                    self._header_written = True
+                self.stream.write(entry.to_json() + "\n")
+                self.stream.flush()
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.dropped = 0
+
+    def save(self, path: str):
+        """Write the buffered exchanges (e.g. the last N before a failure) as NDJSON."""
+        with self._lock:
+            entries = list(self.entries)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.header() + "\n")
+            for entry in entries:
+                f.write(entry.to_json() + "\n")
+
+    @classmethod
+    def load(cls, source: Union[str, Iterable[str]]) -> "APDURecorder":
+        """Read an NDJSON trace from a path or an iterable of lines."""
+        recorder = cls()
+        lines = open(source, encoding="utf-8") if isinstance(source, str) else source
+        try:
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith('{"trace"'):
+                    header = json.loads(line)
+                    recorder.reader = header.get("reader")
+                    recorder.atr = bytes.fromhex(header["atr"]) if header.get("atr") else None
+                    continue
+                recorder.entries.append(TraceEntry.from_json(line))
+        finally:
+            if isinstance(source, str):
+                lines.close()
+        return recorder
+
+class RecordingTransport(APDUTransport):
+    """APDUTransport that records every raw exchange (including GET RESPONSE and chained blocks)."""
+
+    def __init__(self, reader_name: str, recorder: Optional[APDURecorder] = None, **kwargs):
+        super().__init__(reader_name, **kwargs)
+        self.recorder = recorder if recorder is not None else APDURecorder()
+
+    def connect(self):
+        if self.session:
+            return
+        super().connect()
+        try:
+            atr = self.session.connection.getATR()
+        except Exception:
+            atr = None
+        self.recorder.set_source(self.reader_name, atr)
+
+    def _exchange(self, apdu: bytes) -> ResponseAPDU:
+        start = time.perf_counter()
+        try:
+            response = super()._exchange(apdu)
+        except Exception as e:
+            self.recorder.add(apdu, None, time.perf_counter() - start, str(e) or type(e).__name__)
+            raise
+        self.recorder.add(apdu, response, time.perf_counter() - start)
+        return response
+
+class ReplayCard:
+    """
+    Card that answers from a recorded trace, for use behind a VirtualConnection.
+    strict: every command must match the next recorded one; otherwise the next
+    recorded exchange with the same command is served and unmatched ones are skipped.
+    timing: sleep for the recorded duration (divided by `speed`) before answering.
+    """
+
+    latency = 0.0
+
+    def __init__(self, trace: APDURecorder, strict: bool = True, timing: bool = False, speed: float = 1.0):
+        self.entries: List[TraceEntry] = list(trace.entries)
+        self.strict = strict
+        self.timing = timing
+        self.speed = speed
+        self.position = 0
+        self._atr = trace.atr
+        self._lock = threading.Lock()
+
+    @property
+    def atr(self) -> bytes:
+        return self._atr or b"\x3b\x00"
+
+    @property
+    def remaining(self) -> int:
+        return len(self.entries) - self.position
+
+    def reset(self):
+        pass
+
+    def rewind(self):
+        with self._lock:
+            self.position = 0
+
+    def peek(self) -> Optional[bytes]:
+        """Command of the next recorded exchange (None once the trace is exhausted)."""
+        with self._lock:
+            return self.entries[self.position].command if self.position < len(self.entries) else None
+
+    def _next(self, apdu: bytes) -> TraceEntry:
+        with self._lock:
+            if self.position >= len(self.entries):
+                raise Exception(f"Replay trace exhausted at command {apdu.hex().upper()}")
+            if self.strict:
+                entry = self.entries[self.position]
+                if entry.command != apdu:
+                    raise Exception(f"Replay mismatch at exchange {self.position}: expected "
+                                    f"{entry.command.hex().upper()}, got {apdu.hex().upper()}")
+                self.position += 1
+                return entry
+            for i in range(self.position, len(self.entries)):
+                if self.entries[i].command == apdu:
+                    self.position = i + 1
+                    return self.entries[i]
+            raise Exception(f"Command {apdu.hex().upper()} not found in the rest of the trace")
+
+    def process(self, apdu: bytes) -> Tuple[bytes, int, int]:
+        entry = self._next(bytes(apdu))
+        if self.timing and entry.elapsed > 0:
+            time.sleep(entry.elapsed / self.speed)
+        if entry.error is not None:
+            raise Exception(entry.error)
+        return entry.response, entry.sw >> 8, entry.sw & 0xFF
+
+    def plug(self, name: Optional[str] = None):
+        """Register a reader serving this trace so discovery and other transports can find it."""
+        from .apdu import register_reader
+        reader = ReplayReader(self, name or "PicoKey Replay 00 00")
+        register_reader(reader)
+        return reader
+
+class ReplayConnection(VirtualConnection):
+    """
+    Connection to a ReplayCard. It behaves like the shared PC/SC handle most
+    traces are recorded on, so select() never skips a SELECT on its own.
+    """
+
+    in_process = False
+
+class ReplayReader(VirtualReader):
+    def createConnection(self) -> ReplayConnection:
+        return ReplayConnection(self.card)
+
+class ReplayTransport(APDUTransport):
+    """APDUTransport that serves the responses of a recorded trace instead of talking to a card."""
+
+    def __init__(self, trace: Union[str, APDURecorder], strict: bool = True, timing: bool = False,
+                 speed: float = 1.0, **kwargs):
+        """
+        trace: NDJSON path or an APDURecorder.
+        See ReplayCard for strict/timing/speed.
+        """
+        if not isinstance(trace, APDURecorder):
+            trace = APDURecorder.load(trace)
+        self.card = ReplayCard(trace, strict=strict, timing=timing, speed=speed)
+        super().__init__(trace.reader or "PicoKey Replay 00 00", **kwargs)
+
+    def connect(self):
+        if self.session:
+            return
+        session = CardSession(ReplayReader(self.card, self.reader_name))
+        session.open()
+        self.session = session
+        if self.metrics is not None:
+            self.metrics.record_connect("pcsc", self.reader_name)
+
+    def select(self, aid: BytesLike, get_response_ins: int = None) -> ResponseAPDU:
+        """
+        Skip the SELECT exactly when the recording did: it is sent only if it
+        is the next recorded command, whatever connection mode (shared,
+        exclusive, emulator) the trace was recorded with.
+        """
+        if not self.session:
+            self.connect()
+        aid = bytes(aid)
+        session = self.session
+        with session.lock:
+            if session.selected is not None and session.selected[0] == aid:
+                if self.card.peek() != CommandAPDU(0x00, 0xA4, 0x04, 0x00, aid).encode():
+                    return session.selected[1]
+            return super().select(aid, get_response_ins)
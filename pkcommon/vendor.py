@@ -1,19 +1,41 @@
-import usb.core
-import usb.util
-from typing import List, Optional
+import array
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Union
+from .metrics import Metrics
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+# Packets per bulk request in streaming mode; libusb splits each request into
+# max-packet transfers, so several packets are in flight per Python call.
+DEFAULT_BURST = 64
 
 class VendorTransport:
     """Handles raw communication with the PicoKey Vendor interface (Class 255)."""
     
-    def __init__(self, vendor_id: int, product_id: int, backend=None):
+    def __init__(self, vendor_id: int, product_id: int, backend=None, metrics: Optional[Metrics] = None,
+                 timeout: int = 1000, burst: int = DEFAULT_BURST):
+        """
+        metrics: optional metrics.Metrics recording every transfer on this transport.
+        timeout: default USB timeout in milliseconds.
+        burst: packets per bulk request in write_stream()/read_stream().
+        """
         self.vid = vendor_id
         self.pid = product_id
         self.backend = backend
+        self.metrics = metrics
+        self.timeout = timeout
+        self.burst = burst
         self.device = None
         self.ep_out = None
         self.ep_in = None
+        self._rx: Dict[int, array.array] = {}
+        self._reader: Optional["BulkReader"] = None
 
     def connect(self):
+        import usb.core
+        import usb.util
         self.device = usb.core.find(idVendor=self.vid, idProduct=self.pid, backend=self.backend)
         if not self.device:
             raise Exception("Device not found")
@@ -43,16 +65,241 @@ class VendorTransport:
             else:
                 self.ep_in = ep
 
+        if self.metrics is not None:
+            self.metrics.record_connect("vendor", self.device_name)
+
+    @property
+    def device_name(self) -> str:
+        return f"{self.vid:04x}:{self.pid:04x}"
+
+    @property
+    def max_packet(self) -> int:
+        """wMaxPacketSize of the bulk endpoints (64 at full speed, 512 at high speed)."""
+        if not self.ep_out:
+            self.connect()
+        return min(self.ep_out.wMaxPacketSize, self.ep_in.wMaxPacketSize)
+
+    def _rx_buffer(self, size: int) -> array.array:
+        # pyusb reads in place only into array.array objects of the requested
+        # size, so keep one reusable buffer per request size (at most `burst`).
+        buf = self._rx.get(size)
+        if buf is None:
+            buf = self._rx[size] = array.array("B", bytes(size))
+        return buf
+
+    def _check_no_reader(self):
+        # Direct reads and a BulkReader would race for packets and split the stream.
+        if self._reader is not None:
+            raise Exception("IN endpoint is owned by a BulkReader; use its read() or call stop_reader() first")
+
     def send(self, data: List[int]):
         if not self.ep_out:
             self.connect()
-        self.ep_out.write(data)
+        if self.metrics is None:
+            self.ep_out.write(data)
+            return
+        start = time.perf_counter()
+        try:
+            self.ep_out.write(data)
+        except Exception as e:
+            self.metrics.record_error("vendor", self.device_name, "send", e)
+            raise
+        self.metrics.record("vendor", self.device_name, "send", time.perf_counter() - start, bytes_out=len(data))
 
     def receive(self, length: int = 64, timeout: int = 1000) -> List[int]:
+        self._check_no_reader()
         if not self.ep_in:
             self.connect()
-        return self.ep_in.read(length, timeout)
+        if self.metrics is None:
+            return self.ep_in.read(length, timeout)
+        start = time.perf_counter()
+        try:
+            data = self.ep_in.read(length, timeout)
+        except Exception as e:
+            self.metrics.record_error("vendor", self.device_name, "receive", e)
+            raise
+        self.metrics.record("vendor", self.device_name, "receive", time.perf_counter() - start, bytes_in=len(data))
+        return data
 
     def exchange(self, data: List[int], response_len: int = 64) -> List[int]:
         self.send(data)
         return self.receive(response_len)
+
+    def write_stream(self, data: BytesLike, timeout: Optional[int] = None, zlp: bool = True) -> int:
+        """
+        Send a payload of any size as max-packet-aligned bulk requests of
+        `burst` packets. With `zlp`, a zero-length packet terminates payloads
+        that end on a packet boundary so the device can detect the end.
+        Returns the number of bytes written.
+        """
+        if not self.ep_out:
+            self.connect()
+        timeout = self.timeout if timeout is None else timeout
+        view = memoryview(data).cast("B")
+        packet = self.max_packet
+        step = packet * self.burst
+        start = time.perf_counter() if self.metrics is not None else 0.0
+        try:
+            for off in range(0, len(view), step):
+                self.ep_out.write(view[off:off + step], timeout)
+            if zlp and len(view) % packet == 0:
+                self.ep_out.write(b"", timeout)
+        except Exception as e:
+            if self.metrics is not None:
+                self.metrics.record_error("vendor", self.device_name, "write_stream", e)
+            raise
+        if self.metrics is not None:
+            self.metrics.record("vendor", self.device_name, "write_stream", time.perf_counter() - start,
+                                bytes_out=len(view))
+        return len(view)
+
+    def read_stream(self, length: int, timeout: Optional[int] = None, out: Optional[memoryview] = None) -> memoryview:
+        """
+        Read exactly `length` bytes (or until a short packet ends the transfer)
+        using the transport's preallocated receive buffer. Pass `out` to fill
+        a caller-owned buffer (at least `length` and one max packet long);
+        otherwise a new bytearray is returned as a view. Not available while
+        a BulkReader is running.
+        """
+        self._check_no_reader()
+        if not self.ep_in:
+            self.connect()
+        timeout = self.timeout if timeout is None else timeout
+        packet = self.max_packet
+        if out is not None:
+            target = memoryview(out).cast("B")
+            if len(target) < max(length, packet):
+                raise ValueError(f"out buffer too small: {len(target)} bytes, need {max(length, packet)}")
+        else:
+            target = memoryview(bytearray(length))
+        burst_size = packet * self.burst
+        got = 0
+        start = time.perf_counter() if self.metrics is not None else 0.0
+        try:
+            while got < length:
+                rx = self._rx_buffer(min(burst_size, -(-(length - got) // packet) * packet))
+                n = self.ep_in.read(rx, timeout)
+                take = min(n, length - got)
+                target[got:got + take] = memoryview(rx)[:take]
+                got += take
+                if n % packet:
+                    break  # short packet: device ended the transfer
+        except Exception as e:
+            if self.metrics is not None:
+                self.metrics.record_error("vendor", self.device_name, "read_stream", e)
+            raise
+        if self.metrics is not None:
+            self.metrics.record("vendor", self.device_name, "read_stream", time.perf_counter() - start, bytes_in=got)
+        return target[:got]
+
+    def transfer(self, data: BytesLike, response_len: int, timeout: Optional[int] = None) -> memoryview:
+        """
+        Pipelined request/response: the IN read is already posted (on a helper
+        thread) while the request is written, so a device that starts answering
+        before the whole payload arrived never stalls on a full buffer.
+        """
+        self._check_no_reader()
+        result: dict = {}
+
+        def reader():
+            try:
+                result["data"] = self.read_stream(response_len, timeout)
+            except Exception as e:
+                result["error"] = e
+
+        if not self.ep_out:
+            self.connect()
+        thread = threading.Thread(target=reader, name="pk-vendor-rx", daemon=True)
+        thread.start()
+        try:
+            self.write_stream(data, timeout)
+        finally:
+            thread.join()
+        if "error" in result:
+            raise result["error"]
+        return result["data"]
+
+    def start_reader(self, depth: int = 8, callback: Optional[Callable[[memoryview], None]] = None) -> "BulkReader":
+        """Start a background reader continuously draining the IN endpoint (see BulkReader)."""
+        if self._reader is None:
+            if not self.ep_in:
+                self.connect()
+            self._reader = BulkReader(self, depth=depth, callback=callback)
+            self._reader.start()
+        return self._reader
+
+    def stop_reader(self):
+        if self._reader is not None:
+            self._reader.stop()
+            self._reader = None
+
+class BulkReader:
+    """
+    Background thread that keeps an IN request outstanding at all times,
+    reading into a fixed ring of `depth` preallocated buffers. Data is
+    delivered to `callback(view)` (the view is only valid during the call)
+    or queued for read(). When every buffer is full the thread waits, which
+    applies back-pressure on the device instead of allocating.
+    """
+
+    def __init__(self, transport: VendorTransport, depth: int = 8,
+                 callback: Optional[Callable[[memoryview], None]] = None, poll_timeout: int = 100):
+        self.transport = transport
+        self.callback = callback
+        self.poll_timeout = poll_timeout
+        size = transport.max_packet * transport.burst
+        self.buffers = [array.array("B", bytes(size)) for _ in range(depth)]
+        self._free: "queue.Queue[int]" = queue.Queue()
+        for i in range(depth):
+            self._free.put(i)
+        self._ready: "queue.Queue[tuple]" = queue.Queue()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.error: Optional[Exception] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="pk-vendor-reader", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        import usb.core
+        ep_in = self.transport.ep_in
+        while not self._stop.is_set():
+            try:
+                index = self._free.get(timeout=self.poll_timeout / 1000)
+            except queue.Empty:
+                continue
+            buf = self.buffers[index]
+            try:
+                n = ep_in.read(buf, self.poll_timeout)
+            except usb.core.USBTimeoutError:
+                self._free.put(index)
+                continue
+            except Exception as e:
+                self.error = e
+                self._free.put(index)
+                self._ready.put((None, 0))
+                return
+            if self.callback is not None:
+                try:
+                    self.callback(memoryview(buf)[:n])
+                finally:
+                    self._free.put(index)
+            else:
+                self._ready.put((index, n))
+
+    def read(self, timeout: Optional[float] = None) -> bytes:
+        """Next received chunk (blocking). Raises the reader's error if it stopped on one."""
+        index, n = self._ready.get(timeout=timeout)
+        if index is None:
+            raise self.error
+        try:
+            return bytes(memoryview(self.buffers[index])[:n])
+        finally:
+            self._free.put(index)
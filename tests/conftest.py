@@ -0,0 +1,49 @@
+import pytest
+from pkcommon.apdu import APDUTransport, register_reader, unregister_reader
+from pkcommon.emulator import VirtualConnection, VirtualPicoKey, VirtualReader
+from pkcommon.modules import OATHModule
+
+# Manual scripts that need real hardware (run them directly with python).
+collect_ignore = ["test_apdu.py", "test_ctap.py", "test_discovery.py"]
+
+# RFC 4226 / RFC 6238 SHA1 test secret
+SECRET = b"12345678901234567890"
+
+@pytest.fixture
+def card():
+    card = VirtualPicoKey()
+    yield card
+    card.unplug()
+
+@pytest.fixture
+def transport(card):
+    transport = APDUTransport(str(card.plug()))
+    transport.connect()
+    yield transport
+    transport.disconnect()
+
+@pytest.fixture
+def oath(transport):
+    module = OATHModule(transport)
+    assert module.select()
+    return module
+
+class SharedConnection(VirtualConnection):
+    """A connection other processes could also use (like a shared-mode PC/SC handle)."""
+    in_process = False
+
+    def connect(self, *args, mode=None, **kwargs):
+        self.mode = mode
+        self.connected = True
+
+class SharedReader(VirtualReader):
+    def createConnection(self):
+        return SharedConnection(self.card)
+
+@pytest.fixture
+def shared_reader():
+    card = VirtualPicoKey()
+    reader = SharedReader(card, "Shared Virtual Reader 00 00")
+    register_reader(reader)
+    yield card, reader
+    unregister_reader(reader)
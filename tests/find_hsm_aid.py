@@ -1,4 +1,4 @@
-from pkcommon.apdu import APDUTransport
+from pkcommon.apdu import APDUTransport, APDUStep, CONTINUE
 from smartcard.System import readers
 from smartcard.util import toHexString
 
@@ -38,18 +38,22 @@ def probe():
             "Pico Custom RID": [0xD0, 0x70, 0x49, 0x43, 0x4F, 0x4B, 0x45, 0x59],
         }
         
-        for name, aid in CANDIDATES.items():
-            apdu = [0x00, 0xA4, 0x04, 0x00, len(aid)] + aid
-            try:
-                data, sw1, sw2 = transport.transmit(apdu)
-                if sw1 == 0x90 or sw1 == 0x61:
-                    print(f"[+] Found potential match: {name} (AID={toHexString(aid)})")
-                elif sw1 == 0x6a and sw2 == 0x82:
-                    pass
-                else:
-                    print(f"[?] Interesting result for {name}: SW={sw1:02x}{sw2:02x}")
-            except:
+        steps = [
+            APDUStep([0x00, 0xA4, 0x04, 0x00, len(aid)] + aid, expect=(0x9000, 0x61), collect=False, name=name)
+            for name, aid in CANDIDATES.items()
+        ]
+        batch = transport.transmit_many(steps, on_error=CONTINUE)
+        for result in batch.results:
+            name = result.step.name
+            if result.response is None:
+                continue
+            sw1, sw2 = result.response.sw1, result.response.sw2
+            if result.ok:
+                print(f"[+] Found potential match: {name} (AID={toHexString(CANDIDATES[name])}) [{result.elapsed * 1000:.1f}ms]")
+            elif sw1 == 0x6a and sw2 == 0x82:
                 pass
+            else:
+                print(f"[?] Interesting result for {name}: SW={sw1:02x}{sw2:02x}")
                 
         transport.disconnect()
     except Exception as e:
@@ -1,4 +1,4 @@
-from pkcommon.apdu import APDUTransport
+from pkcommon.apdu import APDUTransport, ConnectionPool
 from smartcard.System import readers
 
 # Common AIDs to probe
@@ -15,11 +15,12 @@ def probe():
         print("No smartcard readers found.")
         return
 
+    pool = ConnectionPool()
     for reader in r_list:
         print(f"\n--- Probing Reader: {reader.name} ---")
         
         for name, aid in AIDS.items():
-            transport = APDUTransport(reader.name)
+            transport = APDUTransport(reader.name, pool=pool)
             try:
                 transport.connect()
                 # Select Applet APDU: 00 A4 04 00 [Lc] [AID]
@@ -35,6 +36,7 @@ def probe():
                 transport.disconnect()
             except Exception as e:
                 print(f"Error probing {name}: {e}")
+    pool.close()
 
 
 if __name__ == "__main__":
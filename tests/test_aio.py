@@ -0,0 +1,63 @@
+import asyncio
+import threading
+from conftest import SECRET
+from pkcommon.aio import AsyncAPDUTransport, AsyncManagementModule, AsyncOATHModule
+from pkcommon.modules import TOTPCodeCache
+
+def test_module_options_are_passed_through(card):
+    card.add_account("a", SECRET)
+    reader = card.plug()
+
+    async def run():
+        async with AsyncAPDUTransport(str(reader)) as transport:
+            oath = AsyncOATHModule(transport, cache=TOTPCodeCache(clock=lambda: 59.0), serial="SN1", precompute=2.0)
+            assert oath.module.serial == "SN1" and oath.module.precompute == 2.0
+            await oath.select()
+            before = card.apdu_count
+            codes = [await oath.calculate_totp("a") for _ in range(3)]
+            return codes, card.apdu_count - before
+
+    # One CALCULATE ALL for the step, one more precomputing the next (t=59 is 1 s before it).
+    assert asyncio.run(run()) == (["287082"] * 3, 2)
+
+def test_calls_are_serialized_per_reader_off_the_loop(card):
+    card.latency = 0.005
+    for i in range(5):
+        card.add_account(f"account{i}", SECRET)
+    reader = card.plug()
+    active, peak, threads = [0], [0], set()
+    process = card.process
+
+    def spy(apdu):
+        threads.add(threading.get_ident())
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        try:
+            return process(apdu)
+        finally:
+            active[0] -= 1
+
+    card.process = spy
+
+    async def worker():
+        async with AsyncAPDUTransport(str(reader)) as transport:
+            oath = AsyncOATHModule(transport)
+            await oath.select()
+            return await oath.calculate_all(1)
+
+    async def run():
+        return await asyncio.gather(*(worker() for _ in range(4)))
+
+    results = asyncio.run(run())
+    assert all(len(codes) == 5 for codes in results)
+    assert peak[0] == 1
+    assert threading.get_ident() not in threads
+
+def test_management_version(card):
+    reader = card.plug()
+
+    async def run():
+        async with AsyncAPDUTransport(str(reader)) as transport:
+            return await AsyncManagementModule(transport).select()
+
+    assert asyncio.run(run()) == "5.7.0"
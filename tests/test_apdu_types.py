@@ -0,0 +1,53 @@
+import pytest
+from pkcommon.apdu import CommandAPDU, ResponseAPDU, _with_short_le
+from pkcommon.modules import OATHModule
+
+@pytest.mark.parametrize("command, encoded", [
+    (CommandAPDU(0x00, 0xA4, 0x04, 0x00), "00A40400"),                        # case 1
+    (CommandAPDU(0x00, 0xC0, 0x00, 0x00, le=256), "00C0000000"),             # case 2, Le=256 -> 00
+    (CommandAPDU(0x00, 0xA4, 0x04, 0x00, b"\xa0\x01"), "00A4040002A001"),     # case 3
+    (CommandAPDU(0x00, 0xA4, 0x04, 0x00, b"\xa0\x01", 0), "00A4040002A00100"),  # case 4
+])
+def test_encode_short(command, encoded):
+    assert command.encode() == bytes.fromhex(encoded)
+    assert bytes(command) == bytes.fromhex(encoded)
+
+@pytest.mark.parametrize("command, encoded", [
+    (CommandAPDU(0x00, 0xCA, 0x00, 0x6E, le=65536), "00CA006E000000"),
+    (CommandAPDU(0x00, 0xDB, 0x3F, 0xFF, b"\x01\x02"), "00DB3FFF0000020102"),
+    (CommandAPDU(0x00, 0xDB, 0x3F, 0xFF, b"\x01", 0x1234), "00DB3FFF000001011234"),
+])
+def test_encode_extended(command, encoded):
+    assert command.encode(extended=True) == bytes.fromhex(encoded)
+
+def test_encode_limits():
+    with pytest.raises(ValueError):
+        CommandAPDU(0x00, 0xDB, 0x00, 0x00, bytes(256)).encode()
+    with pytest.raises(ValueError):
+        CommandAPDU(0x00, 0xC0, 0x00, 0x00, le=257).encode()
+    with pytest.raises(ValueError):
+        CommandAPDU(0x00, 0xDB, 0x00, 0x00, bytes(65536)).encode(extended=True)
+    assert len(CommandAPDU(0x00, 0xDB, 0x00, 0x00, bytes(255)).encode()) == 5 + 255
+
+def test_response_apdu():
+    response = ResponseAPDU(b"\x01\x02", 0x90, 0x00)
+    data, sw1, sw2 = response
+    assert (data, sw1, sw2) == (b"\x01\x02", 0x90, 0x00)
+    assert response.sw == 0x9000 and response.ok
+    assert isinstance(response.view, memoryview) and bytes(response.view[1:]) == b"\x02"
+    assert not ResponseAPDU(b"", 0x61, 0x10).ok
+
+def test_with_short_le():
+    assert _with_short_le(bytes.fromhex("00CA006E00"), 0x20) == bytes.fromhex("00CA006E20")
+    assert _with_short_le(bytes.fromhex("00CA006E"), 0x20) == bytes.fromhex("00CA006E20")
+    assert _with_short_le(bytes.fromhex("00A4040002A00100"), 0x10) == bytes.fromhex("00A4040002A00110")
+    assert _with_short_le(bytes.fromhex("00A4040002A001"), 0x10) == bytes.fromhex("00A4040002A00110")
+
+@pytest.mark.parametrize("convert", [bytes, bytearray, memoryview, list])
+def test_transmit_accepts_buffer_types(transport, convert):
+    apdu = bytes((0x00, 0xA4, 0x04, 0x00, len(OATHModule.AID_OATH))) + OATHModule.AID_OATH
+    assert transport.transmit(convert(apdu)).sw == 0x9000
+
+def test_transmit_encodes_command_apdu(transport):
+    response = transport.transmit(CommandAPDU(0x00, 0xA4, 0x04, 0x00, OATHModule.AID_OATH))
+    assert response.ok and isinstance(response.data, bytes)
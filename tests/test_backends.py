@@ -0,0 +1,34 @@
+import json
+import subprocess
+import sys
+import pytest
+from pkcommon.core import PicoKeyDiscovery
+
+def imported_after(code: str):
+    """Names of pkcommon modules and device stacks imported by running `code` in a fresh interpreter."""
+    script = code + (
+        "\nimport json, sys\n"
+        "print(json.dumps(sorted(m for m in sys.modules"
+        " if m.startswith(('pkcommon', 'usb', 'smartcard', 'fido2')))))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout
+    return set(json.loads(out.splitlines()[-1]))
+
+def test_package_import_loads_no_backend():
+    assert imported_after("import pkcommon") == {"pkcommon", "pkcommon.core"}
+
+def test_only_selected_backend_is_loaded():
+    modules = imported_after(
+        "from pkcommon.core import PicoKeyDiscovery\n"
+        "PicoKeyDiscovery(backends=['pcsc']).scan()\n"
+    )
+    assert "pkcommon.apdu" in modules
+    assert not modules & {"pkcommon.ctap", "pkcommon.vendor", "usb", "fido2"}
+
+def test_backend_selection_validation():
+    assert PicoKeyDiscovery(backends=["ctap", "usb"]).backends == ("ctap", "usb")
+    assert PicoKeyDiscovery().backends == PicoKeyDiscovery.BACKENDS
+    with pytest.raises(ValueError, match="bogus"):
+        PicoKeyDiscovery(backends=["usb", "bogus"])
+    with pytest.raises(ValueError):
+        PicoKeyDiscovery(backends=[])
@@ -0,0 +1,71 @@
+from conftest import SECRET
+from pkcommon.apdu import CONTINUE, STOP, APDUStep, CommandAPDU
+from pkcommon.modules import OATHModule
+
+SELECT_OATH = CommandAPDU(0x00, 0xA4, 0x04, 0x00, OATHModule.AID_OATH)
+LIST = bytes.fromhex("00A10000")
+UNKNOWN = bytes.fromhex("00EE0000")
+
+def test_all_steps_succeed(transport, card):
+    card.add_account("a", SECRET)
+    seen = []
+    batch = transport.transmit_many([SELECT_OATH, LIST, list(LIST), APDUStep(LIST, name="again")], progress=seen.append)
+    assert batch.ok and batch.completed
+    assert [r.response.sw for r in batch.results] == [0x9000] * 4
+    assert seen == batch.results
+    assert batch.results[3].step.name == "again"
+
+def test_stop_ends_script(transport):
+    batch = transport.transmit_many([SELECT_OATH, UNKNOWN, LIST], on_error=STOP)
+    assert not batch.ok and not batch.completed
+    assert len(batch.results) == 2
+    assert batch.results[1].response.sw == 0x6D00 and not batch.results[1].ok
+
+def test_continue_runs_everything(transport):
+    batch = transport.transmit_many([SELECT_OATH, UNKNOWN, LIST], on_error=CONTINUE)
+    assert batch.completed and not batch.ok
+    assert [r.ok for r in batch.results] == [True, False, True]
+
+def test_step_policy_overrides_script_default(transport):
+    steps = [SELECT_OATH, APDUStep(UNKNOWN, on_error=STOP), LIST]
+    batch = transport.transmit_many(steps, on_error=CONTINUE)
+    assert len(batch.results) == 2 and not batch.completed
+    steps = [SELECT_OATH, APDUStep(UNKNOWN, expect=(0x6D00,)), LIST]
+    assert transport.transmit_many(steps).ok
+
+def test_uncollected_continuation(transport, card):
+    card.max_response = 20
+    for i in range(10):
+        card.add_account(f"account{i}", SECRET)
+    steps = [SELECT_OATH, APDUStep(LIST, expect=(0x9000, 0x61), collect=False)]
+    batch = transport.transmit_many(steps)
+    response = batch.results[1].response
+    assert batch.ok and response.sw1 == 0x61 and len(response.data) == 20
+    collected = transport.transmit_many([SELECT_OATH, LIST]).results[1].response
+    assert collected.sw == 0x9000 and len(collected.data) > 20
+
+def test_transport_error_is_recorded(transport, card):
+    def broken(apdu):
+        raise IOError("reader unplugged")
+
+    transport.select(OATHModule.AID_OATH)
+    card.process = broken
+    batch = transport.transmit_many([LIST, LIST], on_error=CONTINUE)
+    assert [r.error for r in batch.results] == ["reader unplugged"] * 2
+    assert all(r.response is None and not r.ok for r in batch.results)
+
+def test_steps_run_in_one_transaction_with_timings(transport, card):
+    card.latency = 0.01
+    depths = []
+    process = card.process
+
+    def spy(apdu):
+        depths.append(transport.session.transaction_depth)
+        return process(apdu)
+
+    card.process = spy
+    batch = transport.transmit_many([SELECT_OATH, LIST, LIST])
+    assert depths == [1, 1, 1]
+    assert all(r.elapsed >= 0.01 for r in batch.results)
+    assert batch.elapsed >= sum(r.elapsed for r in batch.results)
+    assert transport.session.transaction_depth == 0
@@ -0,0 +1,141 @@
+import time
+from types import SimpleNamespace
+import pytest
+from pkcommon.core import PicoKeyDevice
+from pkcommon.ctap import CTAPDevicePool, _TrackedCtapDevice
+from pkcommon.monitor import DeviceEvent, EventType
+
+class FakeCtap2:
+    def __init__(self, aaguid=b"\x01" * 16):
+        self.aaguid = aaguid
+        self.calls = 0
+
+    def get_info(self):
+        self.calls += 1
+        return SimpleNamespace(aaguid=self.aaguid, versions=["FIDO_2_1"], extensions=[],
+                               options={"clientPin": self.calls > 1})
+
+class FakeHid:
+    def __init__(self):
+        self.closed = False
+        self.error = None
+
+    def call(self, cmd, data=b"", event=None, on_keepalive=None):
+        if self.error:
+            raise self.error
+        return b""
+
+    def close(self):
+        self.closed = True
+
+def descriptor(path, serial="S1"):
+    return SimpleNamespace(path=path, vid=0x2E8A, pid=0x10FE, serial_number=serial)
+
+def open_device(pool, path, serial="S1"):
+    """Put `path` in the pool as device() and ctap2() would, without opening HID."""
+    hid = FakeHid()
+    pool._descriptors[path] = descriptor(path, serial)
+    pool._handles[path] = _TrackedCtapDevice(hid, on_change=lambda: pool.invalidate(path),
+                                             on_error=lambda: pool.discard(path))
+    pool._ctap2[path] = FakeCtap2()
+    return hid, pool._ctap2[path]
+
+def test_get_info_is_cached():
+    pool = CTAPDevicePool()
+    _, ctap2 = open_device(pool, "/dev/hidraw0")
+    first = pool.get_info("/dev/hidraw0")
+    assert pool.get_info("/dev/hidraw0") is first
+    assert (ctap2.calls, pool.hits, pool.misses) == (1, 1, 1)
+    assert pool.get_info("/dev/hidraw0", refresh=True) is not first and ctap2.calls == 2
+    assert pool._keys["/dev/hidraw0"] == (b"\x01" * 16, "S1", "/dev/hidraw0")
+
+def test_cache_expires_after_max_age():
+    pool = CTAPDevicePool(max_age=0.01)
+    _, ctap2 = open_device(pool, "/dev/hidraw0")
+    pool.get_info("/dev/hidraw0")
+    time.sleep(0.02)
+    pool.get_info("/dev/hidraw0")
+    assert ctap2.calls == 2 and pool.hits == 0
+
+def test_invalidate_keeps_handles():
+    pool = CTAPDevicePool()
+    devices = {path: open_device(pool, path) for path in ("/dev/hidraw0", "/dev/hidraw1")}
+    for path in devices:
+        pool.get_info(path)
+    pool.invalidate("/dev/hidraw0")
+    pool.get_info("/dev/hidraw0")
+    pool.get_info("/dev/hidraw1")
+    assert [ctap2.calls for _, ctap2 in devices.values()] == [2, 1]
+    pool.invalidate()
+    assert pool._info == {} and set(pool._handles) == set(devices)
+
+def test_discard_and_close():
+    pool = CTAPDevicePool()
+    hid0, _ = open_device(pool, "/dev/hidraw0")
+    hid1, _ = open_device(pool, "/dev/hidraw1")
+    pool.get_info("/dev/hidraw0")
+    pool.discard("/dev/hidraw0")
+    assert hid0.closed and "/dev/hidraw0" not in pool._handles
+    assert "/dev/hidraw0" not in pool._ctap2 and pool._info == {}
+    with pool:
+        pass
+    assert hid1.closed and pool._handles == {} and pool._descriptors == {}
+
+def test_attach_discards_disconnected_devices():
+    callbacks = []
+    pool = CTAPDevicePool()
+    pool.attach(SimpleNamespace(add_callback=callbacks.append))
+    hid, _ = open_device(pool, "/dev/hidraw0")
+    device = PicoKeyDevice(0x2E8A, 0x10FE, "S1", hid_path="/dev/hidraw0")
+
+    callbacks[0](DeviceEvent(EventType.CONNECTED, device))
+    callbacks[0](DeviceEvent(EventType.CARD_REMOVED, reader="Pico Key CCID"))
+    assert not hid.closed
+    callbacks[0](DeviceEvent(EventType.DISCONNECTED, device))
+    assert hid.closed and pool._handles == {}
+
+@pytest.fixture
+def fido2_hid(monkeypatch):
+    hid = pytest.importorskip("fido2.hid")
+    present = {}
+    monkeypatch.setattr(hid, "list_descriptors", lambda: list(present.values()))
+    return present
+
+def test_refresh_drops_unplugged_and_replaced_devices(fido2_hid):
+    pool = CTAPDevicePool()
+    hid0, _ = open_device(pool, "/dev/hidraw0", serial="S1")
+    hid1, _ = open_device(pool, "/dev/hidraw1", serial="S2")
+    hid2, ctap2 = open_device(pool, "/dev/hidraw2", serial="S3")
+    pool.get_info("/dev/hidraw2")
+    # hidraw0 is gone, hidraw1 now holds a different key, hidraw2 is unchanged.
+    fido2_hid.update({"/dev/hidraw1": descriptor("/dev/hidraw1", "S9"),
+                      "/dev/hidraw2": descriptor("/dev/hidraw2", "S3")})
+    assert sorted(pool.refresh()) == ["/dev/hidraw1", "/dev/hidraw2"]
+    assert hid0.closed and hid1.closed and not hid2.closed
+    assert pool.descriptor("/dev/hidraw1").serial_number == "S9"
+    pool.get_info("/dev/hidraw2")
+    assert ctap2.calls == 1
+
+def test_tracked_handle_reports_changes_and_errors():
+    hid = pytest.importorskip("fido2.hid")
+    cbor = pytest.importorskip("fido2.cbor")
+    pool = CTAPDevicePool()
+    device, ctap2 = open_device(pool, "/dev/hidraw0")
+    handle = pool._handles["/dev/hidraw0"]
+
+    pool.get_info("/dev/hidraw0")
+    handle.call(hid.CTAPHID.CBOR, b"\x04")  # getInfo
+    handle.call(hid.CTAPHID.CBOR, b"\x06" + cbor.encode({1: 2, 2: 1}))  # clientPIN getRetries
+    pool.get_info("/dev/hidraw0")
+    assert ctap2.calls == 1
+
+    handle.call(hid.CTAPHID.CBOR, b"\x06" + cbor.encode({1: 2, 2: 3}))  # clientPIN setPIN
+    pool.get_info("/dev/hidraw0")
+    handle.call(hid.CTAPHID.CBOR, b"\x01")  # makeCredential
+    pool.get_info("/dev/hidraw0")
+    assert ctap2.calls == 3
+
+    device.error = OSError("unplugged")
+    with pytest.raises(OSError):
+        handle.call(hid.CTAPHID.PING, b"")
+    assert device.closed and pool._handles == {}
@@ -0,0 +1,84 @@
+from pkcommon.core import PicoKeyDevice, PicoKeyDiscovery
+
+class FakeBackends:
+    """Backend loader whose scan count and bus topology the test controls."""
+
+    def __init__(self):
+        self.scans = 0
+        self.plugged = ["AAA"]
+
+    def __call__(self, name):
+        backends = self
+
+        class Backend:
+            @staticmethod
+            def find_all_picokeys():
+                backends.scans += 1
+                return [PicoKeyDevice(1, 2, serial, "Pico Key") for serial in backends.plugged]
+
+            @staticmethod
+            def topology():
+                return tuple(backends.plugged)
+
+        return Backend
+
+def discovery(ttl: float):
+    backends = FakeBackends()
+    d = PicoKeyDiscovery(cache_ttl=ttl, backends=["usb"])
+    d._load_backend = backends
+    return d, backends
+
+def test_cache_disabled_by_default():
+    d, backends = discovery(0.0)
+    d.list_devices()
+    d.list_devices()
+    assert backends.scans == 2
+
+def test_cache_reused_while_topology_unchanged():
+    d, backends = discovery(60.0)
+    first = d.list_devices()
+    first[0].serial_number = "changed by caller"
+    second = d.list_devices()
+    assert backends.scans == 1
+    assert second[0].serial_number == "AAA"
+
+def test_topology_change_invalidates():
+    d, backends = discovery(60.0)
+    d.list_devices()
+    backends.plugged = ["AAA", "BBB"]
+    assert [dev.serial_number for dev in d.list_devices()] == ["AAA", "BBB"]
+    assert backends.scans == 2
+
+def test_ttl_expiry(monkeypatch):
+    import pkcommon.core as core
+    now = [1000.0]
+    monkeypatch.setattr(core.time, "monotonic", lambda: now[0])
+    d, backends = discovery(5.0)
+    d.list_devices()
+    now[0] += 4.9
+    d.list_devices()
+    assert backends.scans == 1
+    now[0] += 0.2
+    d.list_devices()
+    assert backends.scans == 2
+
+def test_invalidate_and_refresh():
+    d, backends = discovery(60.0)
+    d.list_devices()
+    d.invalidate()
+    d.list_devices()
+    assert backends.scans == 2
+    d.refresh()
+    d.list_devices()
+    assert backends.scans == 3
+
+def test_topology_reports_backend_errors():
+    d = PicoKeyDiscovery(backends=["pcsc"])
+
+    class Broken:
+        @staticmethod
+        def topology():
+            raise OSError("no service")
+
+    d._load_backend = lambda name: Broken
+    assert d.topology() == (("pcsc", "error:OSError"),)
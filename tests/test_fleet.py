@@ -0,0 +1,74 @@
+import threading
+import time
+import pytest
+from conftest import SECRET
+from pkcommon.core import PicoKeyDevice
+from pkcommon.emulator import VirtualPicoKey
+from pkcommon.fleet import FleetExecutor
+from pkcommon.metrics import Metrics
+from pkcommon.modules import OATHModule
+
+def devices(n):
+    return [PicoKeyDevice(1, 2, f"{i:04d}") for i in range(n)]
+
+def test_map_keeps_order_and_captures_errors():
+    def operation(device):
+        if device.serial_number == "0002":
+            raise ValueError("locked")
+        return device.serial_number
+
+    seen = []
+    report = FleetExecutor(max_workers=4).map(devices(5), operation, progress=seen.append)
+    assert [r.result for r in report.results] == ["0000", "0001", None, "0003", "0004"]
+    assert [r.device.serial_number for r in report.failed] == ["0002"]
+    assert report.failed[0].error == "locked"
+    assert len(report.succeeded) == 4 and len(seen) == 5
+
+def test_map_runs_concurrently_within_the_worker_bound():
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def operation(device):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+
+    report = FleetExecutor(max_workers=3).map(devices(9), operation)
+    assert peak[0] == 3
+    # Three waves of 50 ms, not nine.
+    assert report.elapsed < 0.05 * 9 * 0.8
+    assert all(r.elapsed >= 0.05 for r in report.results)
+
+def test_map_empty():
+    report = FleetExecutor().map([], lambda d: None)
+    assert report.results == [] and report.elapsed == 0.0
+
+@pytest.fixture
+def fleet_cards():
+    cards = [VirtualPicoKey(serial=1000 + i) for i in range(3)]
+    readers = [card.plug() for card in cards]
+    yield cards, [PicoKeyDevice(0, 0, str(c.serial), r.name, path=r.name) for c, r in zip(cards, readers)]
+    for card in cards:
+        card.unplug()
+
+def test_run_provisions_every_smartcard_device(fleet_cards):
+    cards, fleet = fleet_cards
+    usb_only = PicoKeyDevice(1, 2, "USB", "Pico Key", hid_path="/dev/hidraw0")
+    missing = PicoKeyDevice(0, 0, "GONE", "Gone Reader 00 00", path="Gone Reader 00 00")
+    metrics = Metrics()
+
+    def provision(device, transport):
+        oath = OATHModule(transport)
+        oath.select()
+        oath.put_account("Example:fleet", "GEZDGNBVGY3TQOJQGEZDGNBVGY3TQOJQ")
+        return oath.list_accounts()
+
+    report = FleetExecutor(max_workers=2, metrics=metrics).run(fleet + [usb_only, missing], provision)
+    assert [r.device.serial_number for r in report.results] == ["1000", "1001", "1002", "GONE"]
+    assert [r.result for r in report.succeeded] == [["Example:fleet"]] * 3
+    assert "not found" in report.failed[0].error
+    assert all(card.accounts["Example:fleet"].secret == SECRET for card in cards)
+    assert sorted(metrics.connects) == sorted(("pcsc", d.path) for d in fleet)
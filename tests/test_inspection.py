@@ -0,0 +1,103 @@
+import json
+from types import SimpleNamespace
+import pytest
+from conftest import SECRET
+from pkcommon.core import PicoKeyDevice
+from pkcommon.emulator import AID_OTP, VirtualPicoKey
+from pkcommon.inspection import APPLETS, Inspector
+
+class FakeCTAPPool:
+    """Stands in for ctap.CTAPDevicePool: fixed descriptors and getInfo answers."""
+
+    def __init__(self, descriptors, infos):
+        self._descriptors = descriptors
+        self.infos = infos
+        self.queried = []
+
+    def descriptors(self):
+        return self._descriptors
+
+    def get_info(self, path):
+        self.queried.append(path)
+        info = self.infos[path]
+        if isinstance(info, Exception):
+            raise info
+        return info
+
+def hid(path, vid=0x2E8A, pid=0x10FE):
+    return SimpleNamespace(path=path, vid=vid, pid=pid)
+
+def ctap_info(**options):
+    return SimpleNamespace(versions=["FIDO_2_0", "FIDO_2_1"], extensions=["credProtect"], options=options)
+
+@pytest.fixture
+def cards():
+    cards = [VirtualPicoKey(serial=2000 + i) for i in range(2)]
+    readers = [card.plug() for card in cards]
+    yield cards, [PicoKeyDevice(0x2E8A, 0x10FE, str(c.serial), path=r.name, atr=c.atr.hex())
+                  for c, r in zip(cards, readers)]
+    for card in cards:
+        card.unplug()
+
+def test_smartcard_probe(cards):
+    (card, other), devices = cards
+    card.add_account("Example:alice", SECRET)
+    report = Inspector(max_workers=2, fido=False).inspect(devices)
+
+    first = report.devices[0]
+    assert first.error is None and first.device is devices[0]
+    assert list(first.applets) == [name for name, _ in APPLETS]
+    assert all(a.present and a.sw == 0x9000 for a in first.applets.values())
+    assert first.applets["management"].version == "5.7.0"
+    assert list(first.oath_codes) == ["Example:alice"] and len(first.oath_codes["Example:alice"]) == 6
+    assert [s.name for s in first.steps] == [f"select:{name}" for name, _ in APPLETS] + ["oath:calculate_all"]
+    assert first.fido is None
+    assert report.devices[1].oath_codes == {}
+
+def test_absent_applet(cards):
+    (card, _), devices = cards
+    process = card.process
+
+    def no_otp(apdu):
+        if apdu[1] == 0xA4 and AID_OTP in apdu:
+            return b"", 0x6A, 0x82
+        return process(apdu)
+
+    card.process = no_otp
+    result = Inspector(fido=False, oath_codes=False).inspect_device(devices[0])
+    otp = result.applets["otp"]
+    assert not otp.present and otp.sw == 0x6A82 and not otp.blocked
+    assert result.applets["oath"].present and result.oath_codes is None
+    assert [s.ok for s in result.steps] == [True, False, True, True, True]
+
+def test_fido_probe_matches_hid_devices():
+    by_path = PicoKeyDevice(0x2E8A, 0x10FE, "A", hid_path="/dev/hidraw1")
+    by_ids = PicoKeyDevice(0x2E8A, 0xCAFE, "B")
+    ambiguous = PicoKeyDevice(0x2E8A, 0x10FE, "C")
+    pool = FakeCTAPPool(
+        [hid("/dev/hidraw0"), hid("/dev/hidraw1"), hid("/dev/hidraw2", pid=0xCAFE)],
+        {"/dev/hidraw1": ctap_info(rk=True, up=True), "/dev/hidraw2": OSError("busy")},
+    )
+    report = Inspector(ctap_pool=pool).inspect([by_path, by_ids, ambiguous])
+    a, b, c = report.devices
+
+    assert a.fido.versions == ["FIDO_2_0", "FIDO_2_1"]
+    assert a.fido.options == {"rk": True, "up": True, "uv": None, "plat": None}
+    assert a.applets == {} and a.steps[0].name == "ctap:get_info" and a.steps[0].ok
+
+    assert b.fido is None and not b.steps[0].ok and b.steps[0].error == "busy"
+    # Two HID devices share the VID/PID: no guess is made.
+    assert c.fido is None and c.steps == []
+    assert sorted(pool.queried) == ["/dev/hidraw1", "/dev/hidraw2"]
+
+def test_unreachable_reader_and_json(cards):
+    _, devices = cards
+    missing = PicoKeyDevice(0x2E8A, 0x10FE, "GONE", path="Gone Reader 00 00", atr="3B00")
+    report = Inspector(fido=False).inspect([devices[0], missing])
+    assert report.devices[0].error is None
+    assert report.devices[1].error and report.devices[1].applets == {}
+
+    rows = json.loads(json.dumps(report.to_dict()))
+    assert [row["serial_number"] for row in rows] == [devices[0].serial_number, "GONE"]
+    assert rows[0]["interfaces"] == ["pcsc"] and rows[0]["applets"]["oath"]["present"]
+    assert rows[1]["applets"] is None
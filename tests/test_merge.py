@@ -0,0 +1,53 @@
+from pkcommon.core import PicoKeyDevice, PicoKeyDiscovery
+
+VID, PID = 0x2E8A, 0x10FE
+
+def usb(serial=None, port=None):
+    return PicoKeyDevice(VID, PID, serial, "Pico Key", bus=1, address=5, port_path=port)
+
+def pcsc(serial=None, name="Pico Key CCID"):
+    reader = f"{name} ({serial}) 00 00" if serial else f"{name} 00 00"
+    return PicoKeyDevice(0, 0, serial, reader, path=reader, atr="3B00")
+
+def ctap(serial=None, port=None, hid="/dev/hidraw0"):
+    return PicoKeyDevice(VID, PID, serial, "PicoKey FIDO", port_path=port, hid_path=hid)
+
+def merge(raw_usb, raw_sc, raw_ctap):
+    return PicoKeyDiscovery(backends=["usb"])._merge(raw_usb, raw_sc, raw_ctap)
+
+def test_joins_by_serial_and_port():
+    devices = merge(
+        [usb("AAA", "1-1"), usb("BBB", "1-2")],
+        [pcsc("BBB"), pcsc("AAA")],
+        [ctap(None, "1-2", "/dev/hidraw1"), ctap(None, "1-1", "/dev/hidraw0")],
+    )
+    assert len(devices) == 2
+    by_serial = {d.serial_number: d for d in devices}
+    assert by_serial["AAA"].path == "Pico Key CCID (AAA) 00 00"
+    assert by_serial["AAA"].hid_path == "/dev/hidraw0"
+    assert by_serial["BBB"].hid_path == "/dev/hidraw1"
+    assert by_serial["BBB"].interfaces == ["usb", "pcsc", "ctap"]
+
+def test_single_leftover_is_paired():
+    # No serials anywhere (e.g. permissions): one key per backend is still one device.
+    devices = merge([usb()], [pcsc()], [ctap()])
+    assert len(devices) == 1
+    assert devices[0].path and devices[0].hid_path
+
+def test_ambiguous_leftovers_are_listed_separately():
+    devices = merge([usb(port="1-1"), usb(port="1-2")], [pcsc(), pcsc(name="Other")], [])
+    assert len(devices) == 4
+
+def test_conflicting_serials_not_paired():
+    devices = merge([usb("AAA")], [pcsc("ZZZ")], [])
+    assert len(devices) == 2
+
+def test_sc_only_and_ctap_only():
+    devices = merge([], [pcsc("AAA")], [ctap("AAA", hid="/dev/hidraw3")])
+    assert len(devices) == 1
+    assert devices[0].path and devices[0].hid_path == "/dev/hidraw3"
+
+def test_inputs_not_modified():
+    raw_usb, raw_sc = [usb("AAA")], [pcsc("AAA")]
+    merge(raw_usb, raw_sc, [])
+    assert raw_usb[0].path is None
@@ -0,0 +1,91 @@
+import json
+import pytest
+from conftest import SECRET
+from pkcommon.apdu import APDUTransport
+from pkcommon.metrics import Histogram, Metrics, applet_name
+from pkcommon.modules import OATHModule
+
+def test_histogram_buckets_and_quantiles():
+    hist = Histogram((0.001, 0.01, 0.1))
+    for value in (0.0005, 0.005, 0.005, 0.05, 0.5):
+        hist.observe(value)
+    assert hist.counts == [1, 2, 1, 1]
+    assert hist.count == 5 and hist.max == 0.5
+    assert hist.sum == pytest.approx(0.5605)
+    assert 0.001 <= hist.quantile(0.5) <= 0.01
+    assert hist.quantile(1.0) == 0.5
+    assert Histogram().quantile(0.5) == 0.0
+
+def test_applet_names():
+    assert applet_name(OATHModule.AID_OATH) == "oath"
+    assert applet_name(None) == "none"
+    assert applet_name(b"\x01\x02") == "0102"
+
+@pytest.fixture
+def measured(card):
+    metrics = Metrics()
+    card.add_account("a", SECRET)
+    transport = APDUTransport(str(card.plug()), metrics=metrics)
+    oath = OATHModule(transport)
+    oath.select()
+    oath.list_accounts()
+    transport.send(0x00, 0xEE, 0x00, 0x00)
+    yield metrics, transport
+    transport.disconnect()
+
+def test_transport_records_exchanges(measured):
+    metrics, transport = measured
+    reader = transport.reader_name
+    assert set(metrics.latency) == {("pcsc", reader, "oath", "A4"), ("pcsc", reader, "oath", "A1"),
+                                    ("pcsc", reader, "oath", "EE")}
+    assert metrics.status_words[("pcsc", reader, "oath", "9000")] == 2
+    assert metrics.status_words[("pcsc", reader, "oath", "6D00")] == 1
+    assert metrics.connects == {("pcsc", reader): 1}
+    assert metrics.bytes_out[("pcsc", reader)] == 5 + 7 + 4 + 4
+    assert metrics.bytes_in[("pcsc", reader)] > 0
+
+def test_errors_and_callbacks(card):
+    metrics = Metrics()
+    events = []
+    metrics.add_callback(events.append)
+    transport = APDUTransport(str(card.plug()), metrics=metrics)
+    transport.connect()
+
+    def broken(apdu):
+        raise IOError("unplugged")
+
+    card.process = broken
+    with pytest.raises(IOError):
+        transport.send(0x00, 0xA1, 0x00, 0x00)
+    assert metrics.errors == {("pcsc", transport.reader_name, "A1", "OSError"): 1}
+    assert [e.kind for e in events] == ["connect", "error"]
+    assert events[1].error == "unplugged"
+    metrics.remove_callback(events.append)
+    metrics.record("vendor", "dev", "send", 0.001)
+    assert len(events) == 2
+    transport.disconnect()
+
+def test_snapshot_and_json(measured):
+    metrics, _ = measured
+    snapshot = json.loads(metrics.to_json())
+    assert snapshot == metrics.snapshot()
+    rows = {row["op"]: row for row in snapshot["latency"]}
+    assert rows["A1"]["count"] == 1 and sum(rows["A1"]["buckets"].values()) == 1
+    metrics.reset()
+    assert metrics.snapshot()["latency"] == []
+
+def test_prometheus_export(measured):
+    metrics, transport = measured
+    metrics.record_connect("vendor", 'dev "1"\n', reconnect=True)
+    text = metrics.to_prometheus(prefix="pk")
+    lines = text.splitlines()
+    assert "# TYPE pk_operation_duration_seconds histogram" in lines
+    labels = f'transport="pcsc",device="{transport.reader_name}",applet="oath",op="A1"'
+    buckets = [line for line in lines if line.startswith(f"pk_operation_duration_seconds_bucket{{{labels}")]
+    assert buckets[-1] == f'pk_operation_duration_seconds_bucket{{{labels},le="+Inf"}} 1'
+    counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    assert counts == sorted(counts)  # cumulative
+    assert f'pk_status_words_total{{transport="pcsc",device="{transport.reader_name}",applet="oath",sw="6D00"}} 1' \
+        in lines
+    assert 'pk_reconnects_total{transport="vendor",device="dev \\"1\\"\\n"} 1' in lines
+    assert text.endswith("\n")
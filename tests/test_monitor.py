@@ -0,0 +1,108 @@
+import queue
+import time
+from dataclasses import replace
+import pytest
+from pkcommon.core import PicoKeyDevice
+from pkcommon.monitor import DeviceMonitor, EventType
+
+KEY = PicoKeyDevice(1, 2, "AAA", "Pico Key", path="Pico Key CCID (AAA) 00 00")
+OTHER = PicoKeyDevice(1, 2, "BBB", "Pico Key", path="Pico Key CCID (BBB) 00 00")
+
+class FakeDiscovery:
+    backends = ("usb", "pcsc")
+
+    def __init__(self, devices):
+        self.devices = list(devices)
+        self.refreshes = 0
+
+    def refresh(self):
+        self.refreshes += 1
+        return [replace(d) for d in self.devices]
+
+class ScriptedMonitor(DeviceMonitor):
+    """Monitor whose watcher notifications are sent by the test."""
+
+    notify = None
+
+    def _start_watchers(self, notify):
+        self.notify = notify
+        return []
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+@pytest.fixture
+def monitor():
+    discovery = FakeDiscovery([KEY])
+    monitor = ScriptedMonitor(discovery, debounce=0.05)
+    events = queue.Queue()
+    monitor.add_callback(events.put)
+    monitor.events_queue = events
+    yield monitor
+    monitor.stop()
+
+def start(monitor):
+    monitor.start()
+    wait_until(lambda: monitor.discovery.refreshes == 1)
+
+def drain(monitor, wait=0.3):
+    events = []
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            events.append(monitor.events_queue.get(timeout=max(0.0, deadline - time.monotonic())))
+        except queue.Empty:
+            return events
+
+def test_burst_is_debounced_into_one_rescan(monitor):
+    start(monitor)
+    monitor.discovery.devices.append(OTHER)
+    for _ in range(10):
+        monitor.notify(("usb", "add"))
+    events = drain(monitor)
+    assert [(e.type, e.device.serial_number) for e in events] == [(EventType.CONNECTED, "BBB")]
+    assert monitor.discovery.refreshes == 2
+
+def test_disconnect(monitor):
+    start(monitor)
+    monitor.discovery.devices = []
+    monitor.notify(("usb", "remove"))
+    events = drain(monitor)
+    assert [(e.type, e.device.serial_number) for e in events] == [(EventType.DISCONNECTED, "AAA")]
+
+def test_card_events_are_deduplicated(monitor):
+    start(monitor)
+    monitor.notify(("card", KEY.path, True, "3B 00", True))   # present at startup: not reported
+    assert drain(monitor) == []
+    monitor.notify(("card", KEY.path, False, None, False))
+    monitor.notify(("card", KEY.path, True, "3B 01", False))
+    events = drain(monitor)
+    # Only the last state of a burst counts, and it equals the known one.
+    assert events == []
+    monitor.notify(("card", KEY.path, False, None, False))
+    events = drain(monitor)
+    assert [(e.type, e.reader) for e in events] == [(EventType.CARD_REMOVED, KEY.path)]
+    assert events[0].device.serial_number == "AAA"
+
+def test_initial_events():
+    discovery = FakeDiscovery([KEY])
+    monitor = ScriptedMonitor(discovery, debounce=0.05, initial=True)
+    events = monitor.events()
+    first = next(events)
+    assert (first.type, first.device.serial_number) == (EventType.CONNECTED, "AAA")
+    monitor.notify(("card", KEY.path, True, "3B 00", True))
+    second = next(events)
+    assert (second.type, second.atr) == (EventType.CARD_INSERTED, "3B 00")
+    monitor.stop()
+    events.close()
+
+def test_stop_ends_delivery(monitor):
+    start(monitor)
+    monitor.stop()
+    assert monitor._thread is None
+    monitor.discovery.devices = []
+    monitor.notify(("usb", "remove"))
+    assert drain(monitor, 0.1) == []
@@ -0,0 +1,256 @@
+import asyncio
+import pytest
+from conftest import SECRET
+from pkcommon.apdu import APDUTransport
+from pkcommon.aio import AsyncAPDUTransport, AsyncOATHModule
+from pkcommon.modules import OATHAccount, OATHCode, OATHModule, TOTPCodeCache
+from pkcommon.oath_import import OATHCredential, iter_import_rows, parse_otpauth_uri
+
+# RFC 6238 appendix B, T=59 (time step 1)
+RFC6238 = {
+    "SHA1": (b"12345678901234567890", "94287082"),
+    "SHA256": (b"12345678901234567890123456789012", "46119246"),
+    "SHA512": (b"1234567890123456789012345678901234567890123456789012345678901234", "90693936"),
+}
+
+def b32(secret: bytes) -> str:
+    import base64
+    return base64.b32encode(secret).decode()
+
+def test_put_list_calculate_delete(oath, card):
+    assert oath.put_account("Example:alice", b32(SECRET))
+    assert oath.list_accounts() == ["Example:alice"]
+    assert oath.calculate_totp("Example:alice", 1) == "287082"
+    assert oath.calculate_all(1) == {"Example:alice": "287082"}
+    oath.delete_account("Example:alice")
+    assert oath.list_accounts() == []
+    assert "Example:alice" not in card.accounts
+
+@pytest.mark.parametrize("algorithm", sorted(RFC6238))
+def test_calculate_rfc6238_eight_digits(oath, algorithm):
+    secret, expected = RFC6238[algorithm]
+    oath.put_accounts([OATHCredential("rfc", secret, algorithm=algorithm, digits=8)])
+    assert oath.calculate_totp("rfc", 1) == expected
+    assert oath.calculate_all(1) == {"rfc": expected}
+
+def test_reset(oath, card):
+    oath.put_account("a", b32(SECRET))
+    oath.put_account("b", b32(SECRET))
+    oath.reset()
+    assert card.accounts == {}
+    assert oath.list_accounts() == []
+
+def test_calculate_all_skips_hotp_and_touch(oath, card):
+    card.add_account("totp", SECRET)
+    card.add_account("hotp", SECRET, oath_type=0x10)
+    card.add_account("touch", SECRET, touch=True)
+    assert oath.calculate_all(1) == {"totp": "287082"}
+
+def test_hotp_initial_counter_from_uri(oath, card):
+    cred = parse_otpauth_uri(f"otpauth://hotp/Example:bob?secret={b32(SECRET)}&counter=1")
+    assert cred.counter == 1
+    assert [r.ok for r in oath.put_accounts([cred])] == [True]
+    assert card.accounts["Example:bob"].counter == 1
+    # RFC 4226 appendix D: counter 1 -> 287082, counter 2 -> 359152
+    assert oath.calculate_totp("Example:bob", 0) == "287082"
+    assert oath.calculate_totp("Example:bob", 0) == "359152"
+
+# -- TOTP code cache ---------------------------------------------------------
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_cache_serves_step_and_expires_at_boundary(transport, card):
+    card.add_account("a", SECRET)
+    card.add_account("b", SECRET)
+    clock = Clock(59.0)
+    cache = TOTPCodeCache(clock=clock)
+    oath = OATHModule(transport, cache=cache)
+    oath.select()
+
+    before = card.apdu_count
+    assert oath.calculate_totp("a") == "287082"
+    assert oath.calculate_totp("b") == "287082"
+    assert card.apdu_count == before + 1  # one CALCULATE ALL for the whole step
+
+    clock.now = 60.0
+    assert cache.get_all(oath.serial, 1) is None
+    oath.calculate_totp("a")
+    assert card.apdu_count == before + 2
+
+def test_cache_precomputes_next_step(transport, card):
+    card.add_account("a", SECRET)
+    clock = Clock(50.0)
+    cache = TOTPCodeCache(clock=clock)
+    oath = OATHModule(transport, cache=cache, precompute=5.0)
+    oath.select()
+    oath.calculate_totp("a")
+    assert cache.get_all(oath.serial, 2) is None
+    clock.now = 57.0
+    oath.calculate_totp("a")
+    assert cache.get_all(oath.serial, 2) is not None
+
+def test_cache_never_stores_touch_or_hotp_codes(transport, card):
+    card.add_account("plain", SECRET)
+    card.add_account("touch", SECRET, touch=True)
+    card.add_account("hotp", SECRET, oath_type=0x10)
+    oath = OATHModule(transport, cache=TOTPCodeCache(clock=Clock(59.0)))
+    oath.select()
+    oath.calculate_totp("plain")
+    for label in ("touch", "hotp"):
+        before = card.apdu_count
+        for _ in range(3):
+            oath.calculate_totp(label)
+        assert card.apdu_count == before + 3
+    assert oath.cache.get(oath.serial, "touch", 1) is None
+
+# -- bulk import -------------------------------------------------------------
+
+def test_import_rows_and_put_accounts(oath, card):
+    lines = [
+        "# exported accounts",
+        f"otpauth://totp/alice?secret={b32(SECRET)}&issuer=Example&period=60",
+        "label,secret,digits",
+        f"bob,{b32(SECRET)},8",
+        "carol,!!notbase32!!,6",
+        "",
+    ]
+    rows = list(iter_import_rows(lines))
+    assert [r.line for r in rows] == [2, 4, 5]
+    assert rows[2].credential is None and "Base32" in rows[2].error
+
+    bad = OATHCredential("dave", b"", period=60)
+    credentials = [r.credential for r in rows if r.credential] + [bad]
+    seen = []
+    results = oath.put_accounts(credentials, progress=seen.append)
+    assert [(r.label, r.ok) for r in results] == [("60/Example:alice", True), ("bob", True), ("60/dave", False)]
+    assert results[2].error == "Empty secret"
+    assert sorted(r.label for r in seen) == sorted(r.label for r in results)
+    assert card.accounts["bob"].digits == 8
+    assert sorted(card.accounts) == ["60/Example:alice", "bob"]
+
+def test_put_accounts_selects_inside_the_transaction(shared_reader):
+    card, reader = shared_reader
+    transport = APDUTransport(reader.name)
+    transport.connect()
+    depths = []
+    process = card.process
+
+    def spy(apdu):
+        if apdu[1] in (0xA4, 0x01):
+            depths.append((apdu[1], transport.session.transaction_depth))
+        return process(apdu)
+
+    card.process = spy
+    try:
+        results = OATHModule(transport).put_accounts([OATHCredential("a", SECRET), OATHCredential("b", SECRET)])
+    finally:
+        transport.disconnect()
+    assert all(r.ok for r in results)
+    assert [ins for ins, _ in depths] == [0xA4, 0x01, 0x01]
+    assert all(depth > 0 for _, depth in depths)
+
+# -- non-default periods -----------------------------------------------------
+
+def put_periodic(oath):
+    oath.put_accounts([OATHCredential("thirty", SECRET), OATHCredential("minute", SECRET, period=60),
+                       OATHCredential("quarter", SECRET, period=15)])
+
+def test_calculate_all_recomputes_period_prefixed_accounts(oath):
+    put_periodic(oath)
+    # RFC 4226 appendix D: counter 0 -> 755224, 1 -> 287082, 2 -> 359152, 3 -> 969429
+    assert oath.calculate_all(1) == {"thirty": "287082", "60/minute": "755224"}
+    assert oath.calculate_all(2) == {"thirty": "359152", "60/minute": "287082"}
+    assert oath.calculate_totp("60/minute", 3) == "287082"
+    assert oath.calculate_totp("15/quarter", 1) == "359152"
+
+def test_iter_codes_period_prefixed_accounts(oath):
+    put_periodic(oath)
+    codes = {c.label: c for c in oath.iter_codes(1)}
+    assert codes["thirty"].code == "287082"
+    assert (codes["60/minute"].code, codes["60/minute"].period) == ("755224", 60)
+    assert (codes["15/quarter"].code, codes["15/quarter"].period) == (None, 15)
+
+def test_cache_period_prefixed_accounts(transport, card):
+    oath = OATHModule(transport, cache=TOTPCodeCache(clock=Clock(59.0)))
+    oath.select()
+    put_periodic(oath)
+    assert oath.calculate_totp("thirty") == "287082"
+    assert oath.calculate_totp("60/minute") == "755224"
+    assert oath.cache.get_all(oath.serial) == {"thirty": "287082", "60/minute": "755224"}
+    before = card.apdu_count
+    assert oath.calculate_totp("15/quarter") == "969429"  # t=59: 15 s step 3
+    assert oath.calculate_totp("15/quarter") == "969429"
+    assert card.apdu_count == before + 2
+
+# -- streaming iteration -----------------------------------------------------
+
+@pytest.mark.parametrize("max_response", [17, 64, 255])
+def test_iter_accounts_across_chunk_boundaries(oath, card, max_response):
+    card.max_response = max_response
+    for i in range(40):
+        card.add_account(f"issuer{i}:user{i}@example.com", SECRET, algorithm=0x02 if i % 2 else 0x01)
+    accounts = list(oath.iter_accounts())
+    assert len(accounts) == 40
+    assert accounts[1] == OATHAccount("issuer1:user1@example.com", "totp", "SHA256")
+    assert oath.list_accounts() == [a.label for a in accounts]
+
+def test_iter_codes_types_and_digits(oath, card):
+    card.max_response = 23
+    card.add_account("six", SECRET)
+    card.add_account("eight", SECRET, digits=8)
+    card.add_account("hotp", SECRET, oath_type=0x10)
+    card.add_account("touch", SECRET, touch=True)
+    assert list(oath.iter_codes(1)) == [
+        OATHCode("six", "287082", 6),
+        OATHCode("eight", "94287082", 8),
+        OATHCode("hotp", None, 6, oath_type="hotp"),
+        OATHCode("touch", None, 6, touch=True),
+    ]
+
+def test_iter_fetches_continuations_lazily(oath, card):
+    card.max_response = 32
+    for i in range(50):
+        card.add_account(f"account{i}", SECRET)
+    before = card.apdu_count
+    accounts = oath.iter_accounts()
+    next(accounts)
+    assert card.apdu_count == before + 1
+    rest = list(accounts)
+    assert len(rest) == 49
+    assert card.apdu_count > before + 2
+
+def test_iter_raises_when_continuation_fails(oath, card):
+    card.max_response = 32
+    for i in range(20):
+        card.add_account(f"account{i}", SECRET)
+    accounts = oath.iter_accounts()
+    next(accounts)
+    card.reset()  # drops the pending response
+    with pytest.raises(Exception, match="SEND REMAINING"):
+        list(accounts)
+
+def test_async_iter_codes(card):
+    card.max_response = 40
+    for i in range(20):
+        card.add_account(f"account{i}", SECRET)
+    reader = card.plug()
+
+    async def run():
+        transport = AsyncAPDUTransport(str(reader))
+        await transport.connect()
+        oath = AsyncOATHModule(transport)
+        await oath.select()
+        codes = [c.code async for c in oath.iter_codes(1)]
+        # The reader lock is released once iteration is over.
+        labels = await oath.list_accounts()
+        await transport.disconnect()
+        return codes, labels
+
+    codes, labels = asyncio.run(run())
+    assert codes == ["287082"] * 20
+    assert len(labels) == 20
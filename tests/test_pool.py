@@ -0,0 +1,116 @@
+import pytest
+from pkcommon.apdu import SCARD_W_RESET_CARD, APDUTransport, ConnectionPool
+from pkcommon.metrics import Metrics
+from pkcommon.modules import OATHModule
+
+@pytest.fixture
+def reader(card):
+    return str(card.plug())
+
+def test_transports_share_a_warm_session(reader, card):
+    with ConnectionPool() as pool:
+        first = APDUTransport(reader, pool=pool)
+        assert OATHModule(first).select()
+        session = first.session
+        first.disconnect()
+        assert session.refs == 0 and session.connection.connected
+
+        second = APDUTransport(reader, pool=pool)
+        before = card.apdu_count
+        assert OATHModule(second).select()
+        assert second.session is session and session.refs == 1
+        assert card.apdu_count == before  # applet still selected on the pooled session
+        second.disconnect()
+
+def test_idle_sessions_are_evicted(reader):
+    with ConnectionPool(max_idle=30.0) as pool:
+        transport = APDUTransport(reader, pool=pool)
+        transport.connect()
+        session = transport.session
+        session.last_used -= 60
+        assert pool.evict_idle() == 0  # still in use
+        transport.disconnect()
+        assert pool.evict_idle() == 0  # released just now
+        session.last_used -= 60
+        connection = session.connection
+        assert pool.evict_idle() == 1
+        assert not connection.connected and session.connection is None
+        transport.connect()
+        assert transport.session is not session
+        transport.disconnect()
+
+def test_health_check_reconnects_dead_session(reader, card):
+    metrics = Metrics()
+    with ConnectionPool(metrics=metrics) as pool:
+        transport = APDUTransport(reader, pool=pool)
+        OATHModule(transport).select()
+        session = transport.session
+        transport.disconnect()
+        session.connection.connected = False  # e.g. the card was reset behind our back
+
+        transport.connect()
+        assert transport.session is session and session.connection.connected
+        assert session.selected is None
+        assert metrics.reconnects == {("pcsc", reader): 1}
+        transport.disconnect()
+
+def test_failed_reconnect_reopens_the_reader(reader):
+    with ConnectionPool() as pool:
+        transport = APDUTransport(reader, pool=pool)
+        transport.connect()
+        old = transport.session
+        transport.disconnect()
+
+        def gone(*args, **kwargs):
+            raise OSError("reader removed")
+
+        old.connection.connected = False
+        old.connection.reconnect = gone
+        old.connection.connect = gone
+        transport.connect()
+        assert transport.session is not old and transport.session.connection.connected
+        assert old.connection is None
+        transport.disconnect()
+
+def test_no_health_check_when_disabled(reader):
+    with ConnectionPool(health_check=False) as pool:
+        transport = APDUTransport(reader, pool=pool)
+        transport.connect()
+        session = transport.session
+        transport.disconnect()
+        session.connection.connected = False
+        transport.connect()
+        assert not transport.session.connection.connected
+        transport.disconnect()
+
+class ResetError(Exception):
+    hresult = SCARD_W_RESET_CARD
+
+def test_card_reset_during_transmit_is_retried(reader):
+    metrics = Metrics()
+    with ConnectionPool() as pool:
+        transport = APDUTransport(reader, pool=pool, metrics=metrics)
+        OATHModule(transport).select()
+        connection = transport.session.connection
+        transmit = connection.transmit
+        calls = []
+
+        def reset_once(apdu, *args):
+            calls.append(bytes(apdu))
+            if len(calls) == 1:
+                raise ResetError("card was reset")
+            return transmit(apdu, *args)
+
+        connection.transmit = reset_once
+        # The reconnect resets the card, so the retried command is one that works without state.
+        assert transport.send(0x00, 0xA4, 0x04, 0x00, OATHModule.AID_OATH).sw == 0x9000
+        assert len(calls) == 2 and metrics.reconnects == {("pcsc", reader): 1}
+        transport.disconnect()
+
+def test_close_disconnects_everything(reader):
+    pool = ConnectionPool()
+    transport = APDUTransport(reader, pool=pool)
+    transport.connect()
+    connection = transport.session.connection
+    pool.close()
+    assert not connection.connected and pool._sessions == {}
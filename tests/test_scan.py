@@ -0,0 +1,80 @@
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+from pkcommon.core import PicoKeyDevice, PicoKeyDiscovery
+
+def fake_backends(discovery: PicoKeyDiscovery, **behaviours):
+    """Replace the backend loader; each behaviour is called as find_all_picokeys()."""
+    class Backend:
+        def __init__(self, find):
+            self.find_all_picokeys = find
+
+    discovery._load_backend = lambda name: Backend(behaviours[name])
+    return discovery
+
+def test_backends_run_concurrently():
+    barrier = threading.Barrier(3, timeout=2)
+
+    def find():
+        barrier.wait()  # only returns once all three backends are running
+        return [PicoKeyDevice(1, 2)]
+
+    discovery = fake_backends(PicoKeyDiscovery(), usb=find, pcsc=find, ctap=find)
+    results = discovery.scan()
+    assert list(results) == ["usb", "pcsc", "ctap"]
+    assert all(r.ok and len(r.devices) == 1 for r in results.values())
+    assert set(discovery.timings) == {"usb", "pcsc", "ctap"}
+
+def test_timeout_and_error_keep_partial_results():
+    release = threading.Event()
+
+    def hang():
+        release.wait(10)
+        return [PicoKeyDevice(9, 9)]
+
+    def fail():
+        raise RuntimeError("no PC/SC service")
+
+    discovery = fake_backends(PicoKeyDiscovery(timeout=0.2), usb=lambda: [PicoKeyDevice(1, 2, "AAA")],
+                              pcsc=fail, ctap=hang)
+    started = time.monotonic()
+    results = discovery.scan()
+    assert time.monotonic() - started < 2
+    assert results["usb"].ok and results["usb"].devices[0].serial_number == "AAA"
+    assert results["pcsc"].error == "no PC/SC service" and not results["pcsc"].timed_out
+    assert results["ctap"].timed_out and results["ctap"].devices == []
+    # The hung backend runs on a daemon thread and its late result is dropped.
+    assert all(t.daemon for t in threading.enumerate() if t.name.startswith("pk-discovery"))
+    release.set()
+    time.sleep(0.05)
+    assert discovery.last_results["ctap"].timed_out
+
+def test_per_backend_timeout():
+    def slow():
+        time.sleep(0.3)
+        return [PicoKeyDevice(1, 2)]
+
+    discovery = fake_backends(PicoKeyDiscovery(timeout=0.05, backend_timeouts={"usb": 2.0}, backends=["usb", "ctap"]),
+                              usb=slow, ctap=slow)
+    results = discovery.scan()
+    assert results["usb"].ok and results["ctap"].timed_out
+
+def test_hung_backend_does_not_block_exit():
+    script = textwrap.dedent("""
+        import time
+        from pkcommon.core import PicoKeyDiscovery
+
+        class Hung:
+            @staticmethod
+            def find_all_picokeys():
+                time.sleep(60)
+
+        discovery = PicoKeyDiscovery(timeout=0.2, backends=["pcsc"])
+        discovery._load_backend = lambda name: Hung
+        assert discovery.scan()["pcsc"].timed_out
+    """)
+    started = time.monotonic()
+    subprocess.run([sys.executable, "-c", script], check=True, timeout=30)
+    assert time.monotonic() - started < 10
@@ -0,0 +1,59 @@
+import os
+import pytest
+from pkcommon.discovery import USBDiscovery, _iter_sysfs_devices, sysfs_available
+
+def add_device(root, name, **attributes):
+    directory = root / name
+    directory.mkdir()
+    for key, value in attributes.items():
+        (directory / key).write_text(f"{value}\n")
+    return directory
+
+def add_interface(device, number, cls):
+    interface = device / f"{device.name}:1.{number}"
+    interface.mkdir()
+    (interface / "bInterfaceClass").write_text(f"{cls:02x}\n")
+
+@pytest.fixture
+def sysfs(tmp_path):
+    add_device(tmp_path, "usb1", idVendor="1d6b", idProduct="0002", busnum="1", devnum="1")
+    key = add_device(tmp_path, "1-1", idVendor="2e8a", idProduct="10fe", busnum="1", devnum="5",
+                     serial="E6614C775B3C5A2A", product="Pico Key", manufacturer="Pol Henarejos")
+    add_interface(key, 0, 0x0B)
+    add_interface(key, 1, 0xFF)
+    add_device(tmp_path, "1-2.3", idVendor="20a0", idProduct="4287", busnum="1", devnum="9",
+               product="Custom", manufacturer="Pol Henarejos")
+    add_device(tmp_path, "1-3", idVendor="046d", idProduct="c52b", busnum="1", devnum="3",
+               manufacturer="Logitech")
+    add_device(tmp_path, "2-1", idVendor="2e8a", idProduct="cccc", busnum="2", devnum="2")
+    add_device(tmp_path, "2-2", busnum="2", devnum="4")  # being enumerated: no descriptors yet
+    return tmp_path
+
+def test_iter_skips_hubs_interfaces_and_incomplete_entries(sysfs):
+    entries = {d["port_path"]: d for d in _iter_sysfs_devices(str(sysfs))}
+    assert sorted(entries) == ["1-1", "1-2.3", "1-3", "2-1"]
+    assert entries["1-1"]["vendor_id"] == 0x2E8A and entries["1-1"]["product_id"] == 0x10FE
+    assert (entries["2-1"]["bus"], entries["2-1"]["address"]) == (2, 2)
+    assert entries["1-1"]["directory"] == os.path.join(str(sysfs), "1-1")
+
+def test_find_picokeys(sysfs):
+    devices = {d.port_path: d for d in USBDiscovery._find_sysfs(str(sysfs))}
+    assert sorted(devices) == ["1-1", "1-2.3", "2-1"]
+
+    key = devices["1-1"]
+    assert (key.serial_number, key.product_name, key.manufacturer) == ("E6614C775B3C5A2A", "Pico Key", "Pol Henarejos")
+    assert key.has_vendor_interface and (key.bus, key.address) == (1, 5)
+
+    # Matched by manufacturer string only.
+    assert devices["1-2.3"].product_name == "Custom" and not devices["1-2.3"].has_vendor_interface
+
+    # Known VID/PID without readable strings falls back to the table.
+    bare = devices["2-1"]
+    assert (bare.product_name, bare.manufacturer, bare.serial_number) == ("Pico HSM", "PicoKey", None)
+
+def test_sysfs_available(tmp_path, monkeypatch):
+    monkeypatch.setattr("sys.platform", "linux")
+    assert sysfs_available(str(tmp_path))
+    assert not sysfs_available(str(tmp_path / "missing"))
+    monkeypatch.setattr("sys.platform", "darwin")
+    assert not sysfs_available(str(tmp_path))
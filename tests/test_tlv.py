@@ -0,0 +1,84 @@
+import pytest
+from pkcommon.apdu import ResponseAPDU
+from pkcommon.modules import ManagementModule
+from pkcommon.tlv import (
+    encode_length, encode_tlv, encode_tlvs, find_tlv, iter_tlv, iter_tlv_stream, parse_tlv_dict
+)
+
+def test_multi_byte_tags_and_long_lengths():
+    data = encode_tlvs(((0x5F52, b"\x01\x02"), (0x7F49, bytes(200)), (0x71, bytes(300))))
+    objects = [(t.tag, len(t.value)) for t in iter_tlv(data)]
+    assert objects == [(0x5F52, 2), (0x7F49, 200), (0x71, 300)]
+
+def test_encode_length_forms():
+    assert encode_length(0x7F) == b"\x7f"
+    assert encode_length(0x80) == b"\x81\x80"
+    assert encode_length(0x1234) == b"\x82\x12\x34"
+
+def test_values_are_views():
+    data = bytearray(encode_tlv(0x71, b"abc"))
+    value = next(iter_tlv(data)).value
+    assert isinstance(value, memoryview)
+    data[2] = ord("x")
+    assert bytes(value) == b"xbc"
+
+def test_round_trip():
+    data = encode_tlvs(((0x71, b"label"), (0x74, bytes(8))))
+    assert b"".join(bytes(t) for t in iter_tlv(data)) == data
+
+@pytest.mark.parametrize("data", [
+    b"\x71\x05abc",       # value shorter than its length
+    b"\x5f",              # multi-byte tag cut off
+    b"\x71",              # length missing
+    b"\x71\x85\x00",      # unsupported length-of-length
+])
+def test_malformed_input_raises(data):
+    with pytest.raises(ValueError):
+        list(iter_tlv(data))
+
+def test_find_tlv_descends_into_constructed():
+    inner = encode_tlv(0x73, encode_tlv(0xC0, b"\x7d"))
+    data = encode_tlv(0x6E, encode_tlv(0x4F, b"aid") + inner)
+    assert bytes(find_tlv(data, 0xC0)) == b"\x7d"
+    assert find_tlv(data, 0xC0, recursive=False) is None
+    assert find_tlv(data, 0x99) is None
+
+def test_parse_tlv_dict_later_duplicates_win():
+    data = encode_tlvs(((0x71, b"a"), (0x71, b"b"), (0x74, b"c")))
+    assert {k: bytes(v) for k, v in parse_tlv_dict(data).items()} == {0x71: b"b", 0x74: b"c"}
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 1000])
+def test_stream_matches_iter_tlv(size):
+    data = encode_tlvs([(0x71, bytes(range(n % 256)) * 2) for n in range(1, 60, 7)] + [(0x5F2D, b"en")])
+    chunks = [data[i:i + size] for i in range(0, len(data), size)]
+    expected = [(t.tag, bytes(t.value)) for t in iter_tlv(data)]
+    assert [(t.tag, bytes(t.value)) for t in iter_tlv_stream(chunks)] == expected
+
+def test_stream_truncated_raises():
+    data = encode_tlvs(((0x71, b"abc"), (0x72, b"defg")))
+    with pytest.raises(ValueError):
+        list(iter_tlv_stream([data[:4], data[4:-1]]))
+
+class CannedTransport:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def send(self, cla, ins, p1, p2, data=b"", le=None):
+        return ResponseAPDU(self.data, 0x90, 0x00)
+
+def device_info(*tlvs) -> bytes:
+    body = encode_tlvs(tlvs)
+    return bytes((len(body),)) + body
+
+def test_read_device_info_fields():
+    module = ManagementModule(CannedTransport(device_info(
+        (0x02, (12345678).to_bytes(4, "big")), (0x05, b"\x05\x07\x00"), (0x04, b"\x01"), (0x01, b"\x02\x3b"))))
+    info = module.read_device_info()
+    assert info["serial"] == 12345678
+    assert info["version"] == "5.7.0"
+    assert info["form_factor"] == 1
+    assert info["usb_supported"] == 0x023B
+
+def test_read_device_info_empty_form_factor():
+    info = ManagementModule(CannedTransport(device_info((0x04, b"")))).read_device_info()
+    assert info["form_factor"] is None
@@ -0,0 +1,109 @@
+import io
+import pytest
+from conftest import SECRET
+from pkcommon.apdu import APDUTransport, unregister_reader
+from pkcommon.modules import OATHModule
+from pkcommon.trace import APDURecorder, RecordingTransport, ReplayTransport
+
+def oath_flow(transport):
+    oath = OATHModule(transport)
+    oath.select()
+    oath.select()
+    return oath.list_accounts()
+
+def record(reader_name: str, flow=oath_flow, **kwargs):
+    transport = RecordingTransport(reader_name, **kwargs)
+    transport.connect()
+    try:
+        result = flow(transport)
+    finally:
+        transport.disconnect()
+    return transport.recorder, result
+
+def replay(trace, flow=oath_flow, **kwargs):
+    transport = ReplayTransport(trace, **kwargs)
+    try:
+        return flow(transport), transport.card.remaining
+    finally:
+        transport.disconnect()
+
+def test_replay_of_shared_connection_trace(shared_reader):
+    card, reader = shared_reader
+    card.add_account("alice", SECRET)
+    trace, labels = record(reader.name)
+    # Shared PC/SC: both SELECTs reach the card and are in the trace.
+    assert [e.command[1] for e in trace.entries] == [0xA4, 0xA4, 0xA1]
+    assert replay(trace) == (labels, 0)
+
+def test_replay_of_in_process_trace(card):
+    card.add_account("alice", SECRET)
+    trace, labels = record(str(card.plug()))
+    # Emulator: the second SELECT is skipped while recording.
+    assert [e.command[1] for e in trace.entries] == [0xA4, 0xA1]
+    assert replay(trace) == (labels, 0)
+
+def test_replay_of_exclusive_trace(shared_reader):
+    card, reader = shared_reader
+    trace, labels = record(reader.name, exclusive=True)
+    assert len(trace.entries) == 2
+    assert replay(trace) == (labels, 0)
+
+def test_replay_covers_continuations(card):
+    card.max_response = 20
+    for i in range(15):
+        card.add_account(f"account{i}", SECRET)
+    trace, labels = record(str(card.plug()))
+    assert any(e.command[1] == OATHModule.INS_SEND_REMAINING for e in trace.entries)
+    assert replay(trace) == (labels, 0)
+
+def test_ndjson_round_trip(card, tmp_path):
+    card.add_account("alice", SECRET)
+    stream = io.StringIO()
+    trace, labels = record(str(card.plug()), recorder=APDURecorder(stream=stream))
+    path = tmp_path / "trace.ndjson"
+    trace.save(str(path))
+    loaded = APDURecorder.load(str(path))
+    assert loaded.reader == trace.reader and loaded.atr == bytes(card.atr)
+    assert [(e.command, e.response, e.sw) for e in loaded.entries] == \
+        [(e.command, e.response, e.sw) for e in trace.entries]
+    assert APDURecorder.load(stream.getvalue().splitlines()).entries == loaded.entries
+    assert replay(str(path)) == (labels, 0)
+
+def test_ring_buffer_keeps_last_exchanges(card):
+    trace, _ = record(str(card.plug()), recorder=APDURecorder(maxlen=1))
+    assert len(trace.entries) == 1 and trace.dropped == 1
+    assert trace.entries[0].command[1] == 0xA1
+
+def test_strict_mismatch_and_lenient_skip(card):
+    trace, _ = record(str(card.plug()))
+
+    def list_only(transport):
+        return transport.send(0x00, 0xA1, 0x00, 0x00).sw
+
+    with pytest.raises(Exception, match="Replay mismatch at exchange 0"):
+        replay(trace, flow=list_only)
+    assert replay(trace, flow=list_only, strict=False) == (0x9000, 0)
+
+def test_recorded_error_is_replayed(card):
+    def failing(transport):
+        transport.send(0x00, 0xA1, 0x00, 0x00)
+        card.process = None  # the next exchange raises inside the connection
+        transport.send(0x00, 0xA1, 0x00, 0x00)
+
+    trace = APDURecorder()
+    with pytest.raises(Exception):
+        record(str(card.plug()), flow=failing, recorder=trace)
+    assert trace.entries[-1].error is not None
+    with pytest.raises(Exception, match=trace.entries[-1].error):
+        replay(trace, flow=failing)
+
+def test_plugged_replay_behaves_like_shared_reader(shared_reader):
+    _, reader = shared_reader
+    trace, labels = record(reader.name)
+    replay_reader = ReplayTransport(trace).card.plug("Replay Reader 00 00")
+    transport = APDUTransport(replay_reader.name)
+    try:
+        assert oath_flow(transport) == labels
+    finally:
+        transport.disconnect()
+        unregister_reader(replay_reader)
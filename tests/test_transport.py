@@ -0,0 +1,144 @@
+import hashlib
+import hmac
+import pytest
+from conftest import SECRET
+from pkcommon.apdu import APDUTransport, CommandAPDU
+from pkcommon.emulator import AID_OATH, AID_PGP, VirtualPicoKey
+from pkcommon.modules import ManagementModule, OATHModule, OpenPGPModule
+from pkcommon.tlv import encode_tlvs
+
+class Spy:
+    """Records every APDU a VirtualPicoKey receives."""
+
+    def __init__(self, card: VirtualPicoKey):
+        self.apdus = []
+        self._process = card.process
+        card.process = self.process
+
+    def process(self, apdu: bytes):
+        self.apdus.append(bytes(apdu))
+        return self._process(apdu)
+
+    def selects(self):
+        return [a for a in self.apdus if a[1] == 0xA4 and a[2] == 0x04]
+
+def test_management_version_and_device_info(transport, card):
+    mgmt = ManagementModule(transport)
+    assert mgmt.select() == "5.7.0"
+    info = mgmt.read_device_info()
+    assert info["serial"] == card.serial
+    assert info["version"] == "5.7.0"
+    assert info["form_factor"] == 1
+
+def test_get_response_collection(transport, card):
+    card.max_response = 16
+    pgp = OpenPGPModule(transport)
+    assert pgp.select()
+    spy = Spy(card)
+    data = pgp.get_application_related_data()
+    assert data[0x4F].startswith(AID_PGP)
+    assert 0xC0 in data
+    assert any(a[1] == 0xC0 for a in spy.apdus)
+
+def test_send_remaining_collection(oath, card):
+    card.max_response = 50
+    for i in range(30):
+        card.add_account(f"account{i}", SECRET)
+    spy = Spy(card)
+    response = oath.transport.send(0x00, 0xA1, 0x00, 0x00)
+    assert response.sw == 0x9000
+    assert len(response.data) > 50 * 5
+    assert [a[1] for a in spy.apdus[1:]] == [OATHModule.INS_SEND_REMAINING] * (len(spy.apdus) - 1)
+
+# -- long commands: extended length and chaining -----------------------------
+
+def put_long_secret(transport: APDUTransport, secret: bytes):
+    data = encode_tlvs(((0x71, b"long"), (0x74, b"\x26"), (0x75, b"\x01"), (0x73, secret)))
+    assert len(data) > 255
+    return transport.send_apdu(CommandAPDU(0x00, 0x01, 0x00, 0x00, data))
+
+@pytest.mark.parametrize("extended", [True, False])
+def test_long_command_extended_or_chained(extended):
+    card = VirtualPicoKey(extended_length=extended)
+    transport = APDUTransport(str(card.plug()))
+    try:
+        transport.connect()
+        assert transport.supports_extended is extended
+        oath = OATHModule(transport)
+        oath.select()
+        spy = Spy(card)
+        secret = bytes(range(256)) * 2
+        assert put_long_secret(transport, secret).sw == 0x9000
+        if extended:
+            assert len(spy.apdus) == 1
+        else:
+            assert len(spy.apdus) == 3
+            assert [a[0] & 0x10 for a in spy.apdus] == [0x10, 0x10, 0x00]
+        assert card.accounts["long"].secret == secret
+
+        digest = hmac.new(secret, (1).to_bytes(8, "big"), hashlib.sha1).digest()
+        offset = digest[-1] & 0x0F
+        value = int.from_bytes(digest[offset:offset + 4], "big") & 0x7FFFFFFF
+        assert oath.calculate_totp("long", 1) == f"{value % 10**6:06d}"
+    finally:
+        transport.disconnect()
+        card.unplug()
+
+# -- applet selection tracking -----------------------------------------------
+
+def test_select_skipped_when_applet_active(transport, card):
+    spy = Spy(card)
+    assert OATHModule(transport).select()
+    assert OATHModule(transport).select()
+    assert len(spy.selects()) == 1
+
+def test_select_invalidated_by_other_select(transport, card):
+    spy = Spy(card)
+    oath = OATHModule(transport)
+    oath.select()
+    ManagementModule(transport).select()
+    oath.select()
+    assert len(spy.selects()) == 3
+    # A raw SELECT sent without select() must invalidate the tracked applet too.
+    transport.transmit(bytes((0x00, 0xA4, 0x04, 0x00, len(AID_PGP))) + AID_PGP)
+    oath.select()
+    assert len(spy.selects()) == 5
+
+def test_select_invalidated_by_reconnect(transport, card):
+    spy = Spy(card)
+    oath = OATHModule(transport)
+    oath.select()
+    transport.session.reconnect()
+    oath.select()
+    assert len(spy.selects()) == 2
+
+def test_select_always_sent_on_shared_connection(shared_reader):
+    card, reader = shared_reader
+    transport = APDUTransport(reader.name)
+    transport.connect()
+    spy = Spy(card)
+    oath = OATHModule(transport)
+    oath.select()
+    oath.select()
+    with transport.transaction():
+        # No PC/SC transaction can be held on this connection: still not trusted.
+        assert not transport.session.owns_card
+        oath.select()
+    assert len(spy.selects()) == 3
+    transport.disconnect()
+
+def test_select_skipped_on_exclusive_connection(shared_reader):
+    card, reader = shared_reader
+    transport = APDUTransport(reader.name, exclusive=True)
+    transport.connect()
+    assert transport.session.connection.mode is not None
+    spy = Spy(card)
+    oath = OATHModule(transport)
+    oath.select()
+    oath.select()
+    assert len(spy.selects()) == 1
+    transport.disconnect()
+
+def test_select_aid_reaches_card(transport, card):
+    OATHModule(transport).select()
+    assert card.selected == AID_OATH
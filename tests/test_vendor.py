@@ -0,0 +1,154 @@
+import array
+import threading
+import pytest
+from pkcommon.metrics import Metrics
+from pkcommon.vendor import VendorTransport
+
+class FakeEndpoint:
+    """
+    Bulk endpoint with pyusb's read/write signatures. IN data is whatever
+    was feed()'d; a read returns at most len(buffer) of it.
+    """
+
+    def __init__(self, packet=64, on_write=None, timeout_error=TimeoutError):
+        self.wMaxPacketSize = packet
+        self.on_write = on_write
+        self.timeout_error = timeout_error
+        self.writes = []
+        self.reads = []
+        self._pending = bytearray()
+        self._cond = threading.Condition()
+
+    def feed(self, data):
+        with self._cond:
+            self._pending += data
+            self._cond.notify_all()
+
+    def write(self, data, timeout=None):
+        data = bytes(data)
+        self.writes.append(data)
+        if self.on_write:
+            self.on_write(data)
+        return len(data)
+
+    def read(self, buf, timeout=None):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._pending, (timeout or 1000) / 1000):
+                raise self.timeout_error("timeout")
+            size = buf if isinstance(buf, int) else len(buf)
+            n = min(size, len(self._pending))
+            chunk = self._pending[:n]
+            del self._pending[:n]
+        self.reads.append(buf)
+        if isinstance(buf, int):
+            return array.array("B", chunk)
+        buf[:n] = array.array("B", chunk)
+        return n
+
+def make_transport(packet=64, burst=4, metrics=None, **endpoint_args):
+    transport = VendorTransport(0x2E8A, 0x10FE, metrics=metrics, burst=burst)
+    transport.ep_out = FakeEndpoint(packet, **endpoint_args)
+    transport.ep_in = FakeEndpoint(packet, **endpoint_args)
+    return transport
+
+def test_write_stream_bursts_and_zlp():
+    metrics = Metrics()
+    transport = make_transport(metrics=metrics)
+    payload = bytes(range(256)) * 2 + bytes(88)
+    assert transport.write_stream(payload) == 600
+    assert [len(w) for w in transport.ep_out.writes] == [256, 256, 88]
+    assert b"".join(transport.ep_out.writes) == payload
+
+    transport.ep_out.writes.clear()
+    transport.write_stream(bytearray(512))
+    assert [len(w) for w in transport.ep_out.writes] == [256, 256, 0]
+    transport.ep_out.writes.clear()
+    transport.write_stream(memoryview(bytes(128)), zlp=False)
+    assert [len(w) for w in transport.ep_out.writes] == [128]
+    assert metrics.bytes_out[("vendor", "2e8a:10fe")] == 600 + 512 + 128
+
+def test_read_stream_reuses_buffers():
+    transport = make_transport()
+    payload = bytes(i % 251 for i in range(600))
+    transport.ep_in.feed(payload)
+    data = transport.read_stream(600)
+    assert bytes(data) == payload
+    # 256 + 256 + 128 (rounded up to whole packets); the next read reuses them.
+    assert [len(b) for b in transport.ep_in.reads] == [256, 256, 128]
+    transport.ep_in.feed(payload)
+    transport.read_stream(600)
+    assert transport.ep_in.reads[3] is transport.ep_in.reads[0]
+    assert transport.ep_in.reads[5] is transport.ep_in.reads[2]
+
+def test_read_stream_short_packet_and_out_buffer():
+    transport = make_transport()
+    transport.ep_in.feed(b"\xAA" * 100)
+    assert bytes(transport.read_stream(1000)) == b"\xAA" * 100  # 100 % 64: transfer ended
+
+    out = bytearray(256)
+    transport.ep_in.feed(b"\x55" * 64 + b"\x01")
+    view = transport.read_stream(65, out=out)
+    assert view.obj is out and bytes(view) == b"\x55" * 64 + b"\x01"
+    with pytest.raises(ValueError, match="too small"):
+        transport.read_stream(128, out=bytearray(100))
+
+def test_transfer_reads_while_writing():
+    transport = make_transport(burst=1)
+    written = []
+
+    def device(data):
+        # Answers as soon as the first packet arrives: the IN read must already
+        # be posted or a real device would stall here.
+        written.append(data)
+        if len(written) == 1:
+            transport.ep_in.feed(b"\x90\x00" + bytes(62) + b"end")
+
+    transport.ep_out.on_write = device
+    response = transport.transfer(bytes(64 * 5), 67, timeout=2000)
+    assert bytes(response[-3:]) == b"end" and len(response) == 67
+    assert [len(w) for w in written] == [64] * 5 + [0]
+
+def test_transfer_propagates_read_errors():
+    transport = make_transport()
+    with pytest.raises(TimeoutError):
+        transport.transfer(b"ping", 64, timeout=50)
+
+@pytest.fixture
+def usb_timeout():
+    usb_core = pytest.importorskip("usb.core")
+    return usb_core.USBTimeoutError
+
+def test_bulk_reader_queue_and_backpressure(usb_timeout):
+    transport = make_transport(packet=8, burst=1, timeout_error=usb_timeout)
+    reader = transport.start_reader(depth=2)
+    assert transport.start_reader() is reader
+    with pytest.raises(Exception, match="BulkReader"):
+        transport.receive()
+    for i in range(4):
+        transport.ep_in.feed(bytes([i]) * 8)
+    assert [reader.read(timeout=1) for _ in range(4)] == [bytes([i]) * 8 for i in range(4)]
+    transport.stop_reader()
+    assert transport._reader is None
+
+def test_bulk_reader_callback_and_error(usb_timeout):
+    transport = make_transport(packet=8, burst=1, timeout_error=usb_timeout)
+    chunks = []
+    done = threading.Event()
+
+    def callback(view):
+        chunks.append(bytes(view))
+        done.set()
+
+    transport.start_reader(callback=callback)
+    transport.ep_in.feed(b"abc")
+    assert done.wait(1) and chunks == [b"abc"]
+    transport.stop_reader()
+
+    def unplugged(buf, timeout=None):
+        raise IOError("unplugged")
+
+    reader = transport.start_reader()
+    transport.ep_in.read = unplugged
+    with pytest.raises(IOError, match="unplugged"):
+        reader.read(timeout=1)
+    transport.stop_reader()